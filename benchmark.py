@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.main import middleware, budget_tracker
+from src.db_connector import execute_query
+from src.admission import AdmissionController
+from src.pipeline.sanitizer import SecurityException
+from src.pipeline.budget import BudgetExhaustedException
+from src.tracing import STAGES
+
+# Valid IDs from seed
+RESEARCHER_ID = '001075000003'
+EXHAUSTED_ID = '001085000005'  # Doctor whose budget is zeroed for the exhausted scenario
+
+REPORT_FILE = 'test_report.json'
+
+# Each scenario: query, user, epsilon and the exception it is expected to raise (None = success)
+SCENARIOS = {
+    "count": {"query": "SELECT COUNT(*) FROM patients WHERE age > 30", "user_id": RESEARCHER_ID, "expect": None},
+    "sum": {"query": "SELECT SUM(age) FROM patients WHERE gender = 'F'", "user_id": RESEARCHER_ID, "expect": None},
+    "avg": {"query": "SELECT AVG(age) FROM patients WHERE age >= 20", "user_id": RESEARCHER_ID, "expect": None},
+    "group_by": {"query": "SELECT COUNT(*) FROM patients GROUP BY gender", "user_id": RESEARCHER_ID, "expect": None},
+    "rejected": {"query": "SELECT * FROM patients; DROP TABLE patients;", "user_id": RESEARCHER_ID, "expect": SecurityException},
+    "budget_exhausted": {"query": "SELECT COUNT(*) FROM patients", "user_id": EXHAUSTED_ID, "expect": BudgetExhaustedException},
+}
+
+def percentiles(values_ns: list) -> dict:
+    """
+    Summarizes nanosecond samples as p50/p95/p99/mean in milliseconds.
+    """
+    if not values_ns:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    arr = np.array(values_ns, dtype=float) / 1e6
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "mean_ms": float(arr.mean())}
+
+def _prepare_budgets():
+    execute_query("UPDATE staffs SET privacy_budget = 1000000000.0 WHERE national_id = %s", (RESEARCHER_ID,))
+    execute_query("UPDATE staffs SET privacy_budget = 0.0 WHERE national_id = %s", (EXHAUSTED_ID,))
+
+def _run_once(scenario: dict, epsilon: float):
+    start = time.perf_counter_ns()
+    error = None
+    try:
+        middleware.process_query(scenario["query"], scenario["user_id"], epsilon)
+    except Exception as e:
+        error = e
+    elapsed = time.perf_counter_ns() - start
+
+    expected = scenario["expect"]
+    ok = isinstance(error, expected) if expected else error is None
+    return elapsed, ok, error
+
+def run_case(name: str, scenario: dict, concurrency: int, iterations: int, epsilon: float = 0.01, warmup: int = 3) -> dict:
+    """
+    Runs one scenario closed-loop at the given concurrency and returns its latency and stage summary.
+    """
+    for _ in range(warmup):
+        _run_once(scenario, epsilon)
+
+    traces = []
+    middleware.trace_listeners.append(traces.append)
+    try:
+        wall_start = time.perf_counter_ns()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(lambda _: _run_once(scenario, epsilon), range(iterations)))
+        wall_ns = time.perf_counter_ns() - wall_start
+    finally:
+        middleware.trace_listeners.remove(traces.append)
+
+    latencies = [elapsed for elapsed, ok, _ in outcomes if ok]
+    errors = [repr(error) for _, ok, error in outcomes if not ok]
+
+    stage_samples = {}
+    for trace in traces:
+        for stage, ns in trace.stages.items():
+            stage_samples.setdefault(stage, []).append(ns)
+    stages = {stage: percentiles(stage_samples[stage]) for stage in STAGES if stage in stage_samples}
+
+    case = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": iterations,
+        "unexpected_outcomes": len(errors),
+        "throughput_rps": iterations / (wall_ns / 1e9) if wall_ns else None,
+        "stages": stages,
+    }
+    case.update(percentiles(latencies))
+    if errors:
+        case["sample_error"] = errors[0]
+    return case
+
+def _case_key(case: dict) -> tuple:
+    return (case["scenario"], case.get("table_size"), case["concurrency"])
+
+def compare_to_baseline(cases: list, baseline_cases: list, tolerance: float = 0.2, min_delta_ms: float = 0.5) -> list:
+    """
+    Returns the cases whose p95 regressed by more than `tolerance` (and min_delta_ms) against the baseline.
+    """
+    baseline = {_case_key(case): case for case in baseline_cases}
+    regressions = []
+    for case in cases:
+        old = baseline.get(_case_key(case))
+        if not old or old.get("p95_ms") is None or case.get("p95_ms") is None:
+            continue
+        delta = case["p95_ms"] - old["p95_ms"]
+        if delta > min_delta_ms and case["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append({
+                "scenario": case["scenario"],
+                "table_size": case.get("table_size"),
+                "concurrency": case["concurrency"],
+                "baseline_p95_ms": old["p95_ms"],
+                "current_p95_ms": case["p95_ms"],
+            })
+    return regressions
+
+def write_report(results: dict, report_file: str = REPORT_FILE):
+    """
+    Merges the results into the metrics JSON consumed by run_test.generate_report.
+    """
+    metrics = {}
+    if os.path.exists(report_file):
+        with open(report_file, 'r') as f:
+            metrics = json.load(f)
+    metrics['benchmarks'] = results
+    with open(report_file, 'w') as f:
+        json.dump(metrics, f, indent=4)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Privacy pipeline benchmark suite")
+    parser.add_argument("--scenarios", type=str, nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS), help="Scenarios to run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels (default: 1 4 16)")
+    parser.add_argument("--iterations", type=int, default=200, help="Requests per case (default: 200)")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Synthetic patient counts; each size reseeds hospital_db (requires --reseed)")
+    parser.add_argument("--reseed", action="store_true", help="Allow dropping and reseeding hospital_db for each table size")
+    parser.add_argument("--baseline", type=str, help="Baseline JSON to compare p95 latencies against")
+    parser.add_argument("--save_baseline", type=str, help="Write these results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown vs. baseline (default: 0.2 = 20%%)")
+    parser.add_argument("--report", type=str, default=REPORT_FILE, help=f"Metrics JSON to update (default: {REPORT_FILE})")
+    args = parser.parse_args(argv)
+
+    if args.sizes and not args.reseed:
+        parser.error("--sizes drops and reseeds hospital_db; pass --reseed to confirm.")
+
+    middleware.budget_accountant = budget_tracker
+    # Every scenario runs as one user: lift the per-user cap so high concurrency measures the
+    # pipeline (queued behind the global limit) rather than per-user rejections
+    middleware.admission = AdmissionController(max_per_user=max(args.concurrency))
+    sizes = args.sizes or [None]
+    cases = []
+
+    for size in sizes:
+        if size is not None:
+            import seed_db
+            seed_db.seed_database(n_patients=size)
+
+        _prepare_budgets()
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                case = run_case(name, SCENARIOS[name], concurrency, args.iterations)
+                case["table_size"] = size
+                cases.append(case)
+                print(f"{name:<18} size={str(size or 'current'):<10} c={concurrency:<3} "
+                      f"p50={case['p50_ms'] or 0:8.3f}ms p95={case['p95_ms'] or 0:8.3f}ms p99={case['p99_ms'] or 0:8.3f}ms "
+                      f"rps={case['throughput_rps'] or 0:8.1f} unexpected={case['unexpected_outcomes']}")
+
+    results = {"cases": cases}
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        results["regressions"] = compare_to_baseline(cases, baseline.get("cases", []), args.tolerance)
+        for regression in results["regressions"]:
+            print(f"REGRESSION: {regression}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({"cases": cases}, f, indent=4)
+
+    write_report(results, args.report)
+    return 1 if results.get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
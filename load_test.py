@@ -0,0 +1,210 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import multiprocessing
+from src.db_connector import execute_query, DB_POOL_SIZE
+from benchmark import percentiles
+
+# Realistic query mix per resolved role: (weight, query)
+QUERY_MIX = {
+    "doctor": [
+        (5, "SELECT COUNT(*) FROM patients WHERE age > 30"),
+        (3, "SELECT AVG(age) FROM patients WHERE gender = 'F'"),
+        (2, "SELECT COUNT(*) FROM diagnoses WHERE disease_name = 'Flu'"),
+    ],
+    "researcher": [
+        (4, "SELECT COUNT(*) FROM patients WHERE age >= 40"),
+        (3, "SELECT SUM(age) FROM patients WHERE gender = 'M'"),
+        (2, "SELECT AVG(age) FROM patients"),
+        (1, "SELECT COUNT(*) FROM patients GROUP BY gender"),
+    ],
+    "manager": [
+        (3, "SELECT COUNT(*) FROM staffs"),
+        (3, "SELECT COUNT(*) FROM patients WHERE age < 50"),
+        (2, "SELECT AVG(age) FROM staffs"),
+    ],
+    "accountant": [
+        (1, "SELECT COUNT(*) FROM staffs WHERE age > 30"),
+    ],
+    "cashier": [
+        (1, "SELECT COUNT(*) FROM diagnoses WHERE disease_name = 'Hypertension'"),
+    ],
+    "default": [
+        (1, "SELECT COUNT(*) FROM patients"),
+    ],
+}
+
+def load_users(limit: int = None) -> list:
+    """
+    Returns the national IDs of the simulated users (staff members).
+    """
+    rows = execute_query("SELECT national_id FROM staffs ORDER BY staff_id")
+    users = [row['national_id'] for row in rows]
+    return users[:limit] if limit else users
+
+def _read_budgets(users: list) -> dict:
+    placeholders = ', '.join(['%s'] * len(users))
+    rows = execute_query(f"SELECT national_id, privacy_budget FROM staffs WHERE national_id IN ({placeholders})", tuple(users))
+    return {row['national_id']: float(row['privacy_budget']) for row in rows}
+
+def _user_loop(middleware, user_id: str, role: str, epsilon: float, interval: float, deadline: float, seed: int, results: list):
+    """
+    Closed loop for one user: send a request, wait for the response, then pace to the per-user rate.
+    """
+    rng = random.Random(seed)
+    weights, queries = zip(*QUERY_MIX.get(role, QUERY_MIX["default"]))
+
+    next_send = time.monotonic()
+    while next_send < deadline:
+        query = rng.choices(queries, weights)[0]
+        start = time.perf_counter_ns()
+        try:
+            response = middleware.process_query(query, user_id, epsilon)
+            results.append((user_id, time.perf_counter_ns() - start, None, response["epsilon_used"]))
+        except Exception as e:
+            results.append((user_id, time.perf_counter_ns() - start, type(e).__name__, 0.0))
+
+        next_send += interval
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # Fell behind the target rate; do not try to catch up in bursts
+            next_send = time.monotonic()
+
+def run_users(users: list, epsilon: float, rate_per_user: float, duration: float, seed: int) -> list:
+    """
+    Runs one thread per user against a single warm middleware and returns the raw results.
+    """
+    from src.main import middleware, budget_tracker
+    middleware.budget_accountant = budget_tracker
+
+    results = []
+    interval = 1.0 / rate_per_user if rate_per_user > 0 else 0.0
+    deadline = time.monotonic() + duration
+
+    threads = []
+    for i, user_id in enumerate(users):
+        role = middleware._get_role(user_id)
+        thread = threading.Thread(
+            target=_user_loop,
+            args=(middleware, user_id, role, epsilon, interval, deadline, seed + i, results)
+        )
+        threads.append(thread)
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    # Budget commits run asynchronously; wait for them before anyone reads the budgets
+    middleware.flush_budget_commits()
+    return results
+
+def _process_worker(users, epsilon, rate_per_user, duration, seed, out_queue):
+    out_queue.put(run_users(users, epsilon, rate_per_user, duration, seed))
+
+def run_load(users: list, epsilon: float, rate: float, duration: float, processes: int = 1, seed: int = 7) -> list:
+    """
+    Spreads the users over `processes` worker processes (1 = threads in this process).
+    """
+    rate_per_user = rate / len(users) if rate else 0.0
+    if processes <= 1:
+        return run_users(users, epsilon, rate_per_user, duration, seed)
+
+    out_queue = multiprocessing.Queue()
+    workers = []
+    for p in range(processes):
+        subset = users[p::processes]
+        if not subset:
+            continue
+        worker = multiprocessing.Process(target=_process_worker, args=(subset, epsilon, rate_per_user, duration, seed + 1000 * p, out_queue))
+        workers.append(worker)
+        worker.start()
+
+    results = []
+    for _ in workers:
+        results.extend(out_queue.get())
+    for worker in workers:
+        worker.join()
+    return results
+
+def verify_budgets(start: dict, end: dict, results: list, tolerance: float = 1e-3) -> dict:
+    """
+    Checks that each user's final budget equals the starting budget minus the epsilon actually charged.
+    """
+    charged = {user_id: 0.0 for user_id in start}
+    for user_id, _, error, epsilon_used in results:
+        if error is None:
+            charged[user_id] += epsilon_used
+
+    mismatches = []
+    overspent = []
+    for user_id, initial in start.items():
+        expected = initial - charged[user_id]
+        actual = end.get(user_id)
+        # privacy_budget is a FLOAT column, so allow for single precision rounding
+        if actual is None or abs(actual - expected) > tolerance * max(1.0, abs(expected)):
+            mismatches.append({"user_id": user_id, "expected": expected, "actual": actual, "charged": charged[user_id]})
+        if actual is not None and actual < -tolerance:
+            overspent.append({"user_id": user_id, "budget": actual})
+
+    return {"consistent": not mismatches, "mismatches": mismatches, "overspent": overspent}
+
+def summarize(results: list, wall_seconds: float) -> dict:
+    latencies = [elapsed for _, elapsed, error, _ in results if error is None]
+    errors = {}
+    for _, _, error, _ in results:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+
+    summary = {
+        "requests": len(results),
+        "succeeded": len(latencies),
+        "throughput_rps": len(results) / wall_seconds if wall_seconds else None,
+        "errors": errors,
+    }
+    summary.update(percentiles(latencies))
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Closed-loop multi-user load generator for PrivacyMiddleware")
+    parser.add_argument("--users", type=int, help="Number of staff users to simulate (default: all)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Target total requests/second (default: 0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test duration in seconds (default: 30)")
+    parser.add_argument("--epsilon", type=float, default=0.01, help="Epsilon per request (default: 0.01)")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes; users are split across them (default: 1, threads only)")
+    parser.add_argument("--budget", type=float, help="Reset each simulated user's budget to this value before the run")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for the query mix (default: 7)")
+    parser.add_argument("--output", type=str, help="Write the JSON summary to this file")
+    args = parser.parse_args(argv)
+
+    users = load_users(args.users)
+    if not users:
+        print("No users found in staffs table.")
+        return 1
+    if args.budget is not None:
+        placeholders = ', '.join(['%s'] * len(users))
+        execute_query(f"UPDATE staffs SET privacy_budget = %s WHERE national_id IN ({placeholders})", (args.budget, *users))
+
+    print(f"Simulating {len(users)} users for {args.duration:.0f}s (rate={args.rate or 'max'} req/s, processes={args.processes}, pool size={DB_POOL_SIZE})...")
+    start_budgets = _read_budgets(users)
+
+    wall_start = time.monotonic()
+    results = run_load(users, args.epsilon, args.rate, args.duration, args.processes, args.seed)
+    wall_seconds = time.monotonic() - wall_start
+
+    summary = summarize(results, wall_seconds)
+    summary["budget_verification"] = verify_budgets(start_budgets, _read_budgets(users), results)
+
+    print(json.dumps(summary, indent=4))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=4)
+
+    return 0 if summary["budget_verification"]["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
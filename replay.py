@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.db_connector import execute_query
+from src.capture import bind_parameters
+from benchmark import percentiles
+
+REPORT_FILE = 'test_report.json'
+
+def load_capture(path: str) -> list:
+    """
+    Reads a workload captured with CAPTURE_FILE, ordered by arrival time.
+    """
+    records = []
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"Warning: Skipping malformed capture record on line {line_number}.")
+    records.sort(key=lambda record: record["offset_ms"])
+    return records
+
+def split_replayable(records: list) -> tuple:
+    """
+    Returns the records whose query could be fingerprinted, and how many were skipped.
+    """
+    replayable = [record for record in records if record.get("fingerprint") is not None]
+    return replayable, len(records) - len(replayable)
+
+def load_users_by_role() -> dict:
+    """
+    Returns the national IDs of the local staff, grouped by their resolved policy role.
+    """
+    from src.main import role_from_row
+    users = {}
+    for row in execute_query("SELECT national_id, role, specialization FROM staffs ORDER BY staff_id"):
+        users.setdefault(role_from_row(row), []).append(row["national_id"])
+    return users
+
+def assign_users(records: list, users_by_role: dict) -> dict:
+    """
+    Maps each captured pseudonym to a local user with the same role (round-robin, deterministic).
+    Pseudonyms of roles missing locally, or of unknown users, map to a "default"-role user or any user.
+    """
+    fallback = users_by_role.get("default") or [user for users in users_by_role.values() for user in users]
+    next_index = {}
+    mapping = {}
+    for record in records:
+        pseudonym = record["user"]
+        if pseudonym in mapping:
+            continue
+        role = record.get("role")
+        candidates = users_by_role.get(role) or fallback
+        index = next_index.get(role, 0)
+        mapping[pseudonym] = candidates[index % len(candidates)]
+        next_index[role] = index + 1
+    return mapping
+
+def replay(middleware, records: list, user_map: dict, speed: float = 1.0, workers: int = 16, seed: int = 7) -> tuple:
+    """
+    Re-issues the captured requests open-loop: each one is started at its original offset divided
+    by `speed` (0 = as fast as the workers allow), whatever the state of earlier requests.
+    The noise RNG is seeded first; with workers=1 the noisy results are reproducible.
+    Returns (results, wall_seconds).
+    """
+    np.random.seed(seed)
+    results = []
+    results_lock = threading.Lock()
+
+    def _run(record: dict, query: str, user_id: str, due: float):
+        started = time.perf_counter_ns()
+        error = None
+        try:
+            kwargs = {"deadline_ms": record["deadline_ms"]} if record.get("deadline_ms") is not None else {}
+            middleware.process_query(query, user_id, record.get("epsilon") or 0.01, **kwargs)
+        except Exception as e:
+            error = type(e).__name__
+        elapsed = time.perf_counter_ns() - started
+        with results_lock:
+            results.append({
+                "fingerprint": record["fingerprint"],
+                "latency_ns": elapsed,
+                "start_lag_ms": max(0.0, (started - due) / 1e6),
+                "error": error,
+                "captured_error": record.get("error"),
+                "captured_ms": record.get("total_ms"),
+            })
+
+    start = time.perf_counter_ns()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for record in records:
+            if record.get("fingerprint") is None:
+                continue
+            query = bind_parameters(record["fingerprint"], record.get("params") or [])
+            due = start + (int(record["offset_ms"] / speed * 1e6) if speed > 0 else 0)
+            delay = (due - time.perf_counter_ns()) / 1e9
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_run, record, query, user_map[record["user"]], due)
+    wall_seconds = (time.perf_counter_ns() - start) / 1e9
+    middleware.flush_budget_commits()
+    return results, wall_seconds
+
+def summarize(results: list, wall_seconds: float, skipped: int = 0) -> dict:
+    """
+    Overall and per-fingerprint latency percentiles, throughput and outcome changes vs. the capture.
+    """
+    def _summary(items: list) -> dict:
+        errors = {}
+        for item in items:
+            if item["error"] is not None:
+                errors[item["error"]] = errors.get(item["error"], 0) + 1
+        summary = {
+            "requests": len(items),
+            "errors": errors,
+            # Requests whose outcome (success or exception type) differs from the captured one
+            "outcome_changes": sum(1 for item in items if item["error"] != item["captured_error"]),
+        }
+        summary.update(percentiles([item["latency_ns"] for item in items]))
+        return summary
+
+    overall = _summary(results)
+    overall["throughput_rps"] = len(results) / wall_seconds if wall_seconds else None
+    overall["max_start_lag_ms"] = max((item["start_lag_ms"] for item in results), default=0.0)
+    overall["skipped"] = skipped
+
+    by_fingerprint = {}
+    for item in results:
+        by_fingerprint.setdefault(item["fingerprint"], []).append(item)
+    return {"overall": overall, "fingerprints": {fp: _summary(items) for fp, items in by_fingerprint.items()}}
+
+def compare_runs(baseline: dict, current: dict, tolerance: float = 0.2, min_delta_ms: float = 0.5) -> dict:
+    """
+    Latency and throughput differences between two replay summaries (e.g. two builds).
+    A fingerprint regresses when its p95 grows by more than `tolerance` and min_delta_ms.
+    """
+    def _delta(old, new):
+        if old is None or new is None:
+            return None
+        return {"baseline": old, "current": new, "change": (new - old) / old if old else None}
+
+    diff = {
+        "p50_ms": _delta(baseline["overall"].get("p50_ms"), current["overall"].get("p50_ms")),
+        "p95_ms": _delta(baseline["overall"].get("p95_ms"), current["overall"].get("p95_ms")),
+        "p99_ms": _delta(baseline["overall"].get("p99_ms"), current["overall"].get("p99_ms")),
+        "throughput_rps": _delta(baseline["overall"].get("throughput_rps"), current["overall"].get("throughput_rps")),
+    }
+
+    regressions = []
+    for fp, case in current["fingerprints"].items():
+        old = baseline["fingerprints"].get(fp)
+        if not old or old.get("p95_ms") is None or case.get("p95_ms") is None:
+            continue
+        delta = case["p95_ms"] - old["p95_ms"]
+        if delta > min_delta_ms and case["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append({"fingerprint": fp, "baseline_p95_ms": old["p95_ms"], "current_p95_ms": case["p95_ms"]})
+        if case["errors"] != old["errors"]:
+            regressions.append({"fingerprint": fp, "baseline_errors": old["errors"], "current_errors": case["errors"]})
+    return {"overall": diff, "regressions": regressions}
+
+def write_report(results: dict, report_file: str = REPORT_FILE):
+    """
+    Merges the results into the metrics JSON consumed by run_test.generate_report.
+    """
+    metrics = {}
+    if os.path.exists(report_file):
+        with open(report_file, 'r') as f:
+            metrics = json.load(f)
+    metrics['replay'] = results
+    with open(report_file, 'w') as f:
+        json.dump(metrics, f, indent=4)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a captured workload (CAPTURE_FILE) against the local database")
+    parser.add_argument("capture", type=str, help="Captured workload (JSONL)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay rate relative to the capture (default: 1.0; 0 = as fast as possible)")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent requests at most (default: 16; 1 = reproducible noise)")
+    parser.add_argument("--seed", type=int, default=7, help="Noise RNG seed (default: 7)")
+    parser.add_argument("--budget", type=float, help="Reset the replayed users' budgets to this value first (default: leave them unchanged)")
+    parser.add_argument("--patients", type=int, help="Reseed hospital_db with this many synthetic patients first (requires --reseed)")
+    parser.add_argument("--reseed", action="store_true", help="Allow dropping and reseeding hospital_db")
+    parser.add_argument("--baseline", type=str, help="Replay summary of another build to compare against")
+    parser.add_argument("--save_baseline", type=str, help="Write this replay summary for later comparisons")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown vs. baseline (default: 0.2 = 20%%)")
+    parser.add_argument("--report", type=str, default=REPORT_FILE, help=f"Metrics JSON to update (default: {REPORT_FILE})")
+    args = parser.parse_args(argv)
+
+    if args.patients is not None and not args.reseed:
+        parser.error("--patients drops and reseeds hospital_db; pass --reseed to confirm.")
+    if args.patients is not None:
+        import seed_db
+        seed_db.seed_database(n_patients=args.patients)
+
+    records = load_capture(args.capture)
+    replayable, skipped = split_replayable(records)
+    users_by_role = load_users_by_role()
+    if not users_by_role:
+        print("No users found in staffs table.")
+        return 1
+    user_map = assign_users(replayable, users_by_role)
+
+    users = sorted(set(user_map.values()))
+    if users and args.budget is not None:
+        placeholders = ', '.join(['%s'] * len(users))
+        execute_query(f"UPDATE staffs SET privacy_budget = %s WHERE national_id IN ({placeholders})", (args.budget, *users))
+
+    from src.main import get_middleware, budget_tracker
+    middleware = get_middleware()
+    middleware.budget_accountant = budget_tracker
+
+    rate = f"{args.speed}x" if args.speed > 0 else "max rate"
+    print(f"Replaying {len(replayable)} requests from {len(user_map)} users at {rate} ({args.workers} workers)...")
+    results, wall_seconds = replay(middleware, replayable, user_map, args.speed, args.workers, args.seed)
+    summary = summarize(results, wall_seconds, skipped=skipped)
+    overall = summary["overall"]
+    print(f"p50={overall['p50_ms'] or 0:.3f}ms p95={overall['p95_ms'] or 0:.3f}ms p99={overall['p99_ms'] or 0:.3f}ms "
+          f"rps={overall['throughput_rps'] or 0:.1f} outcome_changes={overall['outcome_changes']} skipped={overall['skipped']}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        summary["comparison"] = compare_runs(baseline, summary, args.tolerance)
+        for metric, delta in summary["comparison"]["overall"].items():
+            if delta and delta["change"] is not None:
+                print(f"{metric:<15} {delta['baseline']:10.3f} -> {delta['current']:10.3f} ({delta['change']:+.1%})")
+        for regression in summary["comparison"]["regressions"]:
+            print(f"REGRESSION: {regression}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({"overall": summary["overall"], "fingerprints": summary["fingerprints"]}, f, indent=4)
+
+    write_report(summary, args.report)
+    return 1 if summary.get("comparison", {}).get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -39,8 +39,12 @@ def generate_report():
             "system_performance": {
                 "avg_raw_execution_ms": metrics.get('perf_avg_raw_ms'),
                 "avg_secure_execution_ms": metrics.get('perf_avg_secure_ms'),
-                "overhead_latency_factor": metrics.get('perf_overhead_factor')
-            }
+                "overhead_latency_factor": metrics.get('perf_overhead_factor'),
+                "latency_p50_ms": metrics.get('perf_secure_p50_ms'),
+                "latency_p95_ms": metrics.get('perf_secure_p95_ms'),
+                "latency_p99_ms": metrics.get('perf_secure_p99_ms')
+            },
+            "benchmark_suite": metrics.get('benchmarks')
         }
 
         with open(report_file, 'w') as f:
@@ -51,11 +55,24 @@ def generate_report():
         print(f"Error generating report: {e}")
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the test-suite and build the report")
+    parser.add_argument("--benchmark", action="store_true", help="Also run benchmark.py and include its results")
+    args = parser.parse_args()
+
     # Run pytest
     try:
         subprocess.run([sys.executable, "-m", "pytest", "tests"], capture_output=False)
     except Exception as e:
         print(f"Error running tests: {e}")
+
+    # Run benchmark suite (merges into the same report file)
+    if args.benchmark:
+        try:
+            subprocess.run([sys.executable, "benchmark.py"], capture_output=False)
+        except Exception as e:
+            print(f"Error running benchmarks: {e}")
         
     # Generate Report
     try:
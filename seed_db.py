@@ -1,5 +1,9 @@
 import pymysql
 import os
+import csv
+import tempfile
+import numpy as np
+from datetime import date, timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,140 +14,498 @@ DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
 DB_PORT = int(os.getenv("DB_PORT", 3306))
 
-def seed_database():
+# Synthetic Data Configuration
+# Ages are computed against the same reference date as the generated `age` column.
+REFERENCE_DATE = date(2026, 1, 1)
+
+# Synthetic patients never fall into the [0, 10) age bucket, so the 3 fixture infants
+# always remain a cohort below k=5 regardless of table size.
+MIN_SYNTHETIC_AGE = 10
+
+# Dates used by the fixtures/tests to single out individuals; never generated synthetically.
+RESERVED_DOBS = {date(1980, 1, 15)}
+
+DEFAULT_AGE_DISTRIBUTION = {(10, 20): 0.15, (20, 40): 0.30, (40, 60): 0.30, (60, 95): 0.25}
+DEFAULT_GENDER_DISTRIBUTION = {'M': 0.49, 'F': 0.51}
+
+# Diseases that only appear a handful of times in the fixtures (rare cohorts) are excluded
+# from the synthetic mix, so they stay below k=5 at any scale.
+DEFAULT_DISEASE_DISTRIBUTION = {
+    'Hypertension': 0.20, 'Flu': 0.20, 'Common Cold': 0.15, 'Diabetes Type 2': 0.12,
+    'Migraine': 0.10, 'Pneumonia': 0.08, 'Fever': 0.08, 'Headache': 0.07
+}
+RARE_FIXTURE_DISEASES = {'Arrhythmia', 'Breast Cancer', 'Lung Cancer', 'Stroke', 'Acne', 'Eczema'}
+
+SYNTHETIC_ADDRESSES = ["District 1, HCM", "Hoan Kiem, Hanoi", "Hai Chau, Da Nang", "Ninh Kieu, Can Tho", "Le Chan, Hai Phong"]
+SYNTHETIC_ID_OFFSET = 900000000000
+
+def create_schema(cursor):
+    """
+    (Re)creates the hospital_db database and its tables.
+    """
+    cursor.execute("DROP DATABASE IF EXISTS hospital_db")
+    cursor.execute("CREATE DATABASE hospital_db")
+    cursor.execute("USE hospital_db")
+
+    # Create Staffs Table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS staffs (
+            staff_id INT PRIMARY KEY,
+            role VARCHAR(50),
+            national_id CHAR(12) UNIQUE,
+            full_name VARCHAR(100),
+            dob DATE,
+            age INT GENERATED ALWAYS AS (TIMESTAMPDIFF(YEAR, dob, '2026-01-01')) VIRTUAL,
+            gender VARCHAR(10),
+            address VARCHAR(255),
+            specialization VARCHAR(100),
+            privacy_budget FLOAT DEFAULT 10.0
+        )
+    """)
+
+    # Create Patients Table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS patients (
+            patient_id INT PRIMARY KEY,
+            national_id CHAR(12) UNIQUE,
+            full_name VARCHAR(100),
+            dob DATE,
+            age INT GENERATED ALWAYS AS (TIMESTAMPDIFF(YEAR, dob, '2026-01-01')) VIRTUAL,
+            gender VARCHAR(10),
+            address VARCHAR(255)
+        )
+    """)
+
+    # Create Diagnoses Table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS diagnoses (
+            diagnosis_id INT PRIMARY KEY,
+            patient_id INT,
+            staff_id INT,
+            disease_name VARCHAR(100),
+            visit_date DATE,
+            FOREIGN KEY (patient_id) REFERENCES patients(patient_id),
+            FOREIGN KEY (staff_id) REFERENCES staffs(staff_id)
+        )
+    """)
+
+    # Create Audit Log Table (written by src.audit with AUDIT_SINK=db)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS audit_log (
+            audit_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            logged_at DATETIME(6),
+            user_id VARCHAR(64),
+            role VARCHAR(50),
+            decision VARCHAR(16),
+            reason TEXT,
+            original_sql TEXT,
+            executed_sql TEXT,
+            epsilon_requested DOUBLE,
+            epsilon_charged DOUBLE,
+            total_ms DOUBLE,
+            INDEX idx_audit_user_time (user_id, logged_at)
+        )
+    """)
+
+def create_summary_tables(cursor):
+    """
+    Creates the summary tables the rewriter routes aggregates to (SUMMARY_ROUTING=1), fills them
+    from the current rows and installs the triggers keeping them current on INSERT/UPDATE/DELETE.
+    Run it while nothing writes to patients or diagnoses. TRUNCATE does not fire triggers.
+    """
+    for trigger in ("patients_summary_insert", "patients_summary_update", "patients_summary_delete",
+                    "diagnoses_summary_insert", "diagnoses_summary_update", "diagnoses_summary_delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for procedure in ("patients_summary_apply", "diagnoses_summary_apply"):
+        cursor.execute(f"DROP PROCEDURE IF EXISTS {procedure}")
+    for table in ("patients_summary", "diagnoses_summary", "diagnoses_patients"):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+    # Patients per (10-year age bucket, gender), with the age count and sum for SUM/AVG(age).
+    # NULL keys never collide in the unique keys; their deltas are kept as separate rows, the sums stay exact.
+    cursor.execute("""
+        CREATE TABLE patients_summary (
+            age_bucket INT,
+            gender VARCHAR(10),
+            row_count BIGINT NOT NULL,
+            age_count BIGINT NOT NULL,
+            age_sum BIGINT NOT NULL,
+            UNIQUE KEY uq_patients_summary (age_bucket, gender)
+        )
+    """)
+
+    # Diagnoses and distinct patients per disease; diagnoses_patients tracks each patient's diagnoses
+    # per disease, so the distinct patient count changes only on a patient's first and last diagnosis.
+    cursor.execute("""
+        CREATE TABLE diagnoses_summary (
+            disease_name VARCHAR(100),
+            row_count BIGINT NOT NULL,
+            patient_count BIGINT NOT NULL,
+            UNIQUE KEY uq_diagnoses_summary (disease_name)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE diagnoses_patients (
+            disease_name VARCHAR(100),
+            patient_id INT NOT NULL,
+            row_count BIGINT NOT NULL,
+            UNIQUE KEY uq_diagnoses_patients (disease_name, patient_id)
+        )
+    """)
+
+    cursor.execute("""
+        INSERT INTO patients_summary (age_bucket, gender, row_count, age_count, age_sum)
+        SELECT FLOOR(age / 10) * 10, gender, COUNT(*), COUNT(age), COALESCE(SUM(age), 0)
+        FROM patients GROUP BY FLOOR(age / 10) * 10, gender
+    """)
+    cursor.execute("""
+        INSERT INTO diagnoses_patients (disease_name, patient_id, row_count)
+        SELECT disease_name, patient_id, COUNT(*) FROM diagnoses WHERE patient_id IS NOT NULL GROUP BY disease_name, patient_id
+    """)
+    cursor.execute("""
+        INSERT INTO diagnoses_summary (disease_name, row_count, patient_count)
+        SELECT disease_name, COUNT(*), COUNT(DISTINCT patient_id) FROM diagnoses GROUP BY disease_name
+    """)
+
+    # Adds (delta=1) or removes (delta=-1) one row to/from the summaries
+    cursor.execute("""
+        CREATE PROCEDURE patients_summary_apply(p_dob DATE, p_gender VARCHAR(10), p_delta INT)
+        BEGIN
+            DECLARE p_age INT DEFAULT TIMESTAMPDIFF(YEAR, p_dob, '2026-01-01');
+            DECLARE p_bucket INT DEFAULT FLOOR(TIMESTAMPDIFF(YEAR, p_dob, '2026-01-01') / 10) * 10;
+            INSERT INTO patients_summary (age_bucket, gender, row_count, age_count, age_sum)
+                VALUES (p_bucket, p_gender, p_delta, IF(p_age IS NULL, 0, p_delta), IFNULL(p_age, 0) * p_delta)
+                ON DUPLICATE KEY UPDATE row_count = row_count + p_delta,
+                                        age_count = age_count + IF(p_age IS NULL, 0, p_delta),
+                                        age_sum = age_sum + IFNULL(p_age, 0) * p_delta;
+            DELETE FROM patients_summary WHERE age_bucket <=> p_bucket AND gender <=> p_gender AND row_count = 0;
+        END
+    """)
+    cursor.execute("""
+        CREATE PROCEDURE diagnoses_summary_apply(p_disease VARCHAR(100), p_patient INT, p_delta INT)
+        BEGIN
+            DECLARE p_diagnoses BIGINT DEFAULT 0;
+            DECLARE p_patient_delta INT DEFAULT 0;
+            IF p_patient IS NOT NULL THEN
+                INSERT INTO diagnoses_patients (disease_name, patient_id, row_count) VALUES (p_disease, p_patient, p_delta)
+                    ON DUPLICATE KEY UPDATE row_count = row_count + p_delta;
+                SELECT COALESCE(SUM(row_count), 0) INTO p_diagnoses FROM diagnoses_patients
+                    WHERE disease_name <=> p_disease AND patient_id = p_patient;
+                IF (p_delta > 0 AND p_diagnoses = p_delta) OR (p_delta < 0 AND p_diagnoses = 0) THEN
+                    SET p_patient_delta = SIGN(p_delta);
+                END IF;
+                DELETE FROM diagnoses_patients WHERE disease_name <=> p_disease AND patient_id = p_patient AND row_count = 0;
+            END IF;
+            INSERT INTO diagnoses_summary (disease_name, row_count, patient_count) VALUES (p_disease, p_delta, p_patient_delta)
+                ON DUPLICATE KEY UPDATE row_count = row_count + p_delta, patient_count = patient_count + p_patient_delta;
+            DELETE FROM diagnoses_summary WHERE disease_name <=> p_disease AND row_count = 0;
+        END
+    """)
+
+    cursor.execute("CREATE TRIGGER patients_summary_insert AFTER INSERT ON patients FOR EACH ROW CALL patients_summary_apply(NEW.dob, NEW.gender, 1)")
+    cursor.execute("CREATE TRIGGER patients_summary_delete AFTER DELETE ON patients FOR EACH ROW CALL patients_summary_apply(OLD.dob, OLD.gender, -1)")
+    cursor.execute("""
+        CREATE TRIGGER patients_summary_update AFTER UPDATE ON patients FOR EACH ROW
+        BEGIN
+            IF NOT (OLD.dob <=> NEW.dob AND OLD.gender <=> NEW.gender) THEN
+                CALL patients_summary_apply(OLD.dob, OLD.gender, -1);
+                CALL patients_summary_apply(NEW.dob, NEW.gender, 1);
+            END IF;
+        END
+    """)
+    cursor.execute("CREATE TRIGGER diagnoses_summary_insert AFTER INSERT ON diagnoses FOR EACH ROW CALL diagnoses_summary_apply(NEW.disease_name, NEW.patient_id, 1)")
+    cursor.execute("CREATE TRIGGER diagnoses_summary_delete AFTER DELETE ON diagnoses FOR EACH ROW CALL diagnoses_summary_apply(OLD.disease_name, OLD.patient_id, -1)")
+    cursor.execute("""
+        CREATE TRIGGER diagnoses_summary_update AFTER UPDATE ON diagnoses FOR EACH ROW
+        BEGIN
+            IF NOT (OLD.disease_name <=> NEW.disease_name AND OLD.patient_id <=> NEW.patient_id) THEN
+                CALL diagnoses_summary_apply(OLD.disease_name, OLD.patient_id, -1);
+                CALL diagnoses_summary_apply(NEW.disease_name, NEW.patient_id, 1);
+            END IF;
+        END
+    """)
+
+def seed_fixtures(cursor):
+    """
+    Inserts the fixed staff, patients and diagnoses the test-suite relies on.
+    """
+    # Seed Staffs
+    staffs_data = [
+        (1, 'doctor', '001080000001', 'Nguyen Van Minh', '1980-01-15', 'M', '123 Le Loi, Hanoi', 'Cardiology', 50.0),
+        (2, 'employee', '001082000002', 'Tran Thi Mai', '1982-05-20', 'F', '456 Nguyen Hue, HCM', 'Accountant', 5.0),
+        (3, 'researcher', '001075000003', 'Le Van Hung', '1975-11-10', 'M', '789 Tran Hung Dao, Da Nang', 'Data Science', 20.0),
+        (4, 'manager', '001088000004', 'Pham Thi Lan', '1988-03-25', 'F', '321 Ba Trieu, Hanoi', 'Management', 100.0),
+        (5, 'doctor', '001085000005', 'Hoang Van Tien', '1985-09-09', 'M', '555 Giai Phong, Hanoi', 'Neurology', 10.0),
+        (6, 'employee', '001090000006', 'Nguyen Thi Hoa', '1990-12-12', 'F', '888 Lang, Hanoi', 'Cashier', 5.0),
+        (7, 'employee', '001092000007', 'Vu Van Nam', '1992-06-15', 'M', '222 Tay Son, Hanoi', 'Security', 0.0),
+        (8, 'doctor', '001078000008', 'Do Lan Huong', '1978-04-30', 'F', '101 Kim Ma, Hanoi', 'Pediatrics', 10.0),
+        (9, 'employee', '001086000009', 'Le Thi Thu', '1986-07-20', 'F', '999 Giang Vo, Hanoi', 'Accountant', 5.0)
+    ]
+
+    cursor.executemany("INSERT INTO staffs (staff_id, role, national_id, full_name, dob, gender, address, specialization, privacy_budget) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)", staffs_data)
+
+    # Seed Patients
+    patients_data = []
+
+    # Group 1: Seniors (Age 75) - 20 people
+    # IDs 1-20. Born 1950.
+    for i in range(1, 21):
+        patients_data.append((
+            i, f"0011950000{i:02d}", f"Senior Patient {i}", "1950-06-01", 'M' if i%2==0 else 'F', "Nursing Home A"
+        ))
+
+    # Group 2: Adults (Age 45) - 20 people
+    # IDs 21-40. Born 1980.
+    for i in range(21, 41):
+        patients_data.append((
+            i, f"0011980000{i:02d}", f"Adult Patient {i}", "1980-06-01", 'M' if i%2==0 else 'F', "Office Block B"
+        ))
+
+    # Group 3: Youth (Age 20) - 17 people
+    # IDs 41-57. Born 2005.
+    for i in range(41, 58):
+        patients_data.append((
+            i, f"0012005000{i:02d}", f"Youth Patient {i}", "2005-06-01", 'M' if i%2==0 else 'F', "School C"
+        ))
+
+    # Group 4: Infant (Age 1) - Only 3 people
+    # IDs 58-60. Born 2025.
+    for i in range(58, 61):
+        patients_data.append((
+           i, f"0012025000{i:02d}", f"Infant Patient {i}", "2025-01-01", 'M' if i%2==0 else 'F', "Nursery D"
+        ))
+
+    cursor.executemany("INSERT INTO patients (patient_id, national_id, full_name, dob, gender, address) VALUES (%s, %s, %s, %s, %s, %s)", patients_data)
+
+    # Seed Diagnoses
+    diagnoses_data = [
+        (1, 1, 1, 'Hypertension', '2023-01-10'),
+        (2, 2, 2, 'Migraine', '2023-01-11'),
+        (3, 3, 3, 'Flu', '2023-01-12'),
+        (4, 4, 4, 'Breast Cancer', '2023-01-13'),
+        (5, 5, 5, 'Acne', '2023-01-14'),
+        (6, 1, 1, 'Hypertension', '2023-02-10'),
+        (7, 2, 2, 'Stroke', '2023-02-11'),
+        (8, 3, 3, 'Common Cold', '2023-02-12'),
+        (9, 4, 4, 'Lung Cancer', '2023-02-13'),
+        (10, 5, 5, 'Eczema', '2023-02-14'),
+        (11, 1, 2, 'Headache', '2023-03-01'),
+        (12, 2, 1, 'Diabetes Type 2', '2023-03-02'),
+        (13, 4, 3, 'Pneumonia', '2023-03-03'),
+        (14, 3, 4, 'Fever', '2023-03-04'),
+        (15, 1, 5, 'Arrhythmia', '2023-03-05')
+    ]
+
+    cursor.executemany("INSERT INTO diagnoses VALUES (%s, %s, %s, %s, %s)", diagnoses_data)
+
+    # (fixture patients, fixture diagnoses, fixture staffs)
+    return len(patients_data), len(diagnoses_data), len(staffs_data)
+
+def _validate_distributions(age_distribution, disease_distribution):
+    for low, high in age_distribution:
+        if low < MIN_SYNTHETIC_AGE or high <= low:
+            raise ValueError(f"Invalid age range ({low}, {high}): synthetic ages must satisfy {MIN_SYNTHETIC_AGE} <= low < high.")
+    rare = RARE_FIXTURE_DISEASES.intersection(disease_distribution)
+    if rare:
+        raise ValueError(f"Diseases {sorted(rare)} are reserved as rare fixture cohorts and cannot be generated.")
+
+def _normalized(distribution: dict):
+    keys = list(distribution.keys())
+    weights = np.array([distribution[k] for k in keys], dtype=float)
+    return keys, weights / weights.sum()
+
+def _generate_patient_chunk(rng, first_id: int, n: int, age_distribution: dict, gender_distribution: dict):
+    """
+    Generates n synthetic patient rows starting at patient_id first_id.
+    """
+    ranges, age_weights = _normalized(age_distribution)
+    genders, gender_weights = _normalized(gender_distribution)
+
+    range_idx = rng.choice(len(ranges), size=n, p=age_weights)
+    lows = np.array([r[0] for r in ranges])[range_idx]
+    highs = np.array([r[1] for r in ranges])[range_idx]
+
+    # Pick an age in [low, high), then a birthday between Jan 2 and Dec 31 of the matching year,
+    # so TIMESTAMPDIFF(YEAR, dob, REFERENCE_DATE) is exactly that age.
+    ages = rng.integers(lows, highs)
+    birth_years = (REFERENCE_DATE.year - 1 - ages - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+    dobs = birth_years + (1 + rng.integers(0, 364, size=n)).astype('timedelta64[D]')
+    gender_values = np.array(genders)[rng.choice(len(genders), size=n, p=gender_weights)]
+    addresses = np.array(SYNTHETIC_ADDRESSES)[rng.integers(0, len(SYNTHETIC_ADDRESSES), size=n)]
+
+    rows = []
+    for offset, (dob, gender, address) in enumerate(zip(dobs.astype(object), gender_values, addresses)):
+        if dob in RESERVED_DOBS:
+            dob += timedelta(days=1)
+        patient_id = first_id + offset
+        rows.append((patient_id, str(SYNTHETIC_ID_OFFSET + patient_id), f"Synthetic Patient {patient_id}", dob.isoformat(), str(gender), str(address)))
+    return rows
+
+def _generate_diagnosis_chunk(rng, first_id: int, n: int, max_patient_id: int, n_staffs: int, disease_distribution: dict):
+    """
+    Generates n synthetic diagnosis rows for synthetic patients (IDs above the fixtures).
+    """
+    diseases, disease_weights = _normalized(disease_distribution)
+
+    patient_ids = rng.integers(61, max_patient_id + 1, size=n)
+    staff_ids = rng.integers(1, n_staffs + 1, size=n)
+    disease_values = np.array(diseases)[rng.choice(len(diseases), size=n, p=disease_weights)]
+    visit_dates = np.datetime64('2023-01-01') + rng.integers(0, 3 * 365, size=n).astype('timedelta64[D]')
+
+    return [
+        (first_id + offset, int(patient_id), int(staff_id), str(disease), str(visit_date))
+        for offset, (patient_id, staff_id, disease, visit_date) in enumerate(zip(patient_ids, staff_ids, disease_values, visit_dates))
+    ]
+
+def _bulk_load(conn, table: str, columns: tuple, rows: list, method: str):
+    """
+    Loads one chunk with a multi-row INSERT (executemany) or LOAD DATA LOCAL INFILE from a CSV file.
+    """
+    with conn.cursor() as cursor:
+        if method == "csv":
+            with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as f:
+                csv.writer(f, lineterminator="\n").writerows(rows)
+                path = f.name
+            try:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                    f"LINES TERMINATED BY '\\n' ({', '.join(columns)})",
+                    (path,)
+                )
+            finally:
+                os.remove(path)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+    conn.commit()
+
+def generate_synthetic_data(conn, n_patients: int, seed: int = 42, chunk_size: int = 50000, method: str = "executemany",
+                            diagnoses_per_patient: float = 1.5, age_distribution: dict = None,
+                            gender_distribution: dict = None, disease_distribution: dict = None,
+                            first_patient_id: int = 61, first_diagnosis_id: int = 16, n_staffs: int = 9):
+    """
+    Appends n_patients synthetic patients (and ~diagnoses_per_patient diagnoses each) in chunked bulk loads.
+    The same seed always produces the same data.
+    """
+    age_distribution = age_distribution or DEFAULT_AGE_DISTRIBUTION
+    gender_distribution = gender_distribution or DEFAULT_GENDER_DISTRIBUTION
+    disease_distribution = disease_distribution or DEFAULT_DISEASE_DISTRIBUTION
+    _validate_distributions(age_distribution, disease_distribution)
+
+    rng = np.random.default_rng(seed)
+
+    with conn.cursor() as cursor:
+        # Relax per-row checks for the bulk load; keys are generated unique and consistent.
+        cursor.execute("SET unique_checks = 0")
+        cursor.execute("SET foreign_key_checks = 0")
+
+    try:
+        loaded = 0
+        while loaded < n_patients:
+            n = min(chunk_size, n_patients - loaded)
+            rows = _generate_patient_chunk(rng, first_patient_id + loaded, n, age_distribution, gender_distribution)
+            _bulk_load(conn, "patients", ("patient_id", "national_id", "full_name", "dob", "gender", "address"), rows, method)
+            loaded += n
+            print(f"  patients: {loaded}/{n_patients}")
+
+        max_patient_id = first_patient_id + n_patients - 1
+        n_diagnoses = int(n_patients * diagnoses_per_patient) if n_patients else 0
+        loaded = 0
+        while loaded < n_diagnoses:
+            n = min(chunk_size, n_diagnoses - loaded)
+            rows = _generate_diagnosis_chunk(rng, first_diagnosis_id + loaded, n, max_patient_id, n_staffs, disease_distribution)
+            _bulk_load(conn, "diagnoses", ("diagnosis_id", "patient_id", "staff_id", "disease_name", "visit_date"), rows, method)
+            loaded += n
+            print(f"  diagnoses: {loaded}/{n_diagnoses}")
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SET unique_checks = 1")
+            cursor.execute("SET foreign_key_checks = 1")
+
+    return n_patients, n_diagnoses
+
+def seed_database(n_patients: int = 0, seed: int = 42, chunk_size: int = 50000, method: str = "executemany",
+                  diagnoses_per_patient: float = 1.5, age_distribution: dict = None,
+                  gender_distribution: dict = None, disease_distribution: dict = None, summary_tables: bool = False):
+    """
+    Recreates hospital_db with the fixtures, then optionally adds n_patients synthetic patients.
+    With summary_tables, the trigger-maintained summary tables are created after the bulk load.
+    """
     # Connect to MySQL server
     conn = pymysql.connect(
         host=DB_HOST,
         user=DB_USER,
         password=DB_PASSWORD,
-        port=DB_PORT
+        port=DB_PORT,
+        local_infile=(method == "csv")
     )
-    
+
     try:
         with conn.cursor() as cursor:
-            # Create Database
-            cursor.execute("DROP DATABASE IF EXISTS hospital_db")
-            cursor.execute("CREATE DATABASE hospital_db")
-            cursor.execute("USE hospital_db")
-            
-            # Create Staffs Table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS staffs (
-                    staff_id INT PRIMARY KEY,
-                    role VARCHAR(50),
-                    national_id CHAR(12) UNIQUE,
-                    full_name VARCHAR(100),
-                    dob DATE,
-                    age INT GENERATED ALWAYS AS (TIMESTAMPDIFF(YEAR, dob, '2026-01-01')) VIRTUAL,
-                    gender VARCHAR(10),
-                    address VARCHAR(255),
-                    specialization VARCHAR(100),
-                    privacy_budget FLOAT DEFAULT 10.0
-                )
-            """)
-
-            # Create Patients Table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS patients (
-                    patient_id INT PRIMARY KEY,
-                    national_id CHAR(12) UNIQUE,
-                    full_name VARCHAR(100),
-                    dob DATE,
-                    age INT GENERATED ALWAYS AS (TIMESTAMPDIFF(YEAR, dob, '2026-01-01')) VIRTUAL,
-                    gender VARCHAR(10),
-                    address VARCHAR(255)
-                )
-            """)
-            
-            # Create Diagnoses Table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS diagnoses (
-                    diagnosis_id INT PRIMARY KEY,
-                    patient_id INT,
-                    staff_id INT,
-                    disease_name VARCHAR(100),
-                    visit_date DATE,
-                    FOREIGN KEY (patient_id) REFERENCES patients(patient_id),
-                    FOREIGN KEY (staff_id) REFERENCES staffs(staff_id)
-                )
-            """)
-            
-            # Seed Staffs
-            staffs_data = [
-                (1, 'doctor', '001080000001', 'Nguyen Van Minh', '1980-01-15', 'M', '123 Le Loi, Hanoi', 'Cardiology', 50.0),
-                (2, 'employee', '001082000002', 'Tran Thi Mai', '1982-05-20', 'F', '456 Nguyen Hue, HCM', 'Accountant', 5.0),
-                (3, 'researcher', '001075000003', 'Le Van Hung', '1975-11-10', 'M', '789 Tran Hung Dao, Da Nang', 'Data Science', 20.0),
-                (4, 'manager', '001088000004', 'Pham Thi Lan', '1988-03-25', 'F', '321 Ba Trieu, Hanoi', 'Management', 100.0),
-                (5, 'doctor', '001085000005', 'Hoang Van Tien', '1985-09-09', 'M', '555 Giai Phong, Hanoi', 'Neurology', 10.0),
-                (6, 'employee', '001090000006', 'Nguyen Thi Hoa', '1990-12-12', 'F', '888 Lang, Hanoi', 'Cashier', 5.0),
-                (7, 'employee', '001092000007', 'Vu Van Nam', '1992-06-15', 'M', '222 Tay Son, Hanoi', 'Security', 0.0),
-                (8, 'doctor', '001078000008', 'Do Lan Huong', '1978-04-30', 'F', '101 Kim Ma, Hanoi', 'Pediatrics', 10.0),
-                (9, 'employee', '001086000009', 'Le Thi Thu', '1986-07-20', 'F', '999 Giang Vo, Hanoi', 'Accountant', 5.0)
-            ]
-            
-            cursor.executemany("INSERT INTO staffs (staff_id, role, national_id, full_name, dob, gender, address, specialization, privacy_budget) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)", staffs_data)
-            
-            # Seed Patients
-            patients_data = []
-
-            # Group 1: Seniors (Age 75) - 20 people
-            # IDs 1-20. Born 1950.
-            for i in range(1, 21):
-                patients_data.append((
-                    i, f"0011950000{i:02d}", f"Senior Patient {i}", "1950-06-01", 'M' if i%2==0 else 'F', "Nursing Home A"
-                ))
-
-            # Group 2: Adults (Age 45) - 20 people
-            # IDs 21-40. Born 1980.
-            for i in range(21, 41):
-                patients_data.append((
-                    i, f"0011980000{i:02d}", f"Adult Patient {i}", "1980-06-01", 'M' if i%2==0 else 'F', "Office Block B"
-                ))
-
-            # Group 3: Youth (Age 20) - 17 people
-            # IDs 41-57. Born 2005.
-            for i in range(41, 58):
-                patients_data.append((
-                    i, f"0012005000{i:02d}", f"Youth Patient {i}", "2005-06-01", 'M' if i%2==0 else 'F', "School C"
-                ))
-
-            # Group 4: Infant (Age 1) - Only 3 people
-            # IDs 58-60. Born 2025.
-            for i in range(58, 61):
-                patients_data.append((
-                   i, f"0012025000{i:02d}", f"Infant Patient {i}", "2025-01-01", 'M' if i%2==0 else 'F', "Nursery D"
-                ))
-            
-            cursor.executemany("INSERT INTO patients (patient_id, national_id, full_name, dob, gender, address) VALUES (%s, %s, %s, %s, %s, %s)", patients_data)
-            
-            # Seed Diagnoses
-            diagnoses_data = [
-                (1, 1, 1, 'Hypertension', '2023-01-10'),
-                (2, 2, 2, 'Migraine', '2023-01-11'),
-                (3, 3, 3, 'Flu', '2023-01-12'),
-                (4, 4, 4, 'Breast Cancer', '2023-01-13'),
-                (5, 5, 5, 'Acne', '2023-01-14'),
-                (6, 1, 1, 'Hypertension', '2023-02-10'),
-                (7, 2, 2, 'Stroke', '2023-02-11'),
-                (8, 3, 3, 'Common Cold', '2023-02-12'),
-                (9, 4, 4, 'Lung Cancer', '2023-02-13'),
-                (10, 5, 5, 'Eczema', '2023-02-14'),
-                (11, 1, 2, 'Headache', '2023-03-01'),
-                (12, 2, 1, 'Diabetes Type 2', '2023-03-02'),
-                (13, 4, 3, 'Pneumonia', '2023-03-03'),
-                (14, 3, 4, 'Fever', '2023-03-04'),
-                (15, 1, 5, 'Arrhythmia', '2023-03-05')
-            ]
-
-            cursor.executemany("INSERT INTO diagnoses VALUES (%s, %s, %s, %s, %s)", diagnoses_data)
-            
+            create_schema(cursor)
+            n_fixture_patients, n_fixture_diagnoses, n_staffs = seed_fixtures(cursor)
         conn.commit()
+
+        if n_patients > 0:
+            print(f"Generating {n_patients} synthetic patients (seed={seed}, method={method})...")
+            generate_synthetic_data(
+                conn, n_patients, seed=seed, chunk_size=chunk_size, method=method,
+                diagnoses_per_patient=diagnoses_per_patient, age_distribution=age_distribution,
+                gender_distribution=gender_distribution, disease_distribution=disease_distribution,
+                first_patient_id=n_fixture_patients + 1, first_diagnosis_id=n_fixture_diagnoses + 1, n_staffs=n_staffs
+            )
+
+        if summary_tables:
+            with conn.cursor() as cursor:
+                create_summary_tables(cursor)
+            conn.commit()
+            print("Summary tables and triggers created.")
+
         print("Database 'hospital_db' seeded successfully.")
-        
+
     except Exception as e:
         print(f"Error seeding database: {e}")
     finally:
         conn.close()
 
+def _parse_distribution(text: str, range_keys: bool = False) -> dict:
+    """
+    Parses 'key:weight,key:weight'. With range_keys, keys are 'low-high' age ranges.
+    """
+    distribution = {}
+    for item in text.split(","):
+        key, weight = item.rsplit(":", 1)
+        key = key.strip()
+        if range_keys:
+            low, high = key.split("-")
+            key = (int(low), int(high))
+        distribution[key] = float(weight)
+    return distribution
+
 if __name__ == "__main__":
-    seed_database()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Seed hospital_db with fixtures and optional synthetic data")
+    parser.add_argument("--rows", type=int, default=0, help="Number of synthetic patients to generate (default: 0, fixtures only)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible data (default: 42)")
+    parser.add_argument("--chunk_size", type=int, default=50000, help="Rows per bulk load (default: 50000)")
+    parser.add_argument("--method", choices=["executemany", "csv"], default="executemany", help="Multi-row INSERT batches or LOAD DATA LOCAL INFILE")
+    parser.add_argument("--diagnoses_per_patient", type=float, default=1.5, help="Average synthetic diagnoses per patient (default: 1.5)")
+    parser.add_argument("--age_dist", type=str, help="Age ranges and weights, e.g. '10-20:0.2,20-60:0.5,60-95:0.3'")
+    parser.add_argument("--gender_dist", type=str, help="Gender weights, e.g. 'M:0.5,F:0.5'")
+    parser.add_argument("--disease_dist", type=str, help="Disease weights, e.g. 'Flu:3,Hypertension:2'")
+    parser.add_argument("--summary_tables", action="store_true", help="Create trigger-maintained summary tables (use with SUMMARY_ROUTING=1)")
+
+    args = parser.parse_args()
+
+    seed_database(
+        n_patients=args.rows,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+        method=args.method,
+        diagnoses_per_patient=args.diagnoses_per_patient,
+        age_distribution=_parse_distribution(args.age_dist, range_keys=True) if args.age_dist else None,
+        gender_distribution=_parse_distribution(args.gender_dist) if args.gender_dist else None,
+        disease_distribution=_parse_distribution(args.disease_dist) if args.disease_dist else None,
+        summary_tables=args.summary_tables
+    )
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from src.db_connector import execute_query, DB_POOL_SIZE
+from src.pipeline.rewriter import rewrite_for_count
+
+# Admission Control Configuration
+# Cost units running at once; below the pool size so budget commits and background refreshes still get connections
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", max(1, DB_POOL_SIZE - 2)))
+ADMISSION_MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", 4))                # in-flight requests per user
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 64))                   # requests allowed to wait
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 5))             # seconds a request may wait
+# Cost weighting: one extra cost unit per this many rows MySQL expects to examine (0 = every request costs 1)
+ADMISSION_ROWS_PER_UNIT = int(os.getenv("ADMISSION_ROWS_PER_UNIT", 0))
+
+class AdmissionRejectedException(Exception):
+    pass
+
+class AdmissionController:
+    """
+    Bounds the database work of the middleware:
+    - at most `max_per_user` in-flight requests per user (rejected immediately above it),
+    - at most `max_concurrent` cost units executing at once,
+    - at most `queue_size` requests waiting for capacity, each for at most `queue_timeout` seconds.
+    Full queues and expired waits raise AdmissionRejectedException instead of piling up latency.
+    """
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, max_per_user: int = ADMISSION_MAX_PER_USER,
+                 queue_size: int = ADMISSION_QUEUE_SIZE, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+                 rows_per_unit: int = ADMISSION_ROWS_PER_UNIT):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rows_per_unit = rows_per_unit
+
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._per_user = {}
+
+    def estimate_cost(self, sql: str, dialect: str = "mysql") -> int:
+        """
+        Weights a request by the row estimate of MySQL's EXPLAIN for its cohort query.
+        Returns 1 when weighting is disabled or the estimate is unavailable.
+        """
+        if self.rows_per_unit <= 0 or dialect != "mysql":
+            return 1
+        try:
+            plan = execute_query(f"EXPLAIN {rewrite_for_count(sql)}", read_only=True)
+            rows = sum(int(row.get("rows") or 0) for row in plan)
+        except Exception:
+            return 1
+        return 1 + rows // self.rows_per_unit
+
+    def acquire(self, user_id: str, cost: int = 1) -> tuple:
+        """
+        Waits for capacity and returns a ticket for release().
+        """
+        # A request heavier than the whole capacity still runs, but alone
+        cost = max(1, min(int(cost), self.max_concurrent))
+
+        with self._cond:
+            if self._per_user.get(user_id, 0) >= self.max_per_user:
+                raise AdmissionRejectedException(f"Too many concurrent queries for user '{user_id}' (limit {self.max_per_user}).")
+
+            self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+            try:
+                self._wait_for_capacity(cost)
+            except AdmissionRejectedException:
+                self._release_user(user_id)
+                raise
+            self._running += cost
+        return (user_id, cost)
+
+    def reweigh(self, ticket: tuple, cost: int) -> tuple:
+        """
+        Charges an admitted request its estimated cost and returns the new ticket for release().
+        If the extra units do not fit, the request gives its units back and waits for the full cost
+        like acquire(), so call it without holding a connection. When the wait fails, the old ticket
+        is still the one to release.
+        """
+        user_id, current = ticket
+        cost = max(1, min(int(cost), self.max_concurrent))
+        if cost <= current:
+            return ticket
+        with self._cond:
+            # Waiting while holding units could deadlock two heavy requests
+            self._running -= current
+            self._cond.notify_all()
+            try:
+                self._wait_for_capacity(cost)
+            except AdmissionRejectedException:
+                self._running += current
+                raise
+            self._running += cost
+        return (user_id, cost)
+
+    def _wait_for_capacity(self, cost: int):
+        # Called holding self._cond
+        if self._running + cost <= self.max_concurrent:
+            return
+        if self._waiting >= self.queue_size:
+            raise AdmissionRejectedException("Server is overloaded: admission queue is full.")
+
+        self._waiting += 1
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            while self._running + cost > self.max_concurrent:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AdmissionRejectedException(f"Server is overloaded: no capacity within {self.queue_timeout}s.")
+                self._cond.wait(remaining)
+        finally:
+            self._waiting -= 1
+
+    def release(self, ticket: tuple):
+        user_id, cost = ticket
+        with self._cond:
+            self._running -= cost
+            self._release_user(user_id)
+            self._cond.notify_all()
+
+    def _release_user(self, user_id: str):
+        count = self._per_user.get(user_id, 0) - 1
+        if count > 0:
+            self._per_user[user_id] = count
+        else:
+            self._per_user.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"running": self._running, "waiting": self._waiting, "users": len(self._per_user)}
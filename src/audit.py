@@ -0,0 +1,340 @@
+import os
+import json
+import atexit
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from src.db_connector import get_connection, QueryTimeoutException, PoolTimeoutException
+from src.pipeline.sanitizer import SecurityException
+from src.pipeline.privacy_guard import PrivacyViolationException
+from src.pipeline.budget import BudgetExhaustedException
+from src.admission import AdmissionRejectedException
+from src import metrics
+
+# Audit Log Configuration (sink unset = disabled)
+AUDIT_SINK = os.getenv("AUDIT_SINK", "")                      # "file" (rotating JSONL) or "db" (audit_log table)
+AUDIT_LOG = os.getenv("AUDIT_LOG", "audit.jsonl")
+AUDIT_MAX_BYTES = int(os.getenv("AUDIT_MAX_BYTES", 64 * 1024 * 1024)) # rotate the file above this size (0 = never)
+AUDIT_BACKUP_COUNT = int(os.getenv("AUDIT_BACKUP_COUNT", 10))          # rotated files kept (audit.jsonl.1 .. .N)
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", 10000))         # records held in memory at most
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 500))             # records per write / INSERT
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))   # seconds a record may wait for a full batch
+# What a request does when the buffer is full:
+# "drop_oldest" evicts the oldest unwritten record, "drop_newest" discards the new one,
+# "block" waits up to AUDIT_BLOCK_TIMEOUT seconds for the writer (then discards the new one).
+AUDIT_OVERFLOW = os.getenv("AUDIT_OVERFLOW", "drop_oldest")
+AUDIT_BLOCK_TIMEOUT = float(os.getenv("AUDIT_BLOCK_TIMEOUT", 1.0))
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+# Exception -> decision recorded for a failed request (anything else is an "error")
+DECISIONS = (
+    (SecurityException, "denied"),
+    (PrivacyViolationException, "denied"),
+    (BudgetExhaustedException, "denied"),
+    (AdmissionRejectedException, "rejected"),
+    (PoolTimeoutException, "rejected"),
+    (QueryTimeoutException, "timeout"),
+)
+
+AUDIT_COLUMNS = ("logged_at", "user_id", "role", "decision", "reason", "original_sql", "executed_sql",
+                 "epsilon_requested", "epsilon_charged", "total_ms")
+
+def audit_record(trace) -> dict:
+    """
+    Builds the audit record of a finished request.
+    """
+    decision, reason = "allowed", None
+    if trace.error is not None:
+        decision = "error"
+        for exception_type, name in DECISIONS:
+            if isinstance(trace.error, exception_type):
+                decision = name
+                break
+        reason = f"{type(trace.error).__name__}: {trace.error}"
+    return {
+        "logged_at": datetime.fromtimestamp(trace.started_at, timezone.utc).isoformat(),
+        "user_id": trace.user_id,
+        "role": trace.role,
+        "decision": decision,
+        "reason": reason,
+        "original_sql": trace.query,
+        "executed_sql": trace.sql.get("executed"),
+        "epsilon_requested": trace.epsilon,
+        "epsilon_charged": trace.epsilon_charged,
+        "total_ms": round(trace.total_ns / 1e6, 3),
+    }
+
+class JsonlAuditSink:
+    """
+    Appends records to a JSONL file, rotating it to path.1 .. path.N above max_bytes.
+    Rotated files and the file left on close() are fsync'ed.
+    """
+    def __init__(self, path: str = AUDIT_LOG, max_bytes: int = AUDIT_MAX_BYTES, backup_count: int = AUDIT_BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._file = None
+
+    def write(self, records: list):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+        self._file.flush()
+        if self.max_bytes > 0 and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._sync_and_close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _sync_and_close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        self._sync_and_close()
+
+class DatabaseAuditSink:
+    """
+    Bulk-inserts records into the audit_log table (see seed_db.create_schema) on a dedicated connection.
+    """
+    def __init__(self, table: str = "audit_log", connect=None):
+        self.table = table
+        self._connect = connect or (lambda: get_connection(force_new=True))
+        self._conn = None
+        self._sql = f"INSERT INTO {table} ({', '.join(AUDIT_COLUMNS)}) VALUES ({', '.join(['%s'] * len(AUDIT_COLUMNS))})"
+
+    def write(self, records: list):
+        rows = []
+        for record in records:
+            # DATETIME columns take naive UTC timestamps
+            logged_at = datetime.fromisoformat(record["logged_at"]).astimezone(timezone.utc).replace(tzinfo=None)
+            rows.append((logged_at,) + tuple(record[column] for column in AUDIT_COLUMNS[1:]))
+        try:
+            if self._conn is None:
+                self._conn = self._connect()
+            with self._conn.cursor() as cursor:
+                # pymysql turns this into multi-row INSERT statements
+                cursor.executemany(self._sql, rows)
+            self._conn.commit()
+        except:
+            self.close()
+            raise
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except:
+                pass
+            self._conn = None
+
+class AuditLog:
+    """
+    Trace listener recording every request's privacy decision. Requests only append to a bounded
+    in-memory buffer; a background writer hands batches of up to `batch_size` records to the sink
+    once a batch is full or `flush_interval` seconds have passed. A full buffer is handled by the
+    overflow policy. Batches the sink fails to write are put back (as far as the buffer allows)
+    and retried on the next cycle.
+    """
+    # Counter of written/dropped/failed records
+    records_metric = metrics.AUDIT_RECORDS
+
+    def __init__(self, sink, buffer_size: int = AUDIT_BUFFER_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_INTERVAL, overflow: str = AUDIT_OVERFLOW,
+                 block_timeout: float = AUDIT_BLOCK_TIMEOUT):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy '{overflow}' (expected one of {', '.join(OVERFLOW_POLICIES)}).")
+        self.sink = sink
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._writing = False
+        self._flush_requests = 0
+        self._closed = False
+        self._worker = threading.Thread(target=self._write_loop, name="audit-writer", daemon=True)
+        self._worker.start()
+
+    def __call__(self, trace):
+        self.append(audit_record(trace))
+
+    def append(self, record: dict) -> bool:
+        """
+        Buffers a record. Returns False if it (or, with drop_oldest, an older one) was dropped.
+        """
+        with self._cond:
+            if self._closed:
+                self._count_dropped(1)
+                return False
+
+            if len(self._buffer) >= self.buffer_size:
+                if self.overflow == "block":
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._buffer) >= self.buffer_size and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+
+                if len(self._buffer) >= self.buffer_size:
+                    self._count_dropped(1)
+                    if self.overflow != "drop_oldest":
+                        return False
+                    self._buffer.popleft()
+                    self._buffer.append(record)
+                    return False
+
+            self._buffer.append(record)
+            if self._batch_ready():
+                self._cond.notify_all()
+            return True
+
+    def _count_dropped(self, count: int):
+        self.dropped += count
+        if metrics.METRICS_ENABLED:
+            self.records_metric.inc(count, result="dropped")
+
+    def _batch_ready(self) -> bool:
+        return (len(self._buffer) >= min(self.batch_size, self.buffer_size) or self._closed
+                or (self._flush_requests > 0 and bool(self._buffer)))
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(self._batch_ready, self.flush_interval)
+                if not self._buffer:
+                    if self._closed:
+                        return
+                    continue
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._writing = True
+                # Wake requests blocked on a full buffer
+                self._cond.notify_all()
+
+            try:
+                self.sink.write(batch)
+                written = True
+            except Exception as e:
+                print(f"Warning: Audit write failed ({len(batch)} records): {e}")
+                written = False
+
+            with self._cond:
+                self._writing = False
+                if written:
+                    self.written += len(batch)
+                    if metrics.METRICS_ENABLED:
+                        self.records_metric.inc(len(batch), result="written")
+                elif self._closed:
+                    # Final flush failed: nothing left to retry with
+                    self.failed += len(batch)
+                    if metrics.METRICS_ENABLED:
+                        self.records_metric.inc(len(batch), result="failed")
+                else:
+                    room = max(0, self.buffer_size - len(self._buffer))
+                    self._buffer.extendleft(reversed(batch[len(batch) - room:] if room < len(batch) else batch))
+                    if room < len(batch):
+                        self._count_dropped(len(batch) - room)
+                self._cond.notify_all()
+
+            if not written and not self._closed:
+                # Back off before retrying a failing sink
+                time.sleep(self.flush_interval)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._buffer) + (1 if self._writing else 0)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Waits until every buffered record has been handed to the sink. Returns False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flush_requests += 1
+            try:
+                self._cond.notify_all()
+                while self._buffer or self._writing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flush_requests -= 1
+        return True
+
+    def close(self, timeout: float = 30.0) -> bool:
+        """
+        Writes the remaining records, then closes (and fsyncs) the sink. Later records are dropped.
+        Returns False if the writer did not finish within `timeout` seconds.
+        """
+        with self._cond:
+            if self._closed:
+                return True
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+        finished = not self._worker.is_alive()
+        try:
+            self.sink.close()
+        except Exception as e:
+            print(f"Warning: Closing the audit sink failed: {e}")
+        return finished
+
+def create_sink(kind: str = AUDIT_SINK):
+    if kind == "file":
+        return JsonlAuditSink()
+    if kind == "db":
+        return DatabaseAuditSink()
+    raise ValueError(f"Unknown audit sink '{kind}' (expected 'file' or 'db').")
+
+_AUDIT_LOG = None
+_audit_lock = threading.Lock()
+
+def get_audit_log():
+    """
+    Returns the process-wide audit log configured by AUDIT_SINK (None when auditing is disabled).
+    It is flushed and closed at interpreter exit.
+    """
+    global _AUDIT_LOG
+    if not AUDIT_SINK:
+        return None
+    if _AUDIT_LOG is None:
+        with _audit_lock:
+            if _AUDIT_LOG is None:
+                _AUDIT_LOG = AuditLog(create_sink(AUDIT_SINK))
+                atexit.register(close_audit_log)
+    return _AUDIT_LOG
+
+def close_audit_log(timeout: float = 30.0) -> bool:
+    """
+    Flushes and closes the process-wide audit log, if one was opened.
+    """
+    global _AUDIT_LOG
+    with _audit_lock:
+        audit_log, _AUDIT_LOG = _AUDIT_LOG, None
+    if audit_log is None:
+        return True
+    return audit_log.close(timeout)
@@ -0,0 +1,82 @@
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.daemon import json_default
+
+def process_record(middleware, line_number: int, line: str) -> dict:
+    """
+    Runs one {"user_id", "query", "epsilon", "deadline_ms", "id"} record and returns its result record.
+    Failures (bad JSON, blocked queries, ...) become {"ok": false, ...} records instead of stopping the batch.
+    """
+    record = {"line": line_number}
+    try:
+        request = json.loads(line)
+        if "id" in request:
+            record["id"] = request["id"]
+        kwargs = {}
+        if request.get("deadline_ms") is not None:
+            kwargs["deadline_ms"] = float(request["deadline_ms"])
+        response = middleware.process_query(request["query"], str(request["user_id"]), float(request.get("epsilon", 1.0)), **kwargs)
+        record.update(ok=True, response=response)
+    except Exception as e:
+        record.update(ok=False, error=type(e).__name__, message=str(e))
+    return record
+
+def _records(input_stream):
+    for line_number, line in enumerate(input_stream, start=1):
+        if line.strip():
+            yield line_number, line
+
+def run_batch(middleware, input_stream, output_stream, workers: int = 1, ordered: bool = False) -> dict:
+    """
+    Streams JSONL requests from input_stream through the middleware and writes one JSONL result per
+    request as soon as it is ready (in input order with ordered=True). At most `workers * 2` requests
+    are read ahead, so memory stays constant regardless of the input size.
+    Returns {"processed": n, "failed": m}.
+    """
+    stats = {"processed": 0, "failed": 0}
+
+    def emit(record):
+        output_stream.write(json.dumps(record, default=json_default) + "\n")
+        output_stream.flush()
+        stats["processed"] += 1
+        if not record["ok"]:
+            stats["failed"] += 1
+
+    if workers <= 1:
+        for line_number, line in _records(input_stream):
+            emit(process_record(middleware, line_number, line))
+        return stats
+
+    window = workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}      # future -> sequence number
+        completed = {}      # sequence number -> record, waiting for earlier ones (ordered mode)
+        next_to_emit = 0
+
+        def drain(block: bool):
+            nonlocal next_to_emit
+            if not in_flight:
+                return
+            done, _ = wait(list(in_flight), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                sequence = in_flight.pop(future)
+                if not ordered:
+                    emit(future.result())
+                else:
+                    completed[sequence] = future.result()
+            while next_to_emit in completed:
+                emit(completed.pop(next_to_emit))
+                next_to_emit += 1
+
+        for sequence, (line_number, line) in enumerate(_records(input_stream)):
+            # Ordered mode also bounds the records buffered behind a slow one
+            while len(in_flight) >= window or (ordered and sequence - next_to_emit >= window):
+                drain(block=True)
+            in_flight[executor.submit(process_record, middleware, line_number, line)] = sequence
+            drain(block=False)
+
+        while in_flight:
+            drain(block=True)
+
+    return stats
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Cache Configuration
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", 1024)) # validated + rewritten plans kept per middleware (0 = disabled)
+# Seconds a user's role is reused (0 = always looked up); a demotion or revocation takes up to this long to apply
+ROLE_CACHE_TTL = float(os.getenv("ROLE_CACHE_TTL", 0.0))
+ROLE_CACHE_SIZE = int(os.getenv("ROLE_CACHE_SIZE", 10000))
+
+class LRUCache:
+    """
+    Thread-safe LRU map. With ttl set, entries older than `ttl` seconds are treated as missing.
+    A maxsize (or ttl) of 0 disables the cache: get() always misses and put() is a no-op.
+    """
+    def __init__(self, maxsize: int, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (value, stored at)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and (self.ttl is None or self.ttl > 0)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if self.ttl is not None and time.monotonic() - entry[1] >= self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,151 @@
+import os
+import hmac
+import atexit
+import random
+import hashlib
+import secrets
+import threading
+import time
+import sqlglot
+from sqlglot import exp
+from src.audit import AuditLog, JsonlAuditSink
+from src import metrics
+
+# Workload Capture Configuration (file unset = disabled)
+CAPTURE_FILE = os.getenv("CAPTURE_FILE")
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", 1.0))  # fraction of requests recorded
+# Key for the user pseudonyms; random per process unless set (set it to link captures across restarts)
+CAPTURE_SALT = os.getenv("CAPTURE_SALT") or secrets.token_hex(16)
+
+def fingerprint(sql: str) -> tuple:
+    """
+    Splits a query into its shape and its constants: returns (fingerprint, params), where the
+    fingerprint has every literal replaced by a `?` placeholder (depth-first order) and params
+    holds the literal values. Queries are read and written as MySQL (backticks, backslash escapes);
+    typed literals such as DATE '...' come out in their equivalent CAST form.
+    Returns (None, None) for statements sqlglot cannot parse.
+    """
+    try:
+        parsed = sqlglot.parse_one(sql, read="mysql")
+    except Exception:
+        return None, None
+    if parsed is None:
+        return None, None
+
+    params = []
+    for literal in list(parsed.find_all(exp.Literal, bfs=False)):
+        if literal.is_string:
+            params.append(literal.this)
+        else:
+            number = literal.this
+            params.append(float(number) if any(c in number for c in ".eE") else int(number))
+        literal.replace(exp.Placeholder())
+    return parsed.sql(dialect="mysql"), params
+
+def bind_parameters(fingerprint: str, params: list) -> str:
+    """
+    Inverse of fingerprint(): substitutes the params for the placeholders.
+    """
+    parsed = sqlglot.parse_one(fingerprint, read="mysql")
+    placeholders = list(parsed.find_all(exp.Placeholder, bfs=False))
+    if len(placeholders) != len(params):
+        raise ValueError(f"Fingerprint has {len(placeholders)} placeholders for {len(params)} parameters.")
+    for placeholder, value in zip(placeholders, params):
+        literal = exp.Literal.string(value) if isinstance(value, str) else exp.Literal.number(value)
+        # A placeholder is rendered as INTERVAL (?) DAY; the bound literal needs no parentheses
+        if isinstance(placeholder.parent, exp.Paren) and isinstance(placeholder.parent.parent, exp.Interval):
+            placeholder = placeholder.parent
+        placeholder.replace(literal)
+    return parsed.sql(dialect="mysql")
+
+def pseudonymize(user_id: str, salt: str = CAPTURE_SALT) -> str:
+    """
+    Stable, non-reversible stand-in for a user ID (HMAC-SHA256 with the capture salt).
+    """
+    return hmac.new(salt.encode("utf-8"), str(user_id).encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+class CaptureSink:
+    """
+    Anonymizes captured requests (fingerprint + params, pseudonymous user) and appends them to a JSONL file.
+    Runs on the recorder's writer thread, so parsing never delays a request.
+    """
+    def __init__(self, path: str = CAPTURE_FILE, salt: str = CAPTURE_SALT):
+        self.salt = salt
+        self._file = JsonlAuditSink(path, max_bytes=0)
+
+    def write(self, records: list):
+        anonymized = []
+        for record in records:
+            query_fingerprint, params = fingerprint(record["query"])
+            anonymized.append({
+                "offset_ms": record["offset_ms"],
+                "user": pseudonymize(record["user_id"], self.salt),
+                "role": record["role"],
+                "fingerprint": query_fingerprint,
+                "params": params,
+                "epsilon": record["epsilon"],
+                "deadline_ms": record["deadline_ms"],
+                "total_ms": record["total_ms"],
+                "stages_ms": record["stages_ms"],
+                "error": record["error"],
+            })
+        self._file.write(anonymized)
+
+    def close(self):
+        self._file.close()
+
+class WorkloadRecorder(AuditLog):
+    """
+    Trace listener capturing the request stream (timing, role, query shape and parameters, outcome)
+    for replay.py. It reuses the audit log's bounded buffer and background writer; when the buffer
+    is full the oldest records are dropped, requests never wait.
+    """
+    records_metric = metrics.CAPTURE_RECORDS
+
+    def __init__(self, path: str = CAPTURE_FILE, sample_rate: float = CAPTURE_SAMPLE_RATE, salt: str = CAPTURE_SALT, **kwargs):
+        kwargs.setdefault("overflow", "drop_oldest")
+        super().__init__(CaptureSink(path, salt), **kwargs)
+        self.sample_rate = sample_rate
+        self.started_at = time.time()
+
+    def __call__(self, trace):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        deadline_ms = (trace.deadline_ns - trace.start_ns) / 1e6 if trace.deadline_ns is not None else None
+        self.append({
+            "offset_ms": round((trace.started_at - self.started_at) * 1000, 3),
+            "user_id": trace.user_id,
+            "role": trace.role,
+            "query": trace.query,
+            "epsilon": trace.epsilon,
+            "deadline_ms": deadline_ms,
+            "total_ms": round(trace.total_ns / 1e6, 3),
+            "stages_ms": {stage: round(ms, 3) for stage, ms in trace.stages_ms().items()},
+            "error": type(trace.error).__name__ if trace.error else None,
+        })
+
+_RECORDER = None
+_recorder_lock = threading.Lock()
+
+def get_recorder():
+    """
+    Returns the process-wide workload recorder configured by CAPTURE_FILE (None when capture is disabled).
+    It is flushed and closed at interpreter exit.
+    """
+    global _RECORDER
+    if not CAPTURE_FILE:
+        return None
+    if _RECORDER is None:
+        with _recorder_lock:
+            if _RECORDER is None:
+                _RECORDER = WorkloadRecorder(CAPTURE_FILE)
+                atexit.register(close_recorder)
+    return _RECORDER
+
+def close_recorder(timeout: float = 30.0) -> bool:
+    global _RECORDER
+    with _recorder_lock:
+        recorder, _RECORDER = _RECORDER, None
+    if recorder is None:
+        return True
+    return recorder.close(timeout)
@@ -0,0 +1,127 @@
+import os
+import threading
+from src.db_connector import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT, QueryTimeoutException
+
+# Columnar Backend Configuration
+ANALYTIC_BACKEND = os.getenv("ANALYTIC_BACKEND", "mysql").lower()
+SNAPSHOT_DIR = os.getenv("COLUMNAR_SNAPSHOT_DIR", "snapshots")
+
+# Tables exported to Parquet (same as the sanitizer's known schema)
+SNAPSHOT_TABLES = ("patients", "diagnoses", "staffs")
+
+def _import_duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise ImportError("The columnar backend requires the 'duckdb' package (pip install duckdb).")
+    return duckdb
+
+class ColumnarBackend:
+    """
+    Runs rewritten aggregate and cohort SQL with DuckDB over Parquet snapshots exported from MySQL.
+    Budget accounting and role lookups are NOT routed here; they always stay in MySQL.
+    """
+    dialect = "duckdb"
+
+    def __init__(self, snapshot_dir: str = None):
+        self.snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+        self._local = threading.local()
+        self._root_conn = None
+        self._lock = threading.Lock()
+
+    def _snapshot_path(self, table: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{table}.parquet")
+
+    def _get_cursor(self):
+        # DuckDB connections are not thread-safe; each thread gets its own cursor on a shared database.
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is not None:
+            return cursor
+
+        with self._lock:
+            if self._root_conn is None:
+                duckdb = _import_duckdb()
+                self._root_conn = duckdb.connect(database=":memory:")
+                for table in SNAPSHOT_TABLES:
+                    path = self._snapshot_path(table).replace("'", "''")
+                    self._root_conn.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{path}')")
+            cursor = self._root_conn.cursor()
+
+        self._local.cursor = cursor
+        return cursor
+
+    def execute_query(self, sql: str, params=None, timeout_ms: float = None):
+        """
+        Executes a SQL query against the snapshots and returns rows as dicts (same shape as db_connector).
+        With timeout_ms, the statement is interrupted at the deadline and QueryTimeoutException is raised.
+        """
+        if timeout_ms is not None and timeout_ms <= 0:
+            raise QueryTimeoutException("Query deadline exceeded before execution.")
+
+        cursor = self._get_cursor()
+        timer = None
+        if timeout_ms is not None:
+            timer = threading.Timer(timeout_ms / 1000, cursor.interrupt)
+            timer.daemon = True
+            timer.start()
+        try:
+            result = cursor.execute(sql, params) if params else cursor.execute(sql)
+            columns = [desc[0] for desc in result.description]
+            return [dict(zip(columns, row)) for row in result.fetchall()]
+        except Exception as e:
+            if type(e).__name__ == "InterruptException":
+                raise QueryTimeoutException(f"Query exceeded its deadline of {timeout_ms:.0f} ms.") from e
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def refresh_snapshots(self, tables=SNAPSHOT_TABLES, source: str = None):
+        """
+        Re-exports the given MySQL tables to Parquet using DuckDB's MySQL scanner.
+        Each file is written next to the old one and swapped in atomically, so readers never see a partial snapshot.
+        source, if given, is a DuckDB database file (e.g. an offline copy) to export from instead of MySQL.
+        """
+        duckdb = _import_duckdb()
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+        conn = duckdb.connect(database=":memory:")
+        try:
+            if source is None:
+                conn.execute("INSTALL mysql")
+                conn.execute("LOAD mysql")
+                dsn = f"host={DB_HOST} user={DB_USER} password={DB_PASSWORD} port={DB_PORT} database={DB_NAME}"
+                conn.execute(f"ATTACH '{dsn}' AS src (TYPE mysql, READ_ONLY)")
+            else:
+                conn.execute(f"ATTACH '{source}' AS src (READ_ONLY)")
+            for table in tables:
+                final_path = self._snapshot_path(table)
+                tmp_path = final_path + ".tmp"
+                conn.execute(f"COPY (SELECT * FROM src.{table}) TO '{tmp_path}' (FORMAT parquet, COMPRESSION zstd)")
+                os.replace(tmp_path, final_path)
+                print(f"Snapshot refreshed: {final_path}")
+        finally:
+            conn.close()
+
+def get_backend():
+    """
+    Returns the configured analytic backend, or None to execute analytics on MySQL.
+    """
+    if ANALYTIC_BACKEND == "duckdb":
+        return ColumnarBackend()
+    if ANALYTIC_BACKEND != "mysql":
+        raise ValueError(f"Unsupported analytic backend: {ANALYTIC_BACKEND}")
+    return None
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Columnar analytic backend tooling")
+    parser.add_argument("command", choices=["refresh"], help="'refresh' re-exports the Parquet snapshots from MySQL")
+    parser.add_argument("--snapshot_dir", type=str, default=SNAPSHOT_DIR, help=f"Snapshot directory (default: {SNAPSHOT_DIR})")
+    parser.add_argument("--tables", type=str, nargs="+", default=list(SNAPSHOT_TABLES), choices=SNAPSHOT_TABLES, help="Tables to export")
+
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        ColumnarBackend(args.snapshot_dir).refresh_snapshots(tuple(args.tables))
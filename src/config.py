@@ -0,0 +1,42 @@
+import os
+import threading
+
+# Kept free of third-party imports so `import src.main` stays cheap: load_env() resolves the
+# .env file once, before any module reads its settings into module-level constants.
+# There is deliberately no config object: each module keeps its os.getenv constants next to the
+# code using them, and tests and tools override them per module (monkeypatch.setattr).
+
+_env_lock = threading.Lock()
+_env_loaded = False
+
+def find_env_file(start_dir: str = None, filename: str = ".env") -> str:
+    """
+    Returns the first `filename` found walking up from start_dir (default: this package), or "".
+    """
+    path = os.path.abspath(start_dir or os.path.dirname(__file__))
+    while True:
+        candidate = os.path.join(path, filename)
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(path)
+        if parent == path:
+            return ""
+        path = parent
+
+def load_env():
+    """
+    Loads the .env file into os.environ exactly once (existing variables win).
+    python-dotenv is only imported when there is a .env file to read.
+    Every module reading settings at import time calls this first.
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if _env_loaded:
+            return
+        env_file = find_env_file()
+        if env_file:
+            from dotenv import load_dotenv
+            load_dotenv(env_file)
+        _env_loaded = True
@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import socket
+import signal
+import tempfile
+import threading
+import socketserver
+from src.config import load_env
+
+# Only the standard library is imported at module level: the thin client must start without
+# paying for sqlglot, numpy, dotenv or MySQL connections. The daemon side imports src.main lazily.
+load_env()
+
+# Daemon Configuration
+DAEMON_SOCKET = os.getenv("DAEMON_SOCKET", os.path.join(tempfile.gettempdir(), f"privacy-query-{os.getuid()}.sock"))
+DAEMON_CONNECT_TIMEOUT = float(os.getenv("DAEMON_CONNECT_TIMEOUT", 0.2))
+
+class DaemonUnavailableException(Exception):
+    pass
+
+def print_response(response: dict):
+    """
+    Prints a process_query response as the CLI's result table.
+    """
+    print("-" * 30)
+    print(f"Executed Query: {response['executed_query']}")
+    print(f"Privacy Budget Cost (Epsilon): {response['epsilon_used']}")
+
+    # Table Formatting
+    res_val = str(response['result'])
+    col_name = f"DP_{response.get('query_type', 'RESULT')}"
+    width = max(len(col_name), len(res_val)) + 4
+
+    print(f"+{'-'*width}+")
+    print(f"| {col_name:<{width-2}} |")
+    print(f"+{'-'*width}+")
+    print(f"| {res_val:<{width-2}} |")
+    print(f"+{'-'*width}+")
+    print("-" * 30)
+
+def json_default(value):
+    # numpy scalars and Decimals from MySQL
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Newline-delimited JSON: {"user_id", "query", "epsilon", "deadline_ms"} per line in,
+    {"ok": true, "response": {...}} or {"ok": false, "error": type, "message": ...} per line out.
+    """
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                kwargs = {}
+                if request.get("deadline_ms") is not None:
+                    kwargs["deadline_ms"] = float(request["deadline_ms"])
+                response = self.server.middleware.process_query(request["query"], str(request["user_id"]),
+                                                                float(request.get("epsilon", 1.0)), **kwargs)
+                reply = {"ok": True, "response": response}
+            except Exception as e:
+                reply = {"ok": False, "error": type(e).__name__, "message": str(e)}
+            self.wfile.write((json.dumps(reply, default=json_default) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+class QueryDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Keeps one warmed PrivacyMiddleware (imports, pools, caches) running behind a Unix socket
+    that only the owning user can connect to.
+    """
+    daemon_threads = True
+
+    def __init__(self, path: str = DAEMON_SOCKET, middleware=None):
+        if os.path.exists(path):
+            if is_daemon_running(path):
+                raise RuntimeError(f"A daemon is already listening on {path}.")
+            os.unlink(path) # stale socket from a crashed daemon
+
+        if middleware is None:
+            from src.main import middleware
+        self.middleware = middleware
+        self.path = path
+
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, DaemonRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+def is_daemon_running(path: str = DAEMON_SOCKET) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(DAEMON_CONNECT_TIMEOUT)
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+def run_daemon(path: str = DAEMON_SOCKET, middleware=None):
+    """
+    Serves until SIGTERM/SIGINT, then flushes pending budget commits and the audit log and removes the socket.
+    """
+    daemon = QueryDaemon(path, middleware)
+    print(f"Privacy query daemon listening on {path}")
+
+    def _stop(signum, frame):
+        threading.Thread(target=daemon.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    try:
+        daemon.serve_forever()
+    finally:
+        daemon.server_close()
+        daemon.middleware.flush_budget_commits(30)
+        from src.audit import close_audit_log
+        from src.capture import close_recorder
+        close_audit_log()
+        close_recorder()
+
+def send_query(query: str, user_id: str, epsilon: float, deadline_ms: float = None, path: str = DAEMON_SOCKET) -> dict:
+    """
+    Sends one query to the daemon and returns its reply.
+    Raises DaemonUnavailableException if no daemon is listening (the query was not sent).
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(DAEMON_CONNECT_TIMEOUT)
+        try:
+            sock.connect(path)
+        except OSError as e:
+            raise DaemonUnavailableException(f"No daemon listening on {path}: {e}")
+        sock.settimeout(None)
+        request = {"query": query, "user_id": user_id, "epsilon": epsilon, "deadline_ms": deadline_ms}
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("The daemon closed the connection without replying.")
+    return json.loads(line)
+
+def run_client_if_available(argv: list = None):
+    """
+    Thin client for `python -m src.main --query ...`: if a daemon is running, the query is sent to it,
+    its result printed and the process exits. Otherwise (or for --daemon / interactive mode) it returns
+    so the caller falls back to in-process execution.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if "--query" not in argv and not any(arg.startswith("--query=") for arg in argv):
+        return
+    if "--daemon" in argv or "--batch" in argv or "--no_daemon" in argv:
+        return
+
+    import argparse
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--user_id", type=str, default="cli_user")
+    parser.add_argument("--query", type=str)
+    parser.add_argument("--epsilon", type=float, default=1.0)
+    parser.add_argument("--deadline_ms", type=float, default=None)
+    args, _ = parser.parse_known_args(argv)
+    if args.deadline_ms is None and os.getenv("QUERY_DEADLINE_MS"):
+        args.deadline_ms = float(os.getenv("QUERY_DEADLINE_MS"))
+
+    try:
+        reply = send_query(args.query, args.user_id, args.epsilon, args.deadline_ms)
+    except DaemonUnavailableException:
+        return
+    except Exception as e:
+        # The query may have run; never retry it in-process
+        reply = {"ok": False, "message": f"Lost connection to the daemon: {e}"}
+
+    print(f"Executing Query as '{args.user_id}' with epsilon={args.epsilon}...")
+    if not reply.get("ok"):
+        print(f"(!) FAILED: {reply.get('message')}")
+        sys.exit(1)
+    print_response(reply["response"])
+    sys.exit(0)
@@ -1,16 +1,201 @@
-import sqlglot
-from sqlglot import exp
-from src.pipeline import sanitizer, rewriter, privacy_guard, dp_engine, budget
-from src.db_connector import execute_query, UsePersistentConnection
+if __name__ == "__main__":
+    # Thin client: hand one-shot CLI queries to a running daemon before paying for the imports below
+    from src.daemon import run_client_if_available
+    run_client_if_available()
+
+import math
 import sys
 import threading
+from src.pipeline import budget
+from src.db_connector import execute_query, UsePersistentConnection, QUERY_DEADLINE_MS
+from src import columnar, tracing, metrics, slow_log, caches
+
+# Heavy modules (sqlglot, numpy via dp_engine, cProfile, ...) are imported when the first
+# PrivacyMiddleware is built, so importing src.main, --help and daemon-client runs stay fast.
+sqlglot = exp = sanitizer = rewriter = privacy_guard = dp_engine = hll = shards = profiler = admission = audit = capture = materialize = singleflight = None
+_modules_lock = threading.Lock()
+
+def _load_pipeline_modules():
+    global sqlglot, exp, sanitizer, rewriter, privacy_guard, dp_engine, hll, shards, profiler, admission, audit, capture, materialize, singleflight
+    if singleflight is not None:
+        return
+    with _modules_lock:
+        if singleflight is not None:
+            return
+        import sqlglot as _sqlglot
+        from sqlglot import exp as _exp
+        from src.pipeline import sanitizer as _sanitizer, rewriter as _rewriter, privacy_guard as _privacy_guard, dp_engine as _dp_engine, hll as _hll
+        from src import shards as _shards, profiler as _profiler, admission as _admission, audit as _audit, capture as _capture
+        from src import materialize as _materialize, singleflight as _singleflight
+        sqlglot, exp, sanitizer, rewriter, privacy_guard, dp_engine, hll = _sqlglot, _exp, _sanitizer, _rewriter, _privacy_guard, _dp_engine, _hll
+        shards, profiler, admission, audit, capture, materialize = _shards, _profiler, _admission, _audit, _capture, _materialize
+        # Assigned last: a non-None singleflight means every module above is bound
+        singleflight = _singleflight
+
+def role_from_row(row: dict) -> str:
+    """
+    Maps a staffs row (role, specialization) to the sanitizer policy role.
+    """
+    role = row['role'].lower()
+    spec = row['specialization'].lower()
+
+    # Check for specific job titles first
+    if "cashier" in spec:
+        return "cashier"
+    if "accountant" in spec:
+        return "accountant"
+    if "receptionist" in spec:
+        return "accountant"
+    if "secretary" in spec:
+        return "default"
+
+    # Fallback to the main role
+    return role
 
-# Global budget tracker instance
+# Global budget tracker instance (holds no connections; they are opened on first query)
 budget_tracker = budget.BudgetAccountant()
 
 class PrivacyMiddleware:
-    def __init__(self):
+    def __init__(self, analytic_backend=None, slow_query_threshold_ms: float = slow_log.SLOW_QUERY_THRESHOLD_MS,
+                 admission_controller=None, single_flight: bool = None, cohort_estimator=None, summary_routing: bool = None,
+                 materializer=None):
+        _load_pipeline_modules()
+        if single_flight is None:
+            single_flight = singleflight.SINGLE_FLIGHT_ENABLED
+        if summary_routing is None:
+            summary_routing = rewriter.SUMMARY_ROUTING
         self.budget_accountant = budget.BudgetAccountant()
+        # Per-user and global limits on concurrent database work
+        self.admission = admission_controller or admission.AdmissionController()
+        # Optional columnar backend for aggregate/cohort SQL (None = MySQL)
+        self.analytic_backend = analytic_backend
+        # HyperLogLog sketches deciding clearly-safe cohorts without an exact count (COHORT_ESTIMATION=1)
+        self.cohort_estimator = cohort_estimator if cohort_estimator is not None else hll.get_cohort_sketches()
+        # Aggregates fitting a trigger-maintained summary table's grain read it instead of the base table
+        # (MySQL only); routed SQL per statement, None when not routable
+        self.summary_routing = summary_routing and analytic_backend is None
+        self.route_cache = caches.LRUCache(caches.PLAN_CACHE_SIZE)
+        # Frequent, expensive aggregate shapes are materialized and read from there (AUTO_MATERIALIZE=1, MySQL only)
+        self.materializer = materializer if materializer is not None else materialize.get_materializer()
+        if analytic_backend is not None:
+            self.materializer = None
+        # Concurrent identical aggregate/cohort executions share one database call
+        self.single_flight = singleflight.SingleFlight() if single_flight else None
+        # Callables receiving each finished tracing.RequestTrace (benchmarks, metrics, ...)
+        self.trace_listeners = []
+        if metrics.METRICS_ENABLED:
+            self.trace_listeners.append(metrics.record_trace)
+        # Every privacy decision is buffered for the audit log (disabled unless AUDIT_SINK is set)
+        audit_log = audit.get_audit_log()
+        if audit_log is not None:
+            self.trace_listeners.append(audit_log)
+        # Anonymized request stream for replay.py (disabled unless CAPTURE_FILE is set)
+        recorder = capture.get_recorder()
+        if recorder is not None:
+            self.trace_listeners.append(recorder)
+        # Requests slower than the threshold are written to the slow query log
+        self.slow_query_log = None
+        if slow_query_threshold_ms is not None:
+            self.configure_slow_query_log(slow_query_threshold_ms)
+        # Sampled cProfile/tracemalloc profiling (disabled unless PROFILE_SAMPLE_RATE > 0)
+        self.profiler = profiler.PROFILER
+        # In-flight asynchronous budget commits (see flush_budget_commits)
+        self._pending_commits = set()
+        self._commit_lock = threading.Lock()
+        # Validated + rewritten SQL per (policy generation, role, dialect, query), and roles per user
+        self.plan_cache = caches.LRUCache(caches.PLAN_CACHE_SIZE)
+        self.role_cache = caches.LRUCache(caches.ROLE_CACHE_SIZE, ttl=caches.ROLE_CACHE_TTL)
+
+    def configure_slow_query_log(self, threshold_ms: float = None, path: str = slow_log.SLOW_QUERY_LOG, explain: bool = slow_log.SLOW_QUERY_EXPLAIN):
+        """
+        Enables (or with threshold_ms=None, disables) the slow query log at runtime.
+        EXPLAIN is only captured when the SQL runs on MySQL (no analytic backend).
+        """
+        if self.slow_query_log in self.trace_listeners:
+            self.trace_listeners.remove(self.slow_query_log)
+            self.slow_query_log.close()
+        self.slow_query_log = None
+
+        if threshold_ms is not None:
+            self.slow_query_log = slow_log.SlowQueryLog(threshold_ms, path, explain and self.analytic_backend is None)
+            self.trace_listeners.append(self.slow_query_log)
+
+    @property
+    def dialect(self) -> str:
+        return self.analytic_backend.dialect if self.analytic_backend else "mysql"
+
+    def _commit_budget_async(self, user_id: str, epsilon_cost: float):
+        """
+        Deducts the budget on a background thread so the response is not delayed by the UPDATE.
+        The UPDATE runs on the reserved budget connections and is retried (see BudgetAccountant.commit).
+        """
+        def _async_commit():
+            try:
+                self.budget_accountant.commit(user_id, epsilon_cost)
+            finally:
+                with self._commit_lock:
+                    self._pending_commits.discard(threading.current_thread())
+
+        thread = threading.Thread(target=_async_commit, daemon=False)
+        with self._commit_lock:
+            self._pending_commits.add(thread)
+        thread.start()
+
+    def flush_budget_commits(self, timeout: float = None) -> bool:
+        """
+        Waits for all in-flight asynchronous budget commits. Returns False if some are still running.
+        """
+        with self._commit_lock:
+            pending = list(self._pending_commits)
+        for thread in pending:
+            thread.join(timeout)
+        with self._commit_lock:
+            return not self._pending_commits
+
+    def _execute_analytic(self, sql: str, timeout_ms: float = None):
+        """
+        Executes rewritten aggregate SQL on the analytic backend (MySQL by default).
+        Identical statements already in flight are coalesced: the raw rows are shared, while
+        noise and budget charges stay per request. Callers must not modify the returned rows.
+        With summary routing, statements fitting a summary table read it instead; with automatic
+        materialization, statements of a materialized shape read its table.
+        """
+        if self.summary_routing:
+            sql = self._route_to_summary(sql)
+        if self.materializer is not None:
+            return self.materializer.execute(sql, lambda statement: self._execute_shared(statement, timeout_ms))
+        return self._execute_shared(sql, timeout_ms)
+
+    def _execute_cohort(self, sql: str, timeout_ms: float = None):
+        """
+        Executes the cohort count like _execute_analytic, but never from a materialization:
+        a table up to a refresh interval old could pass a cohort that has since fallen below k.
+        Summary tables are maintained by triggers and stay exact.
+        """
+        if self.summary_routing:
+            sql = self._route_to_summary(sql)
+        return self._execute_shared(sql, timeout_ms)
+
+    def _execute_shared(self, sql: str, timeout_ms: float = None):
+        if self.analytic_backend:
+            run = lambda remaining_ms: self.analytic_backend.execute_query(sql, timeout_ms=remaining_ms)
+        else:
+            run = lambda remaining_ms: execute_query(sql, timeout_ms=remaining_ms, read_only=True)
+
+        if self.single_flight is None:
+            return run(timeout_ms)
+
+        rows, shared = self.single_flight.do((self.dialect, sql), run, timeout_ms)
+        metrics.record_cache("singleflight", shared)
+        return rows
+
+    def _route_to_summary(self, sql: str) -> str:
+        routed = self.route_cache.get(sql)
+        if routed is None:
+            routed = rewriter.route_to_summary(sql, dialect=self.dialect) or ""
+            self.route_cache.put(sql, routed)
+        metrics.record_cache("summary", bool(routed))
+        return routed or sql
 
     def _detect_query_type(self, parsed_query) -> str:
         """
@@ -69,12 +254,14 @@ class PrivacyMiddleware:
         
         return None
 
-    def _handle_avg_query(self, target_query: str, user_id: str, epsilon_cost: float):
+    def _handle_avg_query(self, target_query: str, user_id: str, epsilon_cost: float, trace=None):
         """
         Handles AVG queries by splitting them into SUM and COUNT.
         """
+        trace = trace or tracing.RequestTrace(user_id, target_query)
+
         # Parse logic to split AVG(col) into SUM(col), COUNT(col)
-        parsed = sqlglot.parse_one(target_query)
+        parsed = sqlglot.parse_one(target_query, read=self.dialect)
         avg_expr = parsed.expressions[0]
         
         # Unwrap Alias if present
@@ -87,10 +274,12 @@ class PrivacyMiddleware:
         sum_expr = exp.Sum(this=target_col)
         count_expr = exp.Count(this=target_col)
         parsed.set("expressions", [sum_expr, count_expr])
-        dual_query = parsed.sql(dialect="mysql")
+        dual_query = parsed.sql(dialect=self.dialect)
         
         # Execute
-        raw_results = execute_query(dual_query)
+        trace.sql["executed"] = dual_query
+        with trace.stage("execute"):
+            raw_results = self._execute_analytic(dual_query, trace.remaining_ms())
         
         if not raw_results:
             return 0.0
@@ -100,26 +289,29 @@ class PrivacyMiddleware:
         true_sum = float(row[0]) if row[0] is not None else 0.0
         true_count = float(row[1]) if row[1] is not None else 0.0
         
-        # Budget Splitting (50% for Sum, 50% for Count)
-        epsilon_half = epsilon_cost / 2.0
-        
-        # Add Noise to SUM
-        bounds = (0, 100)
-        sum_sensitivity = dp_engine.calculate_sensitivity("SUM", bounds)
-        noisy_sum = dp_engine.add_noise(true_sum, sum_sensitivity, epsilon_half)
-        
-        # Add Noise to COUNT
-        count_sensitivity = 1.0
-        noisy_count = dp_engine.add_noise(true_count, count_sensitivity, epsilon_half)
-        
-        # Post-Process Count
-        if noisy_count < 1.0:
-            final_avg = 0.0
-        else:
-            final_avg = noisy_sum / noisy_count
+        with trace.stage("noise"):
+            # Budget Splitting (50% for Sum, 50% for Count)
+            epsilon_half = epsilon_cost / 2.0
+            
+            # Add Noise to SUM
+            bounds = (0, 100)
+            sum_sensitivity = dp_engine.calculate_sensitivity("SUM", bounds)
+            noisy_sum = dp_engine.add_noise(true_sum, sum_sensitivity, epsilon_half)
+            
+            # Add Noise to COUNT
+            count_sensitivity = 1.0
+            noisy_count = dp_engine.add_noise(true_count, count_sensitivity, epsilon_half)
+            
+            # Post-Process Count
+            if noisy_count < 1.0:
+                final_avg = 0.0
+            else:
+                final_avg = noisy_sum / noisy_count
         
         # Commit Budget deduction
-        self.budget_accountant.consume_budget(user_id, epsilon_cost)
+        with trace.stage("budget_commit"):
+            self._commit_budget_async(user_id, epsilon_cost)
+            trace.epsilon_charged = epsilon_cost
 
         return {
             "status": "success",
@@ -131,69 +323,160 @@ class PrivacyMiddleware:
         }
 
     def _get_role(self, user_id: str) -> str:
+        role = self.role_cache.get(user_id)
+        metrics.record_cache("role", role is not None)
+        if role is not None:
+            return role
         try:
             res = execute_query("SELECT role, specialization FROM staffs WHERE national_id=%s", (user_id,))
             if not res:
                 return "default"
-            
-            row = res[0]
-            role = row['role'].lower()
-            spec = row['specialization'].lower()
-
-            # Check for specific job titles first
-            if "cashier" in spec:
-                return "cashier"
-            if "accountant" in spec:
-                return "accountant"
-            if "receptionist" in spec:
-                return "accountant"
-            if "secretary" in spec:
-                return "default"
-            
-            # Fallback to the main role
+
+            role = role_from_row(res[0])
+            self.role_cache.put(user_id, role)
             return role
         except:
             return "default"
 
-    def process_query(self, user_query: str, user_id: str, epsilon_cost: float):
+    def preload_roles(self, user_ids: list, batch_size: int = 500) -> dict:
         """
-        Executes the privacy pipeline: validation -> accounting -> rewriting -> k-anonymity -> differential privacy.
+        Looks up the roles of the given users in batches and fills the role cache (if ROLE_CACHE_TTL > 0).
+        Returns the role of each user found.
         """
-        with UsePersistentConnection():
-            # 0. Get Role
-            user_role = self._get_role(user_id)
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        loaded = {}
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            placeholders = ", ".join(["%s"] * len(batch))
+            rows = execute_query(f"SELECT national_id, role, specialization FROM staffs WHERE national_id IN ({placeholders})", tuple(batch))
+            for row in rows:
+                loaded[str(row['national_id'])] = role_from_row(row)
+                self.role_cache.put(str(row['national_id']), loaded[str(row['national_id'])])
+        return loaded
+
+    def _plan_key(self, user_query: str, user_role: str) -> tuple:
+        return (sanitizer.POLICY_GENERATION, user_role, self.dialect, user_query)
+
+    def _rewrite(self, user_query: str) -> str:
+        generalized_query = rewriter.generalize_filters(user_query)
+        return rewriter.enforce_aggregation(generalized_query, dialect=self.dialect)
 
-            # 1. Validation: Whitelist checks (schema, attributes, predicates)
+    def prepare_plan(self, user_query: str, user_role: str) -> str:
+        """
+        Validates and rewrites the query for the role and caches the result, without touching the
+        database or any budget. Raises SecurityException if the role may not run the query.
+        """
+        key = self._plan_key(user_query, user_role)
+        target_query = self.plan_cache.get(key)
+        if target_query is None:
             sanitizer.validate_query(user_query, user_role)
+            target_query = self._rewrite(user_query)
+            self.plan_cache.put(key, target_query)
+        return target_query
 
-            # 2. Budget Check: Verify sufficiency before processing
-            self.budget_accountant.check(user_id, epsilon_cost)
+    def process_query(self, user_query: str, user_id: str, epsilon_cost: float, deadline_ms: float = QUERY_DEADLINE_MS):
+        """
+        Executes the privacy pipeline: validation -> accounting -> rewriting -> k-anonymity -> differential privacy.
+        Every request is traced per stage; finished traces are passed to the registered trace listeners.
+        With deadline_ms, the cohort and aggregate SQL are bounded by the time left; a request that runs
+        out of time raises QueryTimeoutException before any budget is charged.
+        Raises ValueError unless epsilon_cost is a finite, positive number.
+        """
+        trace = tracing.RequestTrace(user_id, user_query, deadline_ms)
+        trace.epsilon = epsilon_cost
+        tracing.set_current_trace(trace)
+        try:
+            if not math.isfinite(epsilon_cost) or epsilon_cost <= 0:
+                raise ValueError(f"Invalid epsilon: {epsilon_cost}. It must be a finite number above 0.")
+            with self.profiler.maybe_profile():
+                return self._run_pipeline(trace, user_query, user_id, epsilon_cost)
+        except Exception as e:
+            trace.error = e
+            raise
+        finally:
+            trace.finish()
+            tracing.set_current_trace(None)
+            for listener in self.trace_listeners:
+                try:
+                    listener(trace)
+                except Exception as e:
+                    print(f"Warning: Trace listener failed: {e}")
 
-            # 3. Rewriting: Generalization and Aggregation Enforcement
-            generalized_query = rewriter.generalize_filters(user_query)
-            target_query = rewriter.enforce_aggregation(generalized_query)
-            
-            # 4. Cohort Analysis: Check k-Anonymity (k=5)
-            if privacy_guard.check_cohort_violation(target_query):
-                raise privacy_guard.PrivacyViolationException("Query violates cohort size requirements (k=5).")
-
-            # Check for AVG special handling
-            parsed_target = sqlglot.parse_one(target_query)
-            query_type = self._detect_query_type(parsed_target)
-            target_col = self._get_target_column(parsed_target)
-
-            # Handle AVG
-            if query_type == "AVG":
-                result = self._handle_avg_query(target_query, user_id, epsilon_cost)    
-                result["original_query"] = user_query
-                return result
-
-            # 5. Differential Privacy Execution
-            raw_results = execute_query(target_query)
-            
-            # Extract scalar value
-            true_val = float(list(raw_results[0].values())[0]) if raw_results else 0.0
+    def _run_pipeline(self, trace, user_query: str, user_id: str, epsilon_cost: float):
+        # Admission: wait for (or be refused) a share of the database capacity before holding a connection
+        with trace.stage("admission"):
+            ticket = self.admission.acquire(user_id)
+        try:
+            with UsePersistentConnection():
+                # 0. Get Role
+                with trace.stage("role"):
+                    user_role = self._get_role(user_id)
+                trace.role = user_role
+
+                # 1. Validation: Whitelist checks (schema, attributes, predicates), skipped for cached plans
+                plan_key = self._plan_key(user_query, user_role)
+                with trace.stage("validate"):
+                    target_query = self.plan_cache.get(plan_key)
+                    metrics.record_cache("plan", target_query is not None)
+                    if target_query is None:
+                        sanitizer.validate_query(user_query, user_role)
+
+                # 2. Budget Check: Verify sufficiency before processing
+                with trace.stage("budget_check"):
+                    self.budget_accountant.check(user_id, epsilon_cost)
+
+                # 3. Rewriting: Generalization and Aggregation Enforcement
+                with trace.stage("rewrite"):
+                    if target_query is None:
+                        target_query = self._rewrite(user_query)
+                        self.plan_cache.put(plan_key, target_query)
+
+                # Weight the admitted request by its estimated cost; light ones keep their connection
+                with trace.stage("admission"):
+                    cost = self.admission.estimate_cost(target_query, self.dialect)
+                if cost <= 1:
+                    return self._run_admitted(trace, user_query, target_query, user_id, epsilon_cost)
+
+            # A heavy request waits for its estimated cost without holding a connection
+            with trace.stage("admission"):
+                ticket = self.admission.reweigh(ticket, cost)
+
+            with UsePersistentConnection():
+                return self._run_admitted(trace, user_query, target_query, user_id, epsilon_cost)
+        finally:
+            self.admission.release(ticket)
+
+    def _run_admitted(self, trace, user_query: str, target_query: str, user_id: str, epsilon_cost: float):
+        """
+        Cohort check, execution and noise for a request holding an admission ticket.
+        """
+        # 4. Cohort Analysis: Check k-Anonymity (k=5)
+        with trace.stage("cohort"):
+            cohort_violation = privacy_guard.check_cohort_violation(target_query, self.analytic_backend, trace.remaining_ms(),
+                                                                    executor=self._execute_cohort, estimator=self.cohort_estimator)
+        if cohort_violation:
+            raise privacy_guard.PrivacyViolationException("Query violates cohort size requirements (k=5).")
+
+        # Check for AVG special handling
+        parsed_target = sqlglot.parse_one(target_query, read=self.dialect)
+        query_type = self._detect_query_type(parsed_target)
+        target_col = self._get_target_column(parsed_target)
+
+        # Handle AVG
+        if query_type == "AVG":
+            result = self._handle_avg_query(target_query, user_id, epsilon_cost, trace)
+            result["original_query"] = user_query
+            return result
 
+        # 5. Differential Privacy Execution
+        trace.sql["executed"] = target_query
+        with trace.stage("execute"):
+            raw_results = self._execute_analytic(target_query, trace.remaining_ms())
+        
+        # Extract scalar value
+        true_val = float(list(raw_results[0].values())[0]) if raw_results else 0.0
+
+        with trace.stage("noise"):
             # Calculate Sensitivity
             bounds = (0, 100) if query_type in ['SUM', 'MIN', 'MAX'] else None
             sensitivity = dp_engine.calculate_sensitivity(query_type, bounds)
@@ -202,36 +485,54 @@ class PrivacyMiddleware:
             final_val = dp_engine.add_noise(true_val, sensitivity, epsilon_cost)
             final_val = dp_engine.post_process_result(final_val, query_type, target_col)
 
-            # 6. Budget Deduction: Commit asynchronously
-            def _async_commit():
-                try:
-                    execute_query(
-                        "UPDATE staffs SET privacy_budget = privacy_budget - %s WHERE national_id = %s", 
-                        (epsilon_cost, user_id), 
-                        force_new=True
-                    )
-                except Exception as e:
-                    print(f"Background Budget Update Failed: {e}")
+        # 6. Budget Deduction: Commit asynchronously
+        with trace.stage("budget_commit"):
+            self._commit_budget_async(user_id, epsilon_cost)
+            trace.epsilon_charged = epsilon_cost
 
-            threading.Thread(target=_async_commit, daemon=False).start()
+        return {
+            "status": "success",
+            "original_query": user_query,
+            "executed_query": target_query,
+            "result": final_val,
+            "epsilon_used": epsilon_cost,
+            "query_type": query_type
+        }
 
-            return {
-                "status": "success",
-                "original_query": user_query,
-                "executed_query": target_query,
-                "result": final_val,
-                "epsilon_used": epsilon_cost,
-                "query_type": query_type
-            }
+_middleware = None
+_middleware_lock = threading.Lock()
 
-# Initialize Middleware with the global tracker for test compatibility
-middleware = PrivacyMiddleware()
-middleware.budget_accountant = budget_tracker
+def get_middleware() -> PrivacyMiddleware:
+    """
+    Returns the shared middleware, building it (modules, backends) on first use.
+    With WARMUP_FILE set, it is warmed up from the recorded workload before being returned.
+    """
+    global _middleware
+    if _middleware is None:
+        with _middleware_lock:
+            if _middleware is None:
+                _load_pipeline_modules()
+                instance = PrivacyMiddleware(analytic_backend=shards.get_backend() or columnar.get_backend())
+                # Initialize Middleware with the global tracker for test compatibility
+                instance.budget_accountant = budget_tracker
+                from src import warmup
+                if warmup.WARMUP_FILE:
+                    warmup.warm_up_from_file(instance, warmup.WARMUP_FILE)
+                _middleware = instance
+    return _middleware
+
+def __getattr__(name: str):
+    # `from src.main import middleware` keeps working; the instance is built on first access
+    if name == "middleware":
+        return get_middleware()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def execute_secure_query(user_query: str, user_id: str, epsilon_cost: float):
     """
     Executes a secure SQL query via PrivacyMiddleware.
     """
+    middleware = get_middleware()
+
     # Ensure middleware uses the current global budget_tracker (which might be mocked by tests)
     middleware.budget_accountant = budget_tracker
 
@@ -247,35 +548,51 @@ if __name__ == "__main__":
     from src.pipeline.sanitizer import SecurityException
     from src.pipeline.privacy_guard import PrivacyViolationException
     from src.pipeline.budget import BudgetExhaustedException
+    from src.admission import AdmissionRejectedException
+    from src.db_connector import QueryTimeoutException
+    from src.daemon import run_daemon, print_response
 
     parser = argparse.ArgumentParser(description="Privacy Preserving SQL Execution Engine")
     parser.add_argument("--user_id", type=str, default="cli_user", help="User (National) ID (default: cli_user)")
     parser.add_argument("--query", type=str, help="SQL Query to execute (if not provided, enters interactive mode)")
     parser.add_argument("--epsilon", type=float, default=1.0, help="Privacy Loss Budget (epsilon) cost (default: 1.0)")
+    parser.add_argument("--deadline_ms", type=float, default=QUERY_DEADLINE_MS, help="Per-query deadline in milliseconds (default: none)")
+    parser.add_argument("--daemon", action="store_true", help="Serve queries from this warm process on a local Unix socket")
+    parser.add_argument("--no_daemon", action="store_true", help="Execute in-process even if a daemon is running")
+    parser.add_argument("--batch", type=str, nargs="?", const="-", help="Process JSONL {user_id, query, epsilon} records from a file (or stdin if omitted) and write JSONL results")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel workers in batch mode (default: 1)")
+    parser.add_argument("--ordered", action="store_true", help="Emit batch results in input order")
+    parser.add_argument("--warmup", type=str, help="Recorded workload (JSONL) used to warm up connections, roles and plans before serving")
     
     args = parser.parse_args()
+    middleware = get_middleware()
+    if args.warmup:
+        from src.warmup import warm_up_from_file
+        warm_up_from_file(middleware, args.warmup)
+
+    if args.daemon:
+        run_daemon(middleware=middleware)
+        sys.exit(0)
+
+    if args.batch:
+        from src.batch import run_batch
+        input_stream = sys.stdin if args.batch == "-" else open(args.batch, "r")
+        try:
+            stats = run_batch(middleware, input_stream, sys.stdout, workers=args.workers, ordered=args.ordered)
+        finally:
+            if input_stream is not sys.stdin:
+                input_stream.close()
+        middleware.flush_budget_commits()
+        print(f"Batch complete: {stats['processed']} processed, {stats['failed']} failed.", file=sys.stderr)
+        sys.exit(0)
 
     # If query is provided via command line, run once and exit
     if args.query:
         try:
             print(f"Executing Query as '{args.user_id}' with epsilon={args.epsilon}...")
-            response = middleware.process_query(args.query, args.user_id, epsilon_cost=args.epsilon)
-            
-            print("-" * 30)
-            print(f"Executed Query: {response['executed_query']}")
-            print(f"Privacy Budget Cost (Epsilon): {response['epsilon_used']}")
+            response = middleware.process_query(args.query, args.user_id, epsilon_cost=args.epsilon, deadline_ms=args.deadline_ms)
             
-            # Table Formatting
-            res_val = str(response['result'])
-            col_name = f"DP_{response.get('query_type', 'RESULT')}"
-            width = max(len(col_name), len(res_val)) + 4
-            
-            print(f"+{'-'*width}+")
-            print(f"| {col_name:<{width-2}} |")
-            print(f"+{'-'*width}+")
-            print(f"| {res_val:<{width-2}} |")
-            print(f"+{'-'*width}+")
-            print("-" * 30)
+            print_response(response)
         except Exception as e:
             print(f"(!) FAILED: {e}")
             sys.exit(1)
@@ -322,23 +639,9 @@ if __name__ == "__main__":
             # Execute
             try:
                 # We use the middleware directly to get detailed response
-                response = middleware.process_query(query, current_user, epsilon_cost=current_epsilon)
-                
-                print("-" * 30)
-                print(f"Executed Query: {response['executed_query']}")
-                print(f"Privacy Budget Cost (Epsilon): {response['epsilon_used']}")
+                response = middleware.process_query(query, current_user, epsilon_cost=current_epsilon, deadline_ms=args.deadline_ms)
                 
-                # Table Formatting
-                res_val = str(response['result'])
-                col_name = f"DP_{response.get('query_type', 'RESULT')}"
-                width = max(len(col_name), len(res_val)) + 4
-
-                print(f"+{'-'*width}+")
-                print(f"| {col_name:<{width-2}} |")
-                print(f"+{'-'*width}+")
-                print(f"| {res_val:<{width-2}} |")
-                print(f"+{'-'*width}+")
-                print("-" * 30)
+                print_response(response)
                 
             except SecurityException as e:
                 print(f"(!) BLOCKED: {e}")
@@ -346,6 +649,10 @@ if __name__ == "__main__":
                 print(f"(!) BLOCKED: {e}")
             except BudgetExhaustedException as e:
                 print(f"(!) BLOCKED: {e}")
+            except AdmissionRejectedException as e:
+                print(f"(!) BUSY: {e}")
+            except QueryTimeoutException as e:
+                print(f"(!) TIMEOUT: {e}")
             except Exception as e:
                 print(f"(!) ERROR: {e}")
                 
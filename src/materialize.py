@@ -0,0 +1,498 @@
+import os
+import hashlib
+import threading
+import time
+from collections import deque
+import sqlglot
+from sqlglot import exp
+from src.db_connector import execute_query, QueryTimeoutException
+from src.pipeline.sanitizer import ALLOWED_TABLES
+from src import caches, metrics
+
+# Automatic Materialization Configuration (disabled unless AUTO_MATERIALIZE=1)
+AUTO_MATERIALIZE = os.getenv("AUTO_MATERIALIZE", "0") == "1"
+MATERIALIZE_MIN_COUNT = float(os.getenv("MATERIALIZE_MIN_COUNT", 20))        # recent executions of a shape before it is materialized
+MATERIALIZE_MIN_COST_MS = float(os.getenv("MATERIALIZE_MIN_COST_MS", 500.0)) # and recent database time spent on it
+MATERIALIZE_WINDOW = float(os.getenv("MATERIALIZE_WINDOW", 300.0))           # seconds after which counts and costs weigh half
+MATERIALIZE_REFRESH_INTERVAL = float(os.getenv("MATERIALIZE_REFRESH_INTERVAL", 300.0)) # seconds a materialized result may lag its table
+MATERIALIZE_MAX_ROWS = int(os.getenv("MATERIALIZE_MAX_ROWS", 1000000))       # storage budget: rows across all materialized tables
+MATERIALIZE_MAX_SHAPES = int(os.getenv("MATERIALIZE_MAX_SHAPES", 1000))      # shapes tracked at most
+MATERIALIZE_MAX_ERRORS = 3                                                   # consecutive failed reads before a table is dropped
+
+# Aggregates stored per group and how they are re-aggregated over the stored groups
+_REAGGREGATE = {exp.Count: "COALESCE(SUM({0}), 0)", exp.Sum: "SUM({0})", exp.Min: "MIN({0})", exp.Max: "MAX({0})"}
+
+class _NotMaterializable(Exception):
+    pass
+
+def shape_key(table: str, grain: tuple, aggregates: tuple) -> str:
+    return f"{table}({', '.join(grain)}): {', '.join(aggregates)}"
+
+def table_name(key: str) -> str:
+    return "mv_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+class Shape:
+    """
+    An aggregate shape: the aggregates of one table grouped by every column its statements filter or
+    group on. Statements differing only in their constants (or in the predicates over those columns)
+    share a shape, and all of them can be answered by re-aggregating its materialized groups.
+    """
+    def __init__(self, table: str, grain: tuple, aggregates: tuple, now: float = None):
+        self.table = table
+        self.grain = grain
+        self.aggregates = aggregates
+        self.key = shape_key(table, grain, aggregates)
+        self.name = table_name(self.key)
+        self.status = "tracked"   # tracked -> pending -> ready; or rejected (until retry_at)
+        self.count = 0.0          # decayed executions
+        self.cost_ms = 0.0        # decayed database time (saved time, once materialized)
+        self.base_ms = None       # moving average of one execution on the base table
+        self.touched_at = time.monotonic() if now is None else now
+        self.used_at = None
+        self.rows = None
+        self.refreshed_at = None
+        self.hits = 0
+        self.errors = 0
+        self.retry_at = 0.0
+
+    def decay(self, now: float, window: float):
+        factor = 0.5 ** ((now - self.touched_at) / window) if window > 0 else 1.0
+        self.count *= factor
+        self.cost_ms *= factor
+        self.touched_at = now
+
+    @property
+    def benefit(self) -> float:
+        """Recent database time per stored row."""
+        return self.cost_ms / max(self.rows or 1, 1)
+
+    def build_sql(self, table_name: str) -> str:
+        columns = list(self.grain) + [f"{aggregate} AS a{i}" for i, aggregate in enumerate(self.aggregates)]
+        group_by = f" GROUP BY {', '.join(self.grain)}" if self.grain else ""
+        return f"CREATE TABLE {table_name} AS SELECT {', '.join(columns)} FROM {self.table}{group_by}"
+
+    def describe(self) -> dict:
+        return {
+            "shape": self.key,
+            "table": self.name,
+            "status": self.status,
+            "recent_executions": round(self.count, 2),
+            "recent_cost_ms": round(self.cost_ms, 3),
+            "base_ms": round(self.base_ms, 3) if self.base_ms is not None else None,
+            "rows": self.rows,
+            "hits": self.hits,
+            "refreshed_at": self.refreshed_at,
+        }
+
+def analyze(sql: str, dialect: str = "mysql", tables: set = None) -> tuple:
+    """
+    Returns (table, grain, aggregates, rewrite) for a materializable statement, where rewrite(name) gives
+    the statement over the materialized table `name`. Supported: single-table SELECTs of COUNT/SUM/MIN/MAX
+    (COUNT(DISTINCT) only when every filtered column is grouped or fixed by `column = constant`), optional
+    WHERE and GROUP BY on plain columns, without HAVING, DISTINCT, joins or subqueries.
+    Raises _NotMaterializable otherwise.
+    """
+    tables = ALLOWED_TABLES if tables is None else tables
+    try:
+        parsed = sqlglot.parse_one(sql, read=dialect)
+    except Exception:
+        raise _NotMaterializable()
+    if not isinstance(parsed, exp.Select) or any(parsed.args.get(arg) for arg in ("joins", "having", "distinct", "with", "laterals")):
+        raise _NotMaterializable()
+    if len(list(parsed.find_all(exp.Select))) > 1 or parsed.find(exp.Window):
+        raise _NotMaterializable()
+    found = list(parsed.find_all(exp.Table))
+    if len(found) != 1 or found[0].name.lower() not in tables or found[0].args.get("db"):
+        raise _NotMaterializable()
+    table = found[0]
+
+    grouped = []
+    group = parsed.args.get("group")
+    if group is not None:
+        if any(group.args.get(arg) for arg in group.args if arg != "expressions") or not group.expressions:
+            raise _NotMaterializable()
+        for column in group.expressions:
+            if not isinstance(column, exp.Column):
+                raise _NotMaterializable()
+            grouped.append(column.name.lower())
+
+    where = parsed.args.get("where")
+    filtered = [column.name.lower() for column in where.find_all(exp.Column)] if where is not None else []
+    grain = tuple(sorted(set(grouped) | set(filtered)))
+    single_valued = set(grouped) | set(_pinned_columns(where.this) if where is not None else ())
+
+    aggregates = []
+    projections = []
+    for projection in parsed.expressions:
+        node = projection.this if isinstance(projection, exp.Alias) else projection
+        if isinstance(node, exp.Column):
+            if node.name.lower() not in grouped:
+                raise _NotMaterializable()
+            projections.append((projection, None))
+            continue
+        if type(node) not in _REAGGREGATE or list(node.find_all(exp.Window)):
+            raise _NotMaterializable()
+        argument = node.this
+        if isinstance(argument, exp.Distinct):
+            # Distinct counts do not add up across groups: each result group must be one stored group
+            if not set(grain) <= single_valued or len(argument.expressions) != 1:
+                raise _NotMaterializable()
+            argument = argument.expressions[0]
+        if not isinstance(argument, (exp.Star, exp.Column)):
+            raise _NotMaterializable()
+        key = node.copy()
+        for column in key.find_all(exp.Column):
+            column.set("table", None)
+        key = key.sql(dialect="mysql")
+        if key not in aggregates:
+            aggregates.append(key)
+        projections.append((projection, key))
+
+    if not aggregates:
+        raise _NotMaterializable()
+    aggregates = tuple(sorted(aggregates))
+
+    def rewrite(name: str) -> str:
+        routed = parsed.copy()
+        expressions = []
+        for (projection, key), original in zip(projections, routed.expressions):
+            if key is None:
+                expressions.append(original)
+                continue
+            node = original.this if isinstance(original, exp.Alias) else original
+            replacement = sqlglot.parse_one(_REAGGREGATE[type(node)].format(f"a{aggregates.index(key)}"), read="mysql")
+            if isinstance(original, exp.Alias):
+                original.set("this", replacement)
+                expressions.append(original)
+            else:
+                expressions.append(exp.alias_(replacement, node.sql(dialect=dialect), quoted=True))
+        routed.set("expressions", expressions)
+        routed_table = routed.find(exp.Table)
+        if not routed_table.alias:
+            routed_table.set("alias", exp.TableAlias(this=exp.to_identifier(routed_table.name)))
+        routed_table.set("this", exp.to_identifier(name))
+        return routed.sql(dialect=dialect)
+
+    return table.name.lower(), grain, aggregates, rewrite
+
+def _pinned_columns(node):
+    while isinstance(node, exp.Paren):
+        node = node.this
+    if isinstance(node, exp.And):
+        yield from _pinned_columns(node.this)
+        yield from _pinned_columns(node.expression)
+    elif isinstance(node, exp.EQ):
+        for column, value in ((node.this, node.expression), (node.expression, node.this)):
+            if isinstance(column, exp.Column) and isinstance(value, exp.Literal):
+                yield column.name.lower()
+
+class Materializer:
+    """
+    Tracks how often, and at what database cost, each aggregate shape is executed. Shapes over
+    the thresholds are materialized into `mv_*` tables on a background thread, refreshed every
+    refresh_interval seconds (results may lag the base tables by that much) and later statements
+    of the shape read them. The stored rows stay within max_rows: the tables saving the least
+    recent database time per row are dropped first, least recently used first among equals.
+    """
+    def __init__(self, min_count: float = MATERIALIZE_MIN_COUNT, min_cost_ms: float = MATERIALIZE_MIN_COST_MS,
+                 window: float = MATERIALIZE_WINDOW, refresh_interval: float = MATERIALIZE_REFRESH_INTERVAL,
+                 max_rows: int = MATERIALIZE_MAX_ROWS, max_shapes: int = MATERIALIZE_MAX_SHAPES,
+                 executor=None, dialect: str = "mysql", background: bool = True, clock=time.monotonic):
+        self.min_count = min_count
+        self.min_cost_ms = min_cost_ms
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.max_rows = max_rows
+        self.max_shapes = max_shapes
+        self.dialect = dialect
+        self.background = background
+        self.clock = clock
+        self._executor = executor or (lambda sql: execute_query(sql))
+        self._lock = threading.Lock()
+        self._work_lock = threading.Lock()
+        self._shapes = {}
+        # Analysis per statement: (shape key, definition, statement over the shape's table), all None when not materializable
+        self._statements = caches.LRUCache(caches.PLAN_CACHE_SIZE)
+        self.decisions = deque(maxlen=100)
+        # Background work is due when a shape is pending or at the earliest refresh time
+        self._pending = False
+        self._next_refresh = float("inf")
+
+    def execute(self, sql: str, run):
+        """
+        Executes a statement with run(sql), reading the materialized table of its shape when it is ready.
+        Base-table executions are timed for the shape's cost.
+        """
+        shape, routed = self._shape_of(sql)
+        if shape is None:
+            return run(sql)
+
+        now = self.clock()
+        with self._lock:
+            shape.decay(now, self.window)
+            shape.count += 1
+            shape.used_at = now
+            ready = shape.status == "ready"
+            if ready:
+                shape.hits += 1
+                shape.cost_ms += shape.base_ms or 0.0
+        metrics.record_cache("materialized", ready)
+
+        if ready:
+            try:
+                rows = run(routed)
+                shape.errors = 0
+                self._schedule()
+                return rows
+            except QueryTimeoutException:
+                raise
+            except Exception as e:
+                # e.g. a replica has not received the table yet: answer from the base table
+                shape.errors += 1
+                if shape.errors >= MATERIALIZE_MAX_ERRORS:
+                    self._drop(shape, f"reading it failed {shape.errors} times: {e}")
+
+        started = self.clock()
+        rows = run(sql)
+        elapsed_ms = (self.clock() - started) * 1000
+        with self._lock:
+            shape.cost_ms += elapsed_ms
+            shape.base_ms = elapsed_ms if shape.base_ms is None else 0.8 * shape.base_ms + 0.2 * elapsed_ms
+            # Decay makes back-to-back executions count slightly less than one each
+            scheduled = (shape.status in ("tracked", "rejected") and started >= shape.retry_at
+                         and round(shape.count, 3) >= self.min_count and shape.cost_ms >= self.min_cost_ms)
+            if scheduled:
+                shape.status = "pending"
+                self._pending = True
+        if scheduled:
+            self._decide(shape, "scheduled", f"{shape.count:.0f} executions and {shape.cost_ms:.0f} ms within the window")
+        self._schedule()
+        return rows
+
+    def _shape_of(self, sql: str) -> tuple:
+        cached = self._statements.get(sql)
+        if cached is None:
+            try:
+                table, grain, aggregates, rewrite = analyze(sql, self.dialect)
+                key = shape_key(table, grain, aggregates)
+                cached = (key, (table, grain, aggregates), rewrite(table_name(key)))
+            except _NotMaterializable:
+                cached = (None, None, None)
+            self._statements.put(sql, cached)
+        key, definition, routed = cached
+        if key is None:
+            return None, None
+
+        with self._lock:
+            shape = self._shapes.get(key)
+            if shape is None:
+                shape = Shape(*definition, now=self.clock())
+                self._shapes[key] = shape
+                if len(self._shapes) > self.max_shapes:
+                    self._forget_coldest()
+        return shape, routed
+
+    def _forget_coldest(self):
+        now = self.clock()
+        candidates = [shape for shape in self._shapes.values() if shape.status in ("tracked", "rejected")]
+        for shape in candidates:
+            shape.decay(now, self.window)
+        if candidates:
+            del self._shapes[min(candidates, key=lambda shape: shape.cost_ms).key]
+
+    def _schedule(self):
+        if self._work_lock.locked() or (not self._pending and self.clock() < self._next_refresh):
+            return
+        if self.background:
+            threading.Thread(target=self.run_pending, name="materializer", daemon=True).start()
+        else:
+            self.run_pending()
+
+    def run_pending(self):
+        """
+        Builds the pending shapes (hottest first) and refreshes the stale or drops the unused materialized tables.
+        """
+        if not self._work_lock.acquire(blocking=False):
+            return
+        try:
+            now = self.clock()
+            with self._lock:
+                self._pending = False
+                for shape in self._shapes.values():
+                    shape.decay(now, self.window)
+                pending = sorted((shape for shape in self._shapes.values() if shape.status == "pending"), key=lambda shape: -shape.cost_ms)
+                stale = [shape for shape in self._shapes.values()
+                         if shape.status == "ready" and now - shape.refreshed_at >= self.refresh_interval]
+
+            for shape in stale:
+                if shape.count < 1:
+                    self._drop(shape, "unused")
+                else:
+                    self._build(shape)
+            for shape in pending:
+                self._build(shape)
+        finally:
+            with self._lock:
+                self._next_refresh = min((shape.refreshed_at + self.refresh_interval for shape in self._shapes.values()
+                                          if shape.status == "ready"), default=float("inf"))
+            self._work_lock.release()
+
+    def _build(self, shape: Shape):
+        staging = f"{shape.name}_new"
+        try:
+            self._executor(f"DROP TABLE IF EXISTS {staging}")
+            self._executor(shape.build_sql(staging))
+            if shape.grain:
+                self._executor(f"CREATE INDEX idx_{shape.name} ON {staging} ({', '.join(shape.grain)})")
+            rows = int(list(self._executor(f"SELECT COUNT(*) AS c FROM {staging}")[0].values())[0])
+        except Exception as e:
+            self._reject(shape, f"build failed: {e}", staging)
+            return
+
+        refreshing = shape.status == "ready"
+        with self._lock:
+            shape.rows = rows
+            if rows > self.max_rows:
+                victims = None
+            else:
+                victims = self._victims(shape, rows)
+        if victims is None:
+            self._reject(shape, f"{rows} rows do not fit the budget of {self.max_rows}", staging)
+            return
+        for victim in victims:
+            self._drop(victim, f"evicted for {shape.name}")
+
+        try:
+            if refreshing:
+                self._executor(f"RENAME TABLE {shape.name} TO {shape.name}_old, {staging} TO {shape.name}")
+                self._executor(f"DROP TABLE IF EXISTS {shape.name}_old")
+            else:
+                self._executor(f"DROP TABLE IF EXISTS {shape.name}")
+                self._executor(f"RENAME TABLE {staging} TO {shape.name}")
+        except Exception as e:
+            self._reject(shape, f"build failed: {e}", staging)
+            return
+
+        with self._lock:
+            shape.status = "ready"
+            shape.refreshed_at = self.clock()
+            shape.errors = 0
+        self._decide(shape, "refreshed" if refreshing else "materialized", f"{rows} rows")
+
+    def _victims(self, shape: Shape, rows: int) -> list:
+        """
+        Materialized tables to drop so that `rows` more fit the budget, or None if only tables
+        saving more time per row than `shape` would have to go.
+        """
+        ready = [other for other in self._shapes.values() if other.status == "ready" and other is not shape]
+        used = sum(other.rows or 0 for other in ready)
+        victims = []
+        for other in sorted(ready, key=lambda other: (other.benefit, other.used_at or 0)):
+            if used + rows <= self.max_rows:
+                break
+            if other.benefit >= shape.benefit:
+                return None
+            victims.append(other)
+            used -= other.rows or 0
+        return victims if used + rows <= self.max_rows else None
+
+    def _reject(self, shape: Shape, reason: str, staging: str):
+        try:
+            self._executor(f"DROP TABLE IF EXISTS {staging}")
+        except Exception:
+            pass
+        if shape.status == "ready":
+            # Keep serving the previous result until the next refresh
+            with self._lock:
+                shape.refreshed_at = self.clock()
+            self._decide(shape, "refresh failed", reason)
+            return
+        # Tried again once it is still over the thresholds a refresh interval later
+        with self._lock:
+            shape.status = "rejected"
+            shape.retry_at = self.clock() + self.refresh_interval
+        self._decide(shape, "rejected", reason)
+
+    def _drop(self, shape: Shape, reason: str):
+        with self._lock:
+            if shape.status != "ready":
+                return
+            shape.status = "tracked"
+            shape.rows = None
+            shape.retry_at = self.clock() + self.refresh_interval
+        try:
+            self._executor(f"DROP TABLE IF EXISTS {shape.name}")
+        except Exception as e:
+            print(f"Warning: Could not drop materialized table {shape.name}: {e}")
+        self._decide(shape, "dropped", reason)
+
+    def _decide(self, shape: Shape, action: str, reason: str):
+        self.decisions.append({"time": time.time(), "action": action, "shape": shape.key, "table": shape.name, "reason": reason})
+
+    def evict(self, name: str) -> bool:
+        """
+        Drops a materialized table by table name or shape; the shape may be materialized again
+        after a refresh interval.
+        """
+        with self._lock:
+            shape = next((shape for shape in self._shapes.values() if name in (shape.name, shape.key)), None)
+        if shape is None or shape.status != "ready":
+            return False
+        self._drop(shape, "evicted by an administrator")
+        return True
+
+    def clear(self):
+        """
+        Drops every materialized table and forgets all shapes.
+        """
+        with self._lock:
+            shapes = list(self._shapes.values())
+        for shape in shapes:
+            self._drop(shape, "cleared by an administrator")
+        with self._lock:
+            self._shapes.clear()
+
+    def status(self, top: int = 20) -> dict:
+        """
+        Materialized tables, the hottest other shapes and the latest decisions, for administrators.
+        """
+        now = self.clock()
+        with self._lock:
+            for shape in self._shapes.values():
+                shape.decay(now, self.window)
+            ready = [shape.describe() for shape in self._shapes.values() if shape.status == "ready"]
+            others = sorted((shape for shape in self._shapes.values() if shape.status != "ready"), key=lambda shape: -shape.cost_ms)
+            candidates = [shape.describe() for shape in others[:top]]
+        return {
+            "max_rows": self.max_rows,
+            "used_rows": sum(shape["rows"] or 0 for shape in ready),
+            "thresholds": {"min_count": self.min_count, "min_cost_ms": self.min_cost_ms, "window_s": self.window},
+            "materialized": sorted(ready, key=lambda shape: -shape["recent_cost_ms"]),
+            "candidates": candidates,
+            "decisions": list(self.decisions)[::-1],
+        }
+
+_MATERIALIZER = None
+_materializer_lock = threading.Lock()
+
+def get_materializer():
+    """
+    Returns the process-wide materializer (None unless AUTO_MATERIALIZE=1).
+    """
+    global _MATERIALIZER
+    if not AUTO_MATERIALIZE:
+        return None
+    if _MATERIALIZER is None:
+        with _materializer_lock:
+            if _MATERIALIZER is None:
+                _MATERIALIZER = Materializer()
+    return _MATERIALIZER
+
+def materialization_status() -> dict:
+    """
+    Admin view of the process-wide materializer.
+    """
+    materializer = get_materializer()
+    if materializer is None:
+        return {"enabled": False}
+    return dict(materializer.status(), enabled=True)
@@ -0,0 +1,230 @@
+import os
+import threading
+from bisect import bisect_left
+from src.config import load_env
+
+load_env()
+
+# Metrics Configuration
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+
+# Latency buckets in seconds (100us .. 10s)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        return self._values.get(key, 0.0)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class _HistogramSeries:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: tuple, lock):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = lock
+
+    def observe(self, value: float):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+class Histogram:
+    """
+    Fixed-bucket histogram with optional labels. Observations are O(log buckets).
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> _HistogramSeries
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """
+        Returns the series for the given label values; cache it on hot paths to skip the label lookup.
+        """
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, _HistogramSeries(self.buckets, self._lock))
+        return series
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    def count(self, **labels) -> int:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        series = self._series.get(key)
+        return sum(series.counts) if series else 0
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((key, series.counts + [series.sum]) for key, series in self._series.items())
+
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' is already registered as a {metric.kind}.")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames=labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames=labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Pipeline metrics
+REQUESTS = REGISTRY.counter("privacy_requests_total", "Requests processed by PrivacyMiddleware.", ("outcome",))
+REJECTIONS = REGISTRY.counter("privacy_rejections_total", "Rejected requests by exception type.", ("exception",))
+PREFILTER_REJECTIONS = REGISTRY.counter("privacy_prefilter_rejections_total", "Queries rejected by the pre-parse filter, by reason.", ("reason",))
+REQUEST_LATENCY = REGISTRY.histogram("privacy_request_seconds", "End-to-end process_query latency.")
+STAGE_LATENCY = REGISTRY.histogram("privacy_stage_seconds", "Latency of each pipeline stage.", ("stage",))
+
+# Infrastructure metrics
+POOL_WAIT = REGISTRY.histogram("db_pool_wait_seconds", "Time spent waiting for a pooled MySQL connection.")
+POOL_TIMEOUTS = REGISTRY.counter("db_pool_timeouts_total", "Pool checkouts that timed out.")
+AUDIT_RECORDS = REGISTRY.counter("privacy_audit_records_total", "Audit records by result (written/dropped/failed).", ("result",))
+CAPTURE_RECORDS = REGISTRY.counter("workload_capture_records_total", "Captured workload records by result (written/dropped/failed).", ("result",))
+SLOW_QUERY_RECORDS = REGISTRY.counter("slow_query_records_total", "Slow query log records by result (written/dropped/failed).", ("result",))
+CACHE_LOOKUPS = REGISTRY.counter("cache_lookups_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
+
+_stage_series = {}
+
+def record_trace(trace):
+    """
+    Trace listener for PrivacyMiddleware: records request, stage and rejection metrics.
+    """
+    REQUEST_LATENCY.observe(trace.total_ns / 1e9)
+    for stage, ns in trace.stages.items():
+        series = _stage_series.get(stage)
+        if series is None:
+            series = _stage_series[stage] = STAGE_LATENCY.labels(stage=stage)
+        series.observe(ns / 1e9)
+
+    if trace.error is None:
+        REQUESTS.inc(outcome="success")
+    else:
+        REQUESTS.inc(outcome="rejected")
+        REJECTIONS.inc(exception=type(trace.error).__name__)
+
+def record_cache(cache: str, hit: bool):
+    if METRICS_ENABLED:
+        CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+def dump(path: str = None) -> str:
+    """
+    Returns the Prometheus text exposition, optionally writing it to `path` (e.g. for the node_exporter textfile collector).
+    """
+    text = REGISTRY.render()
+    if path:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    return text
+
+def start_http_server(port: int = METRICS_PORT, addr: str = "127.0.0.1"):
+    """
+    Serves GET /metrics on a daemon thread so a local Prometheus can scrape it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
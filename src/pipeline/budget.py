@@ -1,11 +1,24 @@
-from src.db_connector import execute_query
+import math
+import os
+import threading
+import time
+from src.db_connector import execute_query, get_budget_pool
+
+# Budget Commit Configuration
+BUDGET_COMMIT_RETRIES = int(os.getenv("BUDGET_COMMIT_RETRIES", 5))          # attempts after the first failure
+BUDGET_COMMIT_BACKOFF = float(os.getenv("BUDGET_COMMIT_BACKOFF", 0.2))      # seconds before the first retry, doubling
 
 class BudgetExhaustedException(Exception):
     pass
 
 class BudgetAccountant:
-    def __init__(self):
-        pass
+    def __init__(self, retries: int = BUDGET_COMMIT_RETRIES, backoff: float = BUDGET_COMMIT_BACKOFF, pool=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = pool
+        # Charges whose UPDATE failed every retry; counted by check() and added to the user's next commit
+        self._unpaid = {}
+        self._unpaid_lock = threading.Lock()
 
     def get_budget(self, user_id: str) -> float:
         """
@@ -26,9 +39,12 @@ class BudgetAccountant:
         """
         Raises BudgetExhaustedException if the remaining budget is insufficient.
         """
-        remaining = self.get_budget(user_id)
-        
-        if remaining < cost:
+        with self._unpaid_lock:
+            unpaid = self._unpaid.get(user_id, 0.0)
+        remaining = self.get_budget(user_id) - unpaid
+
+        # NaN compares False against everything: fail closed rather than grant an unlimited budget
+        if not (math.isfinite(cost) and math.isfinite(remaining)) or remaining < cost:
             raise BudgetExhaustedException(
                 f"Budget exhausted. Requested: {cost:.2f}, Remaining: {remaining:.2f}"
             )
@@ -43,3 +59,33 @@ class BudgetAccountant:
 
         except Exception as e:
             print(f"Error updating budget for {user_id}: {e}")
+
+    def commit(self, user_id: str, cost: float) -> bool:
+        """
+        Deducts the cost (plus any earlier unpaid charge) on the reserved budget connections,
+        retrying with exponential backoff. A charge that still fails is kept as unpaid, never dropped.
+        Returns True once the database holds every charge of the user.
+        Raises ValueError for a non-finite cost, which would otherwise poison the unpaid charge.
+        """
+        if not math.isfinite(cost):
+            raise ValueError(f"Invalid budget charge for {user_id}: {cost}")
+        with self._unpaid_lock:
+            cost += self._unpaid.pop(user_id, 0.0)
+        for attempt in range(self.retries + 1):
+            try:
+                execute_query("UPDATE staffs SET privacy_budget = privacy_budget - %s WHERE national_id = %s", (cost, user_id),
+                              pool=self.pool or get_budget_pool())
+                return True
+            except Exception as e:
+                error = e
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+
+        print(f"Error committing budget for {user_id} (kept as unpaid): {error}")
+        with self._unpaid_lock:
+            self._unpaid[user_id] = self._unpaid.get(user_id, 0.0) + cost
+        return False
+
+    def unpaid(self, user_id: str) -> float:
+        with self._unpaid_lock:
+            return self._unpaid.get(user_id, 0.0)
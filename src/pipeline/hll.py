@@ -0,0 +1,380 @@
+import os
+import math
+import threading
+import time
+import numpy as np
+import sqlglot
+from sqlglot import exp
+from src.db_connector import execute_query
+
+# Cohort Estimation Configuration (disabled unless COHORT_ESTIMATION=1)
+COHORT_ESTIMATION = os.getenv("COHORT_ESTIMATION", "0") == "1"
+HLL_PRECISION = int(os.getenv("HLL_PRECISION", 12))                   # 2^p registers per sketch (p=12: ~1.6% standard error)
+HLL_CONFIDENCE_SIGMAS = float(os.getenv("HLL_CONFIDENCE_SIGMAS", 3.0)) # error margin in standard errors
+HLL_SAFETY_FACTOR = float(os.getenv("HLL_SAFETY_FACTOR", 20.0))       # lower bound must reach MIN_COHORT_SIZE times this
+HLL_REFRESH_INTERVAL = float(os.getenv("HLL_REFRESH_INTERVAL", 60.0))  # seconds between incremental refreshes (new rows)
+HLL_REBUILD_INTERVAL = float(os.getenv("HLL_REBUILD_INTERVAL", 3600.0)) # seconds between full rebuilds (deletes, updates)
+HLL_BATCH_SIZE = int(os.getenv("HLL_BATCH_SIZE", 100000))             # rows fetched per query while building
+
+# Sketched tables: rows are read in `key` order, distinct `id` values are counted per cell of
+# `dimensions` ((column, bucket width) with None = exact value). The age buckets match the
+# rewriter's generalization, so generalized range predicates select whole cells.
+SKETCH_TABLES = {
+    "patients": {"key": "patient_id", "id": "patient_id", "dimensions": (("age", 10), ("gender", None))},
+    "diagnoses": {"key": "diagnosis_id", "id": "patient_id", "dimensions": (("disease_name", None),)},
+}
+
+_MASK64 = (1 << 64) - 1
+
+def _hash64(values) -> np.ndarray:
+    """
+    splitmix64 finalizer over integer values (vectorized).
+    """
+    x = (np.asarray(values, dtype=np.int64).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15))
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    length = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        over = x >= (np.uint64(1) << np.uint64(shift))
+        length[over] += shift
+        x = np.where(over, x >> np.uint64(shift), x)
+    return length + (x > 0)
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over integer IDs. Sketches with the same precision merge
+    losslessly (register-wise max), so the sketch of a union of cells is the merge of theirs.
+    """
+    __slots__ = ("p", "m", "registers")
+
+    def __init__(self, p: int = HLL_PRECISION, registers: np.ndarray = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def add_many(self, values):
+        if len(values) == 0:
+            return
+        hashed = _hash64(values)
+        index = (hashed >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashed & np.uint64(_MASK64 >> self.p)
+        rank = (64 - self.p) - _bit_length(rest).astype(np.int64) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def add(self, value: int):
+        self.add_many([value])
+
+    def merge(self, other: "HyperLogLog"):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def copy(self) -> "HyperLogLog":
+        return HyperLogLog(self.p, self.registers.copy())
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def estimate(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Small range: linear counting
+            return m * math.log(m / zeros)
+        return raw
+
+def _normalize(value):
+    # MySQL's default collations compare case-insensitively and ignore trailing spaces
+    return value.lower().rstrip() if isinstance(value, str) else value
+
+class TableSketches:
+    """
+    One HyperLogLog per cell (combination of dimension values) of a table, kept up to date
+    by incremental refreshes (rows after the last key seen) and periodic full rebuilds.
+    Readers always see a complete set of cells: refreshes update copies and swap them in.
+    """
+    def __init__(self, table: str, key: str, id_column: str, dimensions: tuple, precision: int = HLL_PRECISION):
+        self.table = table
+        self.key = key
+        self.id_column = id_column
+        self.dimensions = dimensions
+        self.precision = precision
+        self.cells = {}
+        self.last_key = None
+        self.refreshed_at = None
+        self.rebuilt_at = None
+
+    def refresh(self, full: bool = False, batch_size: int = HLL_BATCH_SIZE, executor=None):
+        executor = executor or (lambda sql, params: execute_query(sql, params, read_only=True))
+        cells = {} if full else {cell: sketch.copy() for cell, sketch in self.cells.items()}
+        last_key = None if full else self.last_key
+
+        columns = ", ".join([self.key, self.id_column] + [column for column, _ in self.dimensions])
+        while True:
+            where = f"WHERE {self.key} > %s " if last_key is not None else ""
+            params = (last_key, batch_size) if last_key is not None else (batch_size,)
+            rows = executor(f"SELECT {columns} FROM {self.table} {where}ORDER BY {self.key} LIMIT %s", params)
+            if not rows:
+                break
+
+            ids_by_cell = {}
+            for row in rows:
+                if row[self.id_column] is None:
+                    continue
+                cell = tuple(self._cell_value(row[column], width) for column, width in self.dimensions)
+                ids_by_cell.setdefault(cell, []).append(row[self.id_column])
+            for cell, ids in ids_by_cell.items():
+                sketch = cells.get(cell)
+                if sketch is None:
+                    sketch = cells[cell] = HyperLogLog(self.precision)
+                sketch.add_many(ids)
+
+            last_key = rows[-1][self.key]
+            if len(rows) < batch_size:
+                break
+
+        now = time.monotonic()
+        self.cells, self.last_key, self.refreshed_at = cells, last_key, now
+        if full:
+            self.rebuilt_at = now
+
+    @staticmethod
+    def _cell_value(value, width):
+        if value is None:
+            return None
+        if width is not None:
+            return int(value) // width
+        return _normalize(value)
+
+    def matching_sketch(self, constraints: dict):
+        """
+        Merges the sketches of all cells satisfying the constraints ({column: set of values} or
+        {column: (low bucket, high bucket)}). Returns None when no cell matches.
+        """
+        merged = None
+        for cell, sketch in self.cells.items():
+            if not all(self._cell_matches(value, constraints.get(column)) for (column, _), value in zip(self.dimensions, cell)):
+                continue
+            if merged is None:
+                merged = sketch.copy()
+            else:
+                merged.merge(sketch)
+        return merged
+
+    @staticmethod
+    def _cell_matches(value, constraint) -> bool:
+        if constraint is None:
+            return True
+        if value is None:
+            return False
+        if isinstance(constraint, tuple):
+            low, high = constraint
+            return low <= value < high
+        return value in constraint
+
+class _Unsupported(Exception):
+    pass
+
+_FLIPPED = {exp.GT: exp.LT, exp.GTE: exp.LTE, exp.LT: exp.GT, exp.LTE: exp.GTE, exp.EQ: exp.EQ}
+
+class CohortSketches:
+    """
+    Decides clearly-safe cohorts from HyperLogLog sketches. Supported cohort queries count the
+    distinct sketched ID of one table, without GROUP BY/HAVING, filtered by a conjunction of
+    equality/IN predicates on exact dimensions and bucket-aligned ranges on bucketed ones.
+    Anything else, sketches that are not built yet, and estimates whose lower error bound is not
+    far above the minimum cohort size return False, so the caller runs the exact count.
+    Sketches are refreshed on a background thread, never on the request path.
+    """
+    def __init__(self, tables: dict = None, precision: int = HLL_PRECISION, sigmas: float = HLL_CONFIDENCE_SIGMAS,
+                 safety_factor: float = HLL_SAFETY_FACTOR, refresh_interval: float = HLL_REFRESH_INTERVAL,
+                 rebuild_interval: float = HLL_REBUILD_INTERVAL, executor=None):
+        tables = SKETCH_TABLES if tables is None else tables
+        self.tables = {name: TableSketches(name, spec["key"], spec["id"], spec["dimensions"], precision)
+                       for name, spec in tables.items()}
+        self.sigmas = sigmas
+        self.safety_factor = safety_factor
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._executor = executor
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, full: bool = False):
+        """
+        Refreshes every table now (full=True rebuilds from scratch). Failures are reported and leave the old sketches.
+        """
+        with self._refresh_lock:
+            for sketches in self.tables.values():
+                try:
+                    rebuild = full or sketches.rebuilt_at is None or time.monotonic() - sketches.rebuilt_at >= self.rebuild_interval
+                    sketches.refresh(full=rebuild, executor=self._executor)
+                except Exception as e:
+                    print(f"Warning: Cohort sketch refresh for '{sketches.table}' failed: {e}")
+
+    def _refresh_in_background(self):
+        due = any(sketches.refreshed_at is None or time.monotonic() - sketches.refreshed_at >= self.refresh_interval
+                  for sketches in self.tables.values())
+        if due and not self._refresh_lock.locked():
+            threading.Thread(target=self.refresh, name="cohort-sketch-refresh", daemon=True).start()
+
+    def estimate(self, count_sql: str, dialect: str = "mysql"):
+        """
+        Returns (estimate, lower bound) of the cohort size, or None if the query cannot be answered from the sketches.
+        """
+        self._refresh_in_background()
+        try:
+            sketches, constraints = self._analyze(count_sql, dialect)
+        except _Unsupported:
+            return None
+        if sketches.refreshed_at is None:
+            return None
+
+        merged = sketches.matching_sketch(constraints)
+        if merged is None:
+            return None
+        estimate = merged.estimate()
+        return estimate, estimate * (1 - self.sigmas * merged.relative_error)
+
+    def is_clearly_safe(self, count_sql: str, min_cohort_size: int, dialect: str = "mysql") -> bool:
+        result = self.estimate(count_sql, dialect)
+        return result is not None and result[1] >= min_cohort_size * self.safety_factor
+
+    def _analyze(self, count_sql: str, dialect: str) -> tuple:
+        try:
+            parsed = sqlglot.parse_one(count_sql, read=dialect)
+        except Exception:
+            raise _Unsupported()
+        if not isinstance(parsed, exp.Select) or any(parsed.args.get(arg) for arg in ("joins", "group", "having", "limit", "distinct")):
+            raise _Unsupported()
+
+        tables = list(parsed.find_all(exp.Table))
+        if len(tables) != 1 or tables[0].name.lower() not in self.tables:
+            raise _Unsupported()
+        sketches = self.tables[tables[0].name.lower()]
+
+        # SELECT COUNT(DISTINCT <sketched id>)
+        if len(parsed.expressions) != 1:
+            raise _Unsupported()
+        count = parsed.expressions[0]
+        if not isinstance(count, exp.Count) or not isinstance(count.this, exp.Distinct):
+            raise _Unsupported()
+        counted = count.this.expressions
+        if len(counted) != 1 or not isinstance(counted[0], exp.Column) or counted[0].name.lower() != sketches.id_column:
+            raise _Unsupported()
+
+        widths = {column: width for column, width in sketches.dimensions}
+        constraints = {}
+        where = parsed.args.get("where")
+        if where is not None:
+            for term in self._conjuncts(where.this):
+                self._apply(term, widths, constraints)
+        return sketches, constraints
+
+    def _conjuncts(self, node):
+        while isinstance(node, exp.Paren):
+            node = node.this
+        if isinstance(node, exp.And):
+            yield from self._conjuncts(node.this)
+            yield from self._conjuncts(node.expression)
+        else:
+            yield node
+
+    def _apply(self, term, widths: dict, constraints: dict):
+        if isinstance(term, exp.Between):
+            self._apply(exp.GTE(this=term.this, expression=term.args["low"]), widths, constraints)
+            self._apply(exp.LTE(this=term.this, expression=term.args["high"]), widths, constraints)
+            return
+
+        if isinstance(term, exp.In):
+            column = self._dimension(term.this, widths)
+            if widths[column] is not None or term.args.get("query") or not term.expressions:
+                raise _Unsupported()
+            values = {_normalize(self._literal(value)) for value in term.expressions}
+            self._restrict_values(constraints, column, values)
+            return
+
+        if type(term) not in _FLIPPED:
+            raise _Unsupported()
+        node_type, left, right = type(term), term.this, term.expression
+        if not isinstance(left, exp.Column):
+            node_type, left, right = _FLIPPED[node_type], right, left
+        column = self._dimension(left, widths)
+        value = self._literal(right)
+        width = widths[column]
+
+        if width is None:
+            if node_type is not exp.EQ:
+                raise _Unsupported()
+            self._restrict_values(constraints, column, {_normalize(value)})
+            return
+
+        if isinstance(value, str) or value != int(value):
+            raise _Unsupported()
+        value = int(value)
+        # Integer bounds turned into half-open bucket ranges; only whole buckets can be answered
+        if node_type is exp.GTE:
+            low, high = value, None
+        elif node_type is exp.GT:
+            low, high = value + 1, None
+        elif node_type is exp.LT:
+            low, high = None, value
+        elif node_type is exp.LTE:
+            low, high = None, value + 1
+        else:
+            raise _Unsupported()
+        if (low is not None and low % width) or (high is not None and high % width):
+            raise _Unsupported()
+
+        current_low, current_high = constraints.get(column, (-math.inf, math.inf))
+        if low is not None:
+            current_low = max(current_low, low // width)
+        if high is not None:
+            current_high = min(current_high, high // width)
+        constraints[column] = (current_low, current_high)
+
+    @staticmethod
+    def _dimension(node, widths: dict) -> str:
+        if not isinstance(node, exp.Column) or node.name.lower() not in widths:
+            raise _Unsupported()
+        return node.name.lower()
+
+    @staticmethod
+    def _literal(node):
+        negative = False
+        if isinstance(node, exp.Neg):
+            negative, node = True, node.this
+        if not isinstance(node, exp.Literal):
+            raise _Unsupported()
+        if node.is_string:
+            if negative:
+                raise _Unsupported()
+            return node.this
+        number = float(node.this)
+        return -number if negative else number
+
+    @staticmethod
+    def _restrict_values(constraints: dict, column: str, values: set):
+        current = constraints.get(column)
+        constraints[column] = values if current is None else current & values
+
+_COHORT_SKETCHES = None
+_sketches_lock = threading.Lock()
+
+def get_cohort_sketches():
+    """
+    Returns the process-wide cohort sketches (None unless COHORT_ESTIMATION=1).
+    """
+    global _COHORT_SKETCHES
+    if not COHORT_ESTIMATION:
+        return None
+    if _COHORT_SKETCHES is None:
+        with _sketches_lock:
+            if _COHORT_SKETCHES is None:
+                _COHORT_SKETCHES = CohortSketches()
+    return _COHORT_SKETCHES
@@ -1,21 +1,44 @@
 from src.pipeline.rewriter import rewrite_for_count
 from src.db_connector import execute_query
+from src.tracing import current_trace
+from src import metrics
 
 MIN_COHORT_SIZE = 5
 
 class PrivacyViolationException(Exception):
     pass
 
-def check_cohort_violation(sql: str) -> bool:
+def check_cohort_violation(sql: str, backend=None, timeout_ms: float = None, executor=None, estimator=None) -> bool:
     """
     Checks if the query result size is below the minimum required threshold.
+    Runs on the analytic backend when one is given, otherwise on MySQL.
+    timeout_ms bounds the execution time of the count query.
+    executor(sql, timeout_ms), if given, replaces the direct execution (e.g. to coalesce identical queries).
+    estimator (see hll.CohortSketches), if given, passes cohorts that are clearly above the minimum
+    without running the count; all other cohorts are still counted exactly.
     Returns True if violation detected.
     """
     # Rewrite to get size count
-    count_sql = rewrite_for_count(sql)
+    dialect = backend.dialect if backend else "mysql"
+    count_sql = rewrite_for_count(sql, dialect=dialect)
+
+    trace = current_trace()
+    if trace:
+        trace.sql["cohort"] = count_sql
+
+    if estimator is not None:
+        clearly_safe = estimator.is_clearly_safe(count_sql, MIN_COHORT_SIZE, dialect)
+        metrics.record_cache("cohort_sketch", clearly_safe)
+        if clearly_safe:
+            return False
     
     # Execute check
-    results = execute_query(count_sql)
+    if executor:
+        results = executor(count_sql, timeout_ms)
+    elif backend:
+        results = backend.execute_query(count_sql, timeout_ms=timeout_ms)
+    else:
+        results = execute_query(count_sql, timeout_ms=timeout_ms, read_only=True)
     
     if not results:
         return True
@@ -1,12 +1,50 @@
+import os
 import sqlglot
 from sqlglot import exp
 
-def rewrite_for_count(sql: str) -> str:
+# Summary Table Routing (the summary tables and their triggers are created by `seed_db.py --summary_tables`)
+SUMMARY_ROUTING = os.getenv("SUMMARY_ROUTING", "0") == "1"
+
+# Summary tables kept current by triggers, per base table. `buckets` maps a base column to the summary
+# column holding its bucket's lower bound (and the bucket width), `columns` are kept at their exact values.
+# `aggregates` maps a base aggregate to its equivalent over the summary rows; `per_value_aggregates`
+# are only equivalent when the given column is grouped by or fixed to one value.
+SUMMARY_TABLES = {
+    "patients": {
+        "summary": "patients_summary",
+        "buckets": {"age": ("age_bucket", 10)},
+        "columns": {"gender"},
+        "aggregates": {
+            "COUNT(*)": "COALESCE(SUM(row_count), 0)",
+            "COUNT(PATIENT_ID)": "COALESCE(SUM(row_count), 0)",
+            "COUNT(DISTINCT PATIENT_ID)": "COALESCE(SUM(row_count), 0)",
+            "COUNT(AGE)": "COALESCE(SUM(age_count), 0)",
+            "SUM(AGE)": "CASE WHEN SUM(age_count) > 0 THEN SUM(age_sum) END",
+        },
+        "per_value_aggregates": {},
+    },
+    "diagnoses": {
+        "summary": "diagnoses_summary",
+        "buckets": {},
+        "columns": {"disease_name"},
+        "aggregates": {
+            "COUNT(*)": "COALESCE(SUM(row_count), 0)",
+            "COUNT(DIAGNOSIS_ID)": "COALESCE(SUM(row_count), 0)",
+        },
+        # A patient with several diseases is counted once per disease
+        "per_value_aggregates": {
+            "COUNT(DISTINCT PATIENT_ID)": ("disease_name", "COALESCE(SUM(patient_count), 0)"),
+        },
+    },
+}
+
+def rewrite_for_count(sql: str, dialect: str = "mysql") -> str:
     """
     Rewrites query to return count for cohort analysis.
     Strips columns and uses COUNT(DISTINCT id) based on table.
+    The input is read and the output emitted in the given dialect.
     """
-    parsed = sqlglot.parse_one(sql)
+    parsed = sqlglot.parse_one(sql, read=dialect)
     if not isinstance(parsed, exp.Select):
        return sql 
 
@@ -28,13 +66,15 @@ def rewrite_for_count(sql: str) -> str:
     # Construct COUNT(DISTINCT col)
     count_expr = exp.Count(this=exp.Distinct(expressions=[exp.Column(this=exp.Identifier(this=target_col, quoted=False))]))
     parsed.set("expressions", [count_expr])
-    return parsed.sql(dialect="mysql")
+    return parsed.sql(dialect=dialect)
 
-def enforce_aggregation(sql: str) -> str:
+def enforce_aggregation(sql: str, dialect: str = "mysql", read: str = "mysql") -> str:
     """
     Ensures the query is an aggregation. Rewrite raw SELECTs to COUNT(*).
+    The input is read in the `read` dialect (MySQL, like generalize_filters' output) and the
+    result is emitted in the dialect of the backend that will execute it.
     """
-    parsed = sqlglot.parse_one(sql)
+    parsed = sqlglot.parse_one(sql, read=read)
     
     if not isinstance(parsed, exp.Select):
         return sql
@@ -52,13 +92,13 @@ def enforce_aggregation(sql: str) -> str:
         # Defaults to COUNT(*) for safety
         parsed.set("expressions", [exp.Count(this=exp.Star())])
     
-    return parsed.sql(dialect="mysql")
+    return parsed.sql(dialect=dialect)
 
 def generalize_filters(sql: str) -> str:
     """
     Generalization.
     """
-    parsed = sqlglot.parse_one(sql)
+    parsed = sqlglot.parse_one(sql, read="mysql")
     
     where = parsed.args.get("where")
     if not where:
@@ -102,3 +142,144 @@ def generalize_filters(sql: str) -> str:
     parsed.set("where", new_where)
     
     return parsed.sql(dialect="mysql")
+
+class _NotRoutable(Exception):
+    pass
+
+_COMPARISONS = (exp.EQ, exp.NEQ, exp.GT, exp.GTE, exp.LT, exp.LTE)
+_FLIPPED = {exp.EQ: exp.EQ, exp.NEQ: exp.NEQ, exp.GT: exp.LT, exp.GTE: exp.LTE, exp.LT: exp.GT, exp.LTE: exp.GTE}
+
+def route_to_summary(sql: str, dialect: str = "mysql", summaries: dict = None) -> str:
+    """
+    Rewrites an aggregate over a base table into the equivalent aggregate over its summary table,
+    so its cost no longer depends on the table size. The query must fit the summary's grain:
+    predicates and GROUP BY on summary columns only, bucketed columns compared with bucket-aligned
+    bounds, and aggregates listed for the summary. Returns None when it does not fit.
+    """
+    summaries = SUMMARY_TABLES if summaries is None else summaries
+    try:
+        parsed = sqlglot.parse_one(sql, read=dialect)
+        return _route(parsed, summaries).sql(dialect=dialect)
+    except Exception:
+        # _NotRoutable, or SQL sqlglot cannot handle: the base table is queried
+        return None
+
+def _route(parsed, summaries: dict):
+    if not isinstance(parsed, exp.Select) or any(parsed.args.get(arg) for arg in ("joins", "having", "order", "distinct", "with", "laterals")):
+        raise _NotRoutable()
+    if len(list(parsed.find_all(exp.Select))) > 1:
+        raise _NotRoutable()
+    tables = list(parsed.find_all(exp.Table))
+    if len(tables) != 1 or tables[0].name.lower() not in summaries:
+        raise _NotRoutable()
+    table = tables[0]
+    summary = summaries[table.name.lower()]
+
+    # Columns fixed to one value (top-level `col = literal`) or grouped by
+    single_valued = set()
+    where = parsed.args.get("where")
+    if where is not None:
+        single_valued.update(_pinned_columns(where.this, summary))
+        where.set("this", _route_predicate(where.this, summary))
+
+    group = parsed.args.get("group")
+    if group is not None:
+        if any(group.args.get(arg) for arg in group.args if arg != "expressions") or not group.expressions:
+            raise _NotRoutable()
+        for column in group.expressions:
+            if not isinstance(column, exp.Column) or column.name.lower() not in summary["columns"]:
+                raise _NotRoutable()
+            single_valued.add(column.name.lower())
+
+    parsed.set("expressions", [_route_projection(projection, summary, single_valued) for projection in parsed.expressions])
+
+    # Keep the base table name as alias, so qualified column references still resolve
+    if not table.alias:
+        table.set("alias", exp.TableAlias(this=exp.to_identifier(table.name)))
+    table.set("this", exp.to_identifier(summary["summary"]))
+    return parsed
+
+def _route_projection(projection, summary: dict, single_valued: set):
+    node = projection.this if isinstance(projection, exp.Alias) else projection
+    if isinstance(node, exp.Column):
+        if node.name.lower() not in single_valued or node.name.lower() not in summary["columns"]:
+            raise _NotRoutable()
+        return projection
+
+    key = node.copy()
+    for column in key.find_all(exp.Column):
+        column.set("table", None)
+    key = key.sql(dialect="mysql").upper()
+
+    if key in summary["aggregates"]:
+        replacement = summary["aggregates"][key]
+    elif key in summary["per_value_aggregates"] and summary["per_value_aggregates"][key][0] in single_valued:
+        replacement = summary["per_value_aggregates"][key][1]
+    else:
+        raise _NotRoutable()
+
+    replacement = sqlglot.parse_one(replacement, read="mysql")
+    if isinstance(projection, exp.Alias):
+        projection.set("this", replacement)
+        return projection
+    # Unaliased aggregates keep the result column name of the original expression
+    return exp.alias_(replacement, node.sql(dialect="mysql"), quoted=True)
+
+def _pinned_columns(node, summary: dict):
+    while isinstance(node, exp.Paren):
+        node = node.this
+    if isinstance(node, exp.And):
+        yield from _pinned_columns(node.this, summary)
+        yield from _pinned_columns(node.expression, summary)
+    elif isinstance(node, exp.EQ):
+        for column, value in ((node.this, node.expression), (node.expression, node.this)):
+            if isinstance(column, exp.Column) and column.name.lower() in summary["columns"] and isinstance(value, exp.Literal):
+                yield column.name.lower()
+
+def _route_predicate(node, summary: dict):
+    """
+    Maps a WHERE condition on the base table to the same condition on the summary table.
+    """
+    if isinstance(node, (exp.And, exp.Or)):
+        return node.__class__(this=_route_predicate(node.this, summary), expression=_route_predicate(node.expression, summary))
+    if isinstance(node, (exp.Paren, exp.Not)):
+        return node.__class__(this=_route_predicate(node.this, summary))
+
+    if isinstance(node, exp.Is) and isinstance(node.this, exp.Column) and isinstance(node.expression, exp.Null):
+        column = node.this
+        name = column.name.lower()
+        if name in summary["columns"]:
+            return node
+        if name in summary["buckets"]:
+            bucket_column = exp.column(summary["buckets"][name][0], table=column.table or None)
+            return exp.Is(this=bucket_column, expression=exp.Null())
+        raise _NotRoutable()
+
+    if type(node) not in _FLIPPED:
+        raise _NotRoutable()
+    node_type, column, value = type(node), node.this, node.expression
+    if not isinstance(column, exp.Column):
+        node_type, column, value = _FLIPPED[node_type], value, column
+    if not isinstance(column, exp.Column) or not isinstance(value, (exp.Literal, exp.Neg)) or list(value.find_all(exp.Column)):
+        raise _NotRoutable()
+
+    name = column.name.lower()
+    if name in summary["columns"]:
+        return node
+    if name not in summary["buckets"]:
+        raise _NotRoutable()
+
+    # Bucketed column: only bounds on bucket edges select whole buckets
+    bucket_name, width = summary["buckets"][name]
+    try:
+        bound = int(value.sql(dialect="mysql"))
+    except ValueError:
+        raise _NotRoutable()
+    if node_type is exp.GT:
+        node_type, bound = exp.GTE, bound + 1
+    elif node_type is exp.LTE:
+        node_type, bound = exp.LT, bound + 1
+    if node_type not in (exp.GTE, exp.LT) or bound % width:
+        raise _NotRoutable()
+    bucket_column = exp.column(bucket_name, table=column.table or None)
+    return node_type(this=bucket_column, expression=exp.Literal.number(bound))
@@ -1,5 +1,9 @@
+import os
+import re
+from collections import deque
 import sqlglot
 from sqlglot import exp
+from src import metrics
 
 ALLOWED_TABLES = {'patients', 'diagnoses', 'staffs'} # Known system schema
 ALLOWED_OPERATORS = {exp.EQ, exp.GT, exp.LT, exp.GTE, exp.LTE, exp.And, exp.Or, exp.Paren}
@@ -35,95 +39,280 @@ ROLE_POLICIES = {
     "default": { # Fallback / Guest
         "allowed_tables": set(),
         "blocked_columns": set(),
-        "allow_where": False
+        "allow_where": False,
+        "limits": {"max_length": 1000, "max_nodes": 100, "max_predicate_depth": 8, "max_literals": 20}
     }
 }
 
+# Pre-parse Filter Configuration
+MAX_QUERY_LENGTH = int(os.getenv("MAX_QUERY_LENGTH", 10000))
+MAX_NESTING_DEPTH = int(os.getenv("MAX_NESTING_DEPTH", 32))
+
+# Query Complexity Limits (a role policy may override any of them under "limits")
+COMPLEXITY_LIMITS = {
+    "max_length": MAX_QUERY_LENGTH,                               # characters in the statement
+    "max_nodes": int(os.getenv("MAX_QUERY_NODES", 500)),          # AST nodes
+    "max_predicate_depth": int(os.getenv("MAX_PREDICATE_DEPTH", 32)), # nested AND/OR/NOT/parentheses in WHERE
+    "max_literals": int(os.getenv("MAX_QUERY_LITERALS", 100)),    # literal values
+}
+
 class SecurityException(Exception):
     pass
 
+# Statement-leading keywords of modification queries
+_MODIFICATION_KEYWORDS = frozenset({"INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "REPLACE", "TRUNCATE"})
+
+# Lexical tokens for the pre-filter: quoted strings/identifiers and comments are consumed whole,
+# so parentheses, semicolons and keywords inside them are ignored.
+_PREFILTER_TOKENS = re.compile(r"""
+    '(?:[^'\\]|\\.|'')*'
+  | "(?:[^"\\]|\\.|"")*"
+  | `(?:[^`]|``)*`
+  | /\*.*?\*/
+  | (?:--|\#)[^\n]*
+  | (?P<unterminated>['"`]|/\*)
+  | (?P<word>\w+)
+  | (?P<symbol>\S)
+""", re.VERBOSE | re.DOTALL)
+
+def _prefilter_reject(reason: str, message: str):
+    if metrics.METRICS_ENABLED:
+        metrics.PREFILTER_REJECTIONS.inc(reason=reason)
+    raise SecurityException(message)
+
+def prefilter_query(sql: str, max_length: int = None, max_depth: int = None):
+    """
+    Cheap lexical checks run before the full sqlglot parse. Rejects oversized input, multiple statements,
+    modification statements and unbalanced or excessively nested parentheses with the same messages as the
+    full validator. Returns None when the query passes or cannot be decided (e.g. unterminated strings).
+    """
+    max_length = MAX_QUERY_LENGTH if max_length is None else max_length
+    max_depth = MAX_NESTING_DEPTH if max_depth is None else max_depth
+
+    if len(sql) > max_length:
+        _prefilter_reject("length", f"Query exceeds the maximum length of {max_length} characters.")
+
+    depth = 0
+    first_word = None
+    statement_ended = False
+
+    for token in _PREFILTER_TOKENS.finditer(sql):
+        if token.group("unterminated"):
+            # Cannot tokenize reliably; let the parser report the error
+            return None
+
+        # Anything after a top-level ';' (even another ';' or a comment) is a second statement
+        if statement_ended:
+            _prefilter_reject("multiple_statements", "Multiple statements are not allowed.")
+
+        symbol = token.group("symbol")
+        if symbol == "(":
+            depth += 1
+            if depth > max_depth:
+                _prefilter_reject("nesting", f"Query nesting exceeds the maximum depth of {max_depth}.")
+        elif symbol == ")":
+            depth -= 1
+            if depth < 0:
+                _prefilter_reject("syntax", "Invalid SQL syntax: unbalanced parentheses.")
+        elif symbol == ";":
+            statement_ended = True
+        elif first_word is None and token.group("word"):
+            first_word = token.group("word").upper()
+            if first_word in _MODIFICATION_KEYWORDS:
+                _prefilter_reject("modification", "Modification queries are not allowed.")
+
+    if depth != 0:
+        _prefilter_reject("syntax", "Invalid SQL syntax: unbalanced parentheses.")
+    if first_word is None:
+        _prefilter_reject("empty", "Only SELECT queries are allowed.")
+
+    return None
+
+class CompiledPolicy:
+    """
+    Role policy compiled into frozen lookup sets (built once, shared by all requests).
+    """
+    __slots__ = ("allowed_tables", "blocked_columns", "allow_where",
+                 "max_length", "max_nodes", "max_predicate_depth", "max_literals")
+
+    def __init__(self, policy: dict):
+        self.allowed_tables = frozenset(t.lower() for t in policy["allowed_tables"])
+        self.blocked_columns = frozenset(c.lower() for c in policy["blocked_columns"])
+        self.allow_where = bool(policy["allow_where"])
+
+        limits = {**COMPLEXITY_LIMITS, **policy.get("limits", {})}
+        self.max_length = int(limits["max_length"])
+        self.max_nodes = int(limits["max_nodes"])
+        self.max_predicate_depth = int(limits["max_predicate_depth"])
+        self.max_literals = int(limits["max_literals"])
+
+def compile_policies(policies: dict = None) -> dict:
+    """
+    Compiles ROLE_POLICIES (or the given policies) into CompiledPolicy objects keyed by role.
+    """
+    policies = ROLE_POLICIES if policies is None else policies
+    return {role.lower(): CompiledPolicy(policy) for role, policy in policies.items()}
+
+_COMPILED_POLICIES = compile_policies()
+_ALLOWED_TABLES = frozenset(ALLOWED_TABLES)
+# Incremented by reload_policies(); part of the middleware's plan cache key
+POLICY_GENERATION = 0
+
+def reload_policies():
+    """
+    Recompiles the role policies after ROLE_POLICIES has been modified.
+    """
+    global _COMPILED_POLICIES, _ALLOWED_TABLES, POLICY_GENERATION
+    _COMPILED_POLICIES = compile_policies()
+    _ALLOWED_TABLES = frozenset(ALLOWED_TABLES)
+    POLICY_GENERATION += 1
+
+FORBIDDEN_TYPES = (exp.Insert, exp.Update, exp.Delete, exp.Drop, exp.Alter, exp.Create)
+_COMPARISON_TYPES = (exp.EQ, exp.NEQ, exp.GT, exp.LT, exp.GTE, exp.LTE)
+_LITERAL_TYPES = (exp.Literal, exp.Boolean)
+# Boolean connectives that add a level of predicate nesting
+_CONNECTIVE_TYPES = frozenset({exp.And, exp.Or, exp.Xor, exp.Not, exp.Paren})
+# Connectives whose flat chains (a AND b AND c, parsed left-deep) count as a single level
+_CHAIN_TYPES = frozenset({exp.And, exp.Or})
+
+# Node kinds for the single-pass visitor
+_OTHER, _FORBIDDEN, _JOIN, _COLUMN, _TABLE, _WHERE, _SKIP, _COMPARISON, _OPERATOR, _LITERAL = range(10)
+
+# type -> kind dispatch table, filled lazily (isinstance is only evaluated once per node class)
+_NODE_KINDS = {}
+
+def _node_kind(node_type) -> int:
+    kind = _NODE_KINDS.get(node_type)
+    if kind is None:
+        if issubclass(node_type, FORBIDDEN_TYPES):
+            kind = _FORBIDDEN
+        elif issubclass(node_type, exp.Join):
+            kind = _JOIN
+        elif issubclass(node_type, exp.Column):
+            kind = _COLUMN
+        elif issubclass(node_type, exp.Table):
+            kind = _TABLE
+        elif issubclass(node_type, exp.Where):
+            kind = _WHERE
+        elif issubclass(node_type, exp.Literal):
+            kind = _LITERAL
+        elif issubclass(node_type, exp.Identifier):
+            kind = _SKIP
+        elif issubclass(node_type, _COMPARISON_TYPES):
+            kind = _COMPARISON
+        elif node_type in ALLOWED_OPERATORS:
+            kind = _OPERATOR
+        else:
+            kind = _OTHER
+        _NODE_KINDS[node_type] = kind
+    return kind
+
+# Precedence of deferred violations (lower wins), matching the order the checks were originally applied in
+_NOT_SELECT, _TABLE_VIOLATION, _WHERE_NOT_ALLOWED, _TAUTOLOGY, _WHERE_OPERATOR = range(5)
+
 def validate_query(sql: str, user_role: str = "default") -> bool:
     """
     Parses and validates the SQL against the defined schema allowlist and blocklist.
+    All checks run in a single pass over the AST. Forbidden statements, JOINs, blocked columns and
+    exceeded complexity limits stop the pass immediately; the remaining violations are reported with
+    their original precedence.
     """
-    policy = ROLE_POLICIES.get(user_role.lower(), ROLE_POLICIES["default"])
-    
+    policy = _COMPILED_POLICIES.get(user_role.lower(), _COMPILED_POLICIES["default"])
+
+    # Shed obvious garbage before paying for a full parse
+    prefilter_query(sql, max_length=policy.max_length)
+
+    # Read as MySQL, like the rewriter: "x" is a string there, not a column
     try:
-        parsed_list = sqlglot.parse(sql)
+        parsed_list = sqlglot.parse(sql, read="mysql")
     except Exception as e:
         raise SecurityException(f"Invalid SQL syntax: {e}")
 
     if len(parsed_list) > 1:
         raise SecurityException("Multiple statements are not allowed.")
-        
+
     parsed = parsed_list[0]
 
     # Validate against restricted elements
-    forbidden_types = (
-        exp.Insert, exp.Update, exp.Delete, exp.Drop, exp.Alter, exp.Create
-    )
-    if isinstance(parsed, forbidden_types):
+    if isinstance(parsed, FORBIDDEN_TYPES):
         raise SecurityException("Modification queries are not allowed.")
-    
-    # Also traverse to ensure no subqueries do weird things
-    for node in parsed.walk():
-        if isinstance(node, forbidden_types):
+
+    # Whitelist Validation (raised after the pass, forbidden nodes/joins/columns take precedence)
+    is_select = isinstance(parsed, exp.Select)
+    deferred_rank, deferred_message = (_NOT_SELECT, "Only SELECT queries are allowed.") if not is_select else (None, None)
+    where_root = parsed.args.get("where") if is_select else None
+
+    blocked_columns = policy.blocked_columns
+    allowed_tables = policy.allowed_tables
+
+    # Complexity budgets (bound the cost of this pass and of the rewriter's transforms)
+    nodes_left = policy.max_nodes
+    literals_left = policy.max_literals
+    max_predicate_depth = policy.max_predicate_depth
+
+    # Breadth-first, like the original per-check walks: the shallowest violation is the one reported
+    pending = deque([(parsed, False, 0)])
+    while pending:
+        node, in_where, depth = pending.popleft()
+        node_type = type(node)
+        kind = _node_kind(node_type)
+
+        nodes_left -= 1
+        if nodes_left < 0:
+            raise SecurityException(f"Query is too complex: more than {policy.max_nodes} syntax nodes for role '{user_role}'.")
+        if kind == _LITERAL:
+            literals_left -= 1
+            if literals_left < 0:
+                raise SecurityException(f"Query is too complex: more than {policy.max_literals} literals for role '{user_role}'.")
+        if in_where and node_type in _CONNECTIVE_TYPES and not (node_type in _CHAIN_TYPES and type(node.parent) is node_type):
+            depth += 1
+            if depth > max_predicate_depth:
+                raise SecurityException(f"Query is too complex: predicate nesting deeper than {max_predicate_depth} for role '{user_role}'.")
+
+        if kind == _FORBIDDEN:
             raise SecurityException(f"Forbidden statement type detected: {type(node)}")
 
         # Block Joins
-        if isinstance(node, exp.Join):
+        if kind == _JOIN:
             raise SecurityException("JOIN operations are not allowed due to sensitivity risks.")
-            
+
         # Attribute Level Check (Policy Based)
-        if isinstance(node, exp.Column):
-            col_name = node.name.lower()
-            if col_name in policy["blocked_columns"]:
+        if kind == _COLUMN:
+            if node.name.lower() in blocked_columns:
                 raise SecurityException(f"Access to sensitive identifier '{node.name}' is prohibited for role '{user_role}'.")
-        
-    # Whitelist Validation
-    if not isinstance(parsed, exp.Select):
-        raise SecurityException("Only SELECT queries are allowed.")
-
-    # Schema Check (Role Based)
-    for table in parsed.find_all(exp.Table):
-        table_name = table.name.lower() # Normalize table name
-        if table_name not in ALLOWED_TABLES:
-             raise SecurityException(f"Table '{table_name}' does not exist in the system.")
-        
-        if table_name not in policy["allowed_tables"]:
-            raise SecurityException(f"Access to table '{table_name}' is denied for role '{user_role}'.")
-
-    # Validate WHERE clause specifically for operators
-    if parsed.args.get("where"):
-        if not policy["allow_where"]:
-             raise SecurityException(f"WHERE clauses are not allowed for role '{user_role}'.")
-             
-        # Tautology Detection (Anti-SQL Injection)
-        where_clause = parsed.args.get("where")
-        for node in where_clause.walk():
-            # Check for Comparisons between literals
-            if isinstance(node, (exp.EQ, exp.NEQ, exp.GT, exp.LT, exp.GTE, exp.LTE)):
-                # Check directly if they are literal values
-                if isinstance(node.this, (exp.Literal, exp.Boolean)) and isinstance(node.expression, (exp.Literal, exp.Boolean)):
-                    raise SecurityException(f"SQL Injection detected: Literal comparison '{node.sql()}' is forbidden.")
-
-        where_node = parsed.args.get("where")
-        for node in where_node.walk():
-            # Skip the specific values, columns, and the Where node itself
-            if isinstance(node, (exp.Literal, exp.Where, exp.Identifier)):
-                continue
-            
-            if isinstance(node, exp.Column):
-                col_name = node.name.lower()
-                if col_name in policy["blocked_columns"]:
-                     raise SecurityException(f"Access to sensitive identifier '{node.name}' in WHERE is prohibited.")
-                continue
-                
+
+        # Schema Check (Role Based)
+        elif kind == _TABLE:
+            if deferred_rank is None or deferred_rank > _TABLE_VIOLATION:
+                table_name = node.name.lower() # Normalize table name
+                if table_name not in _ALLOWED_TABLES:
+                    deferred_rank, deferred_message = _TABLE_VIOLATION, f"Table '{table_name}' does not exist in the system."
+                elif table_name not in allowed_tables:
+                    deferred_rank, deferred_message = _TABLE_VIOLATION, f"Access to table '{table_name}' is denied for role '{user_role}'."
+
+        elif kind == _WHERE:
+            if node is where_root:
+                if not policy.allow_where and (deferred_rank is None or deferred_rank > _WHERE_NOT_ALLOWED):
+                    deferred_rank, deferred_message = _WHERE_NOT_ALLOWED, f"WHERE clauses are not allowed for role '{user_role}'."
+                in_where = True
+
+        # Validate WHERE clause specifically for operators
+        elif in_where and kind != _SKIP and kind != _LITERAL and (deferred_rank is None or deferred_rank > _TAUTOLOGY):
+            # Tautology Detection (Anti-SQL Injection): comparisons between literals
+            if kind == _COMPARISON and isinstance(node.this, _LITERAL_TYPES) and isinstance(node.expression, _LITERAL_TYPES):
+                deferred_rank, deferred_message = _TAUTOLOGY, f"SQL Injection detected: Literal comparison '{node.sql()}' is forbidden."
+
             # If it's an operator, check if allowed
-            if type(node) not in ALLOWED_OPERATORS:
-                if isinstance(node, exp.Func):
-                    raise SecurityException(f"Functions are not allowed in WHERE clause: {type(node)}")
-                
-                raise SecurityException(f"Operator or Logic '{type(node).__name__}' is not allowed in WHERE clause.")
+            elif kind == _OTHER or (kind == _COMPARISON and type(node) not in ALLOWED_OPERATORS):
+                if deferred_rank is None or deferred_rank > _WHERE_OPERATOR:
+                    if isinstance(node, exp.Func):
+                        deferred_rank, deferred_message = _WHERE_OPERATOR, f"Functions are not allowed in WHERE clause: {type(node)}"
+                    else:
+                        deferred_rank, deferred_message = _WHERE_OPERATOR, f"Operator or Logic '{type(node).__name__}' is not allowed in WHERE clause."
+
+        pending.extend((child, in_where, depth) for child in node.iter_expressions())
+
+    if deferred_message:
+        raise SecurityException(deferred_message)
 
     return True
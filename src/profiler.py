@@ -0,0 +1,219 @@
+import os
+import json
+import atexit
+import time
+import glob
+import pstats
+import cProfile
+import itertools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from src.config import load_env
+
+load_env()
+
+# Profiler Configuration (sample rate 0 = disabled)
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# JSON file ({"sample_rate": N, "tracemalloc": bool}) re-read when it changes, for control without a restart
+# (unset = no control file is watched)
+PROFILE_CONTROL_FILE = os.getenv("PROFILE_CONTROL_FILE", "")
+
+class SampledProfiler:
+    """
+    Profiles one in `sample_rate` requests with cProfile (and optionally tracemalloc).
+    Samples are merged and periodically written to rotating files in `output_dir`:
+    - profile-<ts>.pstats     (snakeviz, gprof2dot, pstats)
+    - profile-<ts>.collapsed  (collapsed stacks for flamegraph.pl / speedscope)
+    - profile-<ts>.alloc.txt  (top allocation sites, when tracemalloc is on)
+    """
+    def __init__(self, sample_rate: int = PROFILE_SAMPLE_RATE, tracemalloc_enabled: bool = PROFILE_TRACEMALLOC,
+                 output_dir: str = PROFILE_DIR, control_file: str = PROFILE_CONTROL_FILE,
+                 flush_every: int = 50, max_files: int = 10):
+        self.sample_rate = sample_rate
+        self.tracemalloc_enabled = tracemalloc_enabled
+        self.output_dir = output_dir
+        self.control_file = control_file
+        self.flush_every = flush_every
+        self.max_files = max_files
+
+        self._counter = itertools.count(1)
+        # Only one cProfile session can be active at a time; busy samples are skipped
+        self._profile_lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._stats = None
+        self._allocations = {}
+        self._samples = 0
+        self._control_mtime = None
+        self._control_checked = 0.0
+
+    def configure(self, sample_rate: int = None, tracemalloc_enabled: bool = None):
+        """
+        Changes the sampling settings at runtime.
+        """
+        if sample_rate is not None:
+            self.sample_rate = max(0, int(sample_rate))
+        if tracemalloc_enabled is not None:
+            self.tracemalloc_enabled = bool(tracemalloc_enabled)
+            if not self.tracemalloc_enabled and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    def _reload_control_file(self):
+        # Checked at most once per second
+        now = time.monotonic()
+        if now - self._control_checked < 1.0:
+            return
+        self._control_checked = now
+
+        try:
+            mtime = os.path.getmtime(self.control_file)
+        except OSError:
+            return
+        if mtime == self._control_mtime:
+            return
+        self._control_mtime = mtime
+
+        try:
+            with open(self.control_file, "r") as f:
+                control = json.load(f)
+            self.configure(control.get("sample_rate"), control.get("tracemalloc"))
+        except Exception as e:
+            print(f"Warning: Invalid profiler control file '{self.control_file}': {e}")
+
+    @contextmanager
+    def maybe_profile(self):
+        """
+        Wraps one request; profiles it if it is the sampled one in N.
+        """
+        if self.control_file:
+            self._reload_control_file()
+
+        rate = self.sample_rate
+        if rate <= 0 or next(self._counter) % rate != 0 or not self._profile_lock.acquire(blocking=False):
+            yield
+            return
+
+        try:
+            snapshot_before = None
+            if self.tracemalloc_enabled:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(10)
+                snapshot_before = tracemalloc.take_snapshot()
+
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                snapshot_after = tracemalloc.take_snapshot() if snapshot_before is not None else None
+                self._merge(profile, snapshot_before, snapshot_after)
+        finally:
+            self._profile_lock.release()
+
+    def _merge(self, profile, snapshot_before, snapshot_after):
+        with self._merge_lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+
+            if snapshot_after is not None:
+                for stat in snapshot_after.compare_to(snapshot_before, "lineno")[:50]:
+                    if stat.size_diff <= 0:
+                        continue
+                    frame = stat.traceback[0]
+                    site = f"{frame.filename}:{frame.lineno}"
+                    size, count = self._allocations.get(site, (0, 0))
+                    self._allocations[site] = (size + stat.size_diff, count + stat.count_diff)
+
+            self._samples += 1
+            should_flush = self._samples >= self.flush_every
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the merged samples to a new set of files and starts a new aggregation window.
+        """
+        with self._merge_lock:
+            stats, allocations, samples = self._stats, self._allocations, self._samples
+            self._stats, self._allocations, self._samples = None, {}, 0
+
+        if stats is None:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}")
+
+        stats.dump_stats(prefix + ".pstats")
+        with open(prefix + ".collapsed", "w") as f:
+            for stack, micros in sorted(collapsed_stacks(stats).items()):
+                f.write(f"{stack} {micros}\n")
+        if allocations:
+            with open(prefix + ".alloc.txt", "w") as f:
+                f.write(f"# Allocation growth over {samples} sampled requests (bytes, blocks)\n")
+                for site, (size, count) in sorted(allocations.items(), key=lambda item: -item[1][0]):
+                    f.write(f"{size}\t{count}\t{site}\n")
+
+        self._rotate()
+        return prefix
+
+    def _rotate(self):
+        prefixes = sorted({path.rsplit(".pstats", 1)[0] for path in glob.glob(os.path.join(self.output_dir, "profile-*.pstats"))})
+        for prefix in prefixes[:-self.max_files]:
+            for path in glob.glob(prefix + ".*"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+def _func_label(func: tuple) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{lineno}({name})"
+
+def collapsed_stacks(stats, max_depth: int = 40, min_micros: float = 1.0) -> dict:
+    """
+    Approximates collapsed stacks ("a;b;c self_micros") from pstats' caller graph.
+    A callee's time is split across its callers in proportion to the time each caller spent in it.
+    """
+    raw = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = {}
+
+    def walk(func, path, scale):
+        _, _, tottime, _, _ = raw[func]
+        label = ";".join(_func_label(f) for f in path)
+        micros = tottime * scale * 1e6
+        if micros >= min_micros:
+            stacks[label] = stacks.get(label, 0) + int(micros)
+        if len(path) >= max_depth:
+            return
+        for callee, edge_cumtime in callees.get(func, []):
+            if callee in path:
+                continue
+            callee_cumtime = raw[callee][3]
+            if callee_cumtime <= 0:
+                continue
+            callee_scale = scale * min(1.0, edge_cumtime / callee_cumtime)
+            if callee_cumtime * callee_scale * 1e6 >= min_micros:
+                walk(callee, path + (callee,), callee_scale)
+
+    for func, (_, _, _, _, callers) in raw.items():
+        if not callers:
+            walk(func, (func,), 1.0)
+    return stacks
+
+# Shared by all middleware instances so runtime changes apply process-wide
+PROFILER = SampledProfiler()
+atexit.register(PROFILER.flush)
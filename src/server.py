@@ -0,0 +1,250 @@
+import os
+import json
+import math
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from src.pipeline.sanitizer import SecurityException
+from src.pipeline.privacy_guard import PrivacyViolationException
+from src.pipeline.budget import BudgetExhaustedException
+from src.admission import AdmissionRejectedException
+from src.db_connector import QueryTimeoutException, PoolTimeoutException, get_pool, get_replicas
+from src.audit import close_audit_log
+from src.capture import close_recorder
+from src.materialize import materialization_status
+from src.daemon import json_default
+from src import metrics
+
+# Query Service Configuration
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8080))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", 32))         # worker threads per process
+SERVER_PROCESSES = int(os.getenv("SERVER_PROCESSES", 1))      # pre-forked processes sharing the listening socket
+SERVER_KEEPALIVE_TIMEOUT = float(os.getenv("SERVER_KEEPALIVE_TIMEOUT", 5.0)) # idle seconds before a connection is closed
+SERVER_DRAIN_TIMEOUT = float(os.getenv("SERVER_DRAIN_TIMEOUT", 30.0))        # seconds to finish in-flight requests on shutdown
+SERVER_MAX_BODY = int(os.getenv("SERVER_MAX_BODY", 1024 * 1024))
+
+# Exception -> HTTP status (anything else is a 500)
+ERROR_STATUS = (
+    (SecurityException, 403),
+    (PrivacyViolationException, 403),
+    (BudgetExhaustedException, 403),
+    (AdmissionRejectedException, 503),
+    (PoolTimeoutException, 503),
+    (QueryTimeoutException, 504),
+)
+
+def error_status(e: Exception) -> int:
+    for exception_type, status in ERROR_STATUS:
+        if isinstance(e, exception_type):
+            return status
+    return 500
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /query   {"query": ..., "user_id": ..., "epsilon": ..., "deadline_ms": optional}
+                  -> the process_query response dict, or {"status": "error", "error": type, "message": ...}
+    GET  /health  -> 200 while serving, 503 while draining
+    GET  /metrics -> Prometheus text exposition
+    GET  /materializations -> materialized shapes, candidates and recent decisions (see src.materialize)
+    """
+    protocol_version = "HTTP/1.1" # keep-alive
+    timeout = SERVER_KEEPALIVE_TIMEOUT
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/query":
+            self._send_json(404, {"status": "error", "error": "NotFound", "message": f"Unknown path '{self.path}'."})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > SERVER_MAX_BODY:
+                raise ValueError(f"Request body exceeds {SERVER_MAX_BODY} bytes.")
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            query = payload["query"]
+            user_id = str(payload["user_id"])
+            epsilon = float(payload.get("epsilon", 1.0))
+            if not math.isfinite(epsilon) or epsilon <= 0:
+                raise ValueError(f"epsilon must be a finite number above 0, got {epsilon}")
+            deadline_ms = payload.get("deadline_ms")
+            deadline_ms = float(deadline_ms) if deadline_ms is not None else None
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"status": "error", "error": "BadRequest", "message": f"Invalid request: {e}"})
+            return
+
+        middleware = self.server.middleware
+        try:
+            if deadline_ms is not None:
+                response = middleware.process_query(query, user_id, epsilon, deadline_ms=deadline_ms)
+            else:
+                response = middleware.process_query(query, user_id, epsilon)
+        except Exception as e:
+            self._send_json(error_status(e), {"status": "error", "error": type(e).__name__, "message": str(e)})
+            return
+        self._send_json(200, response)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            if self.server.draining:
+                self._send_json(503, {"status": "draining"})
+            else:
+                self._send_json(200, {"status": "ok"})
+        elif path == "/metrics":
+            self._send(200, metrics.dump().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/materializations":
+            self._send_json(200, materialization_status())
+        else:
+            self._send_json(404, {"status": "error", "error": "NotFound", "message": f"Unknown path '{self.path}'."})
+
+    def _send_json(self, status: int, body: dict):
+        self._send(status, json.dumps(body, default=json_default).encode("utf-8"), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.draining:
+            # Ask keep-alive clients to reconnect elsewhere
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class QueryServer(HTTPServer):
+    """
+    HTTP server handing each connection to a bounded pool of worker threads. All workers share one
+    PrivacyMiddleware and therefore its connection pools. shutdown_gracefully() stops accepting,
+    lets in-flight requests finish (up to drain_timeout) and flushes pending budget commits.
+    """
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple = (SERVER_HOST, SERVER_PORT), middleware=None, workers: int = SERVER_WORKERS,
+                 bind_and_activate: bool = True):
+        super().__init__(address, QueryRequestHandler, bind_and_activate)
+        if middleware is None:
+            from src.main import middleware
+        self.middleware = middleware
+        self.draining = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query-worker")
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def shutdown_gracefully(self, drain_timeout: float = SERVER_DRAIN_TIMEOUT) -> bool:
+        """
+        Must be called from a thread other than the one running serve_forever().
+        Returns False if some requests were still running when the drain timeout expired.
+        """
+        self.draining = True
+        self.shutdown()
+        self.server_close()
+
+        done = threading.Event()
+        def _drain():
+            self._executor.shutdown(wait=True)
+            done.set()
+        threading.Thread(target=_drain, daemon=True).start()
+        drained = done.wait(drain_timeout)
+
+        flush = getattr(self.middleware, "flush_budget_commits", None)
+        if flush:
+            flush(drain_timeout)
+        return drained
+
+def _serve(server: QueryServer, drain_timeout: float):
+    drainers = []
+
+    def _stop(signum, frame):
+        # serve_forever() runs on this thread, so the drain has to run on another one
+        if not drainers:
+            drainer = threading.Thread(target=server.shutdown_gracefully, args=(drain_timeout,), daemon=True)
+            drainers.append(drainer)
+            drainer.start()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    server.serve_forever()
+    for drainer in drainers:
+        drainer.join()
+    # Pre-forked children leave with os._exit, so the audit log and capture cannot rely on atexit
+    close_audit_log()
+    close_recorder()
+    get_pool().close_all()
+    get_replicas().close_all()
+
+def run_server(host: str = SERVER_HOST, port: int = SERVER_PORT, workers: int = SERVER_WORKERS,
+               processes: int = SERVER_PROCESSES, drain_timeout: float = SERVER_DRAIN_TIMEOUT):
+    """
+    Serves until SIGTERM/SIGINT. With processes > 1, the listening socket is opened once and
+    shared by pre-forked children (each with its own middleware and pools); the parent only
+    forwards signals and waits for them.
+    """
+    if processes <= 1:
+        server = QueryServer((host, port), workers=workers)
+        print(f"Query service listening on http://{host}:{server.server_address[1]} ({workers} workers)")
+        _serve(server, drain_timeout)
+        return
+
+    listener = socket.create_server((host, port), backlog=QueryServer.request_queue_size * processes)
+    print(f"Query service listening on http://{host}:{listener.getsockname()[1]} ({processes} processes x {workers} workers)")
+
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            # Child: serve on the inherited socket; middleware and pools are created after the fork
+            server = QueryServer((host, port), workers=workers, bind_and_activate=False)
+            server.socket.close()
+            server.socket = listener
+            try:
+                _serve(server, drain_timeout)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def _forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, _forward)
+    for pid in children:
+        while True:
+            try:
+                os.waitpid(pid, 0)
+                break
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+    listener.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Privacy Preserving Query HTTP Service")
+    parser.add_argument("--host", type=str, default=SERVER_HOST, help=f"Bind address (default: {SERVER_HOST})")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help=f"Port (default: {SERVER_PORT})")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help=f"Worker threads per process (default: {SERVER_WORKERS})")
+    parser.add_argument("--processes", type=int, default=SERVER_PROCESSES, help=f"Pre-forked processes (default: {SERVER_PROCESSES})")
+    parser.add_argument("--drain_timeout", type=float, default=SERVER_DRAIN_TIMEOUT, help=f"Shutdown drain timeout in seconds (default: {SERVER_DRAIN_TIMEOUT})")
+
+    args = parser.parse_args()
+    run_server(args.host, args.port, args.workers, args.processes, args.drain_timeout)
@@ -0,0 +1,134 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import sqlglot
+from sqlglot import exp
+from src.db_connector import ConnectionPool, DB_POOL_SIZE, parse_dsn, connect_to, execute_query
+
+# Shard Configuration: comma-separated DSNs, one hospital_db per site (empty = single database)
+DB_SHARD_DSNS = os.getenv("DB_SHARD_DSNS", "")
+
+# How a column of per-shard partial results is combined
+_MERGE_SUM, _MERGE_MIN, _MERGE_MAX, _MERGE_KEY = "sum", "min", "max", "key"
+
+# Alias prefix of GROUP BY expressions projected only to merge the groups of each shard
+_SHARD_KEY = "_shard_key"
+
+@lru_cache(maxsize=1024)
+def merge_plan(sql: str) -> tuple:
+    """
+    Returns the merge operation of each output column of an aggregate query.
+    COUNT/SUM partials add up, MIN/MAX partials take the extreme, other columns (GROUP BY keys) identify rows.
+    AVG cannot be merged from partials; the middleware already executes it as SUM and COUNT.
+    """
+    parsed = sqlglot.parse_one(sql, read="mysql")
+    plan = []
+    for expr in parsed.expressions:
+        if isinstance(expr, exp.Alias):
+            expr = expr.this
+        if isinstance(expr, (exp.Count, exp.Sum)):
+            plan.append(_MERGE_SUM)
+        elif isinstance(expr, exp.Min):
+            plan.append(_MERGE_MIN)
+        elif isinstance(expr, exp.Max):
+            plan.append(_MERGE_MAX)
+        elif isinstance(expr, exp.Avg):
+            raise ValueError("AVG cannot be merged across shards; split it into SUM and COUNT.")
+        else:
+            plan.append(_MERGE_KEY)
+    return tuple(plan)
+
+@lru_cache(maxsize=1024)
+def shard_statement(sql: str) -> tuple:
+    """
+    Returns the statement each shard runs, its merge plan and the number of trailing merge-key columns.
+    Every GROUP BY expression is also projected, so rows of the same group merge even when the
+    select list drops the key (as the cohort COUNT(DISTINCT ...) does).
+    HAVING filters per-shard partials and cannot be merged, so it is rejected.
+    """
+    parsed = sqlglot.parse_one(sql, read="mysql")
+    if parsed.args.get("having"):
+        raise ValueError("HAVING cannot be evaluated on per-shard partials.")
+    group = parsed.args.get("group")
+    keys = list(group.expressions) if group else []
+    for i, key in enumerate(keys):
+        parsed = parsed.select(exp.alias_(key.copy(), f"{_SHARD_KEY}{i}"), copy=False)
+    statement = parsed.sql(dialect="mysql") if keys else sql
+    return statement, merge_plan(statement), len(keys)
+
+def _merge_value(op: str, current, value):
+    if value is None:
+        return current
+    if current is None:
+        return value
+    if op == _MERGE_SUM:
+        return current + value
+    if op == _MERGE_MIN:
+        return min(current, value)
+    return max(current, value)
+
+def merge_partials(plan: tuple, partials: list) -> list:
+    """
+    Combines the exact per-shard rows into the rows a single database would have returned.
+    """
+    merged = {}
+    for rows in partials:
+        for row in rows:
+            columns = list(row.keys())
+            values = list(row.values())
+            key = tuple(value for op, value in zip(plan, values) if op == _MERGE_KEY)
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            target = merged[key]
+            for op, column, value in zip(plan, columns, values):
+                if op != _MERGE_KEY:
+                    target[column] = _merge_value(op, target[column], value)
+    return list(merged.values())
+
+def _drop_keys(rows: list, hidden: int) -> list:
+    """
+    Removes the trailing merge-key columns added by shard_statement.
+    """
+    if not hidden:
+        return rows
+    return [dict(list(row.items())[:-hidden]) for row in rows]
+
+class ShardedBackend:
+    """
+    Analytic backend fanning aggregate and cohort SQL out to one MySQL database per site in parallel.
+    The exact partial results are merged before the middleware adds noise, so a network-wide statistic
+    costs one noise draw and one budget charge, and its latency is that of the slowest shard.
+    Sites are assumed to hold disjoint patients, so per-site COUNT(DISTINCT ...) values add up.
+    """
+    dialect = "mysql"
+
+    def __init__(self, targets: list, pool_factory=None):
+        pool_factory = pool_factory or (lambda target: ConnectionPool(connect=lambda: connect_to(target)))
+        self.targets = targets
+        self.pools = [pool_factory(target) for target in targets]
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(targets) * DB_POOL_SIZE), thread_name_prefix="shard")
+
+    def execute_query(self, sql: str, params=None, timeout_ms: float = None):
+        """
+        Runs the statement on every shard and returns the merged rows (same shape as db_connector).
+        A failure on any shard fails the whole query, since a partial merge would be wrong.
+        """
+        statement, plan, hidden = shard_statement(sql)
+        futures = [self._executor.submit(execute_query, statement, params, timeout_ms=timeout_ms, pool=pool) for pool in self.pools]
+        partials = [future.result() for future in futures]
+        return _drop_keys(merge_partials(plan, partials), hidden)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for pool in self.pools:
+            pool.close_all()
+
+def get_backend():
+    """
+    Returns the sharded backend when DB_SHARD_DSNS is set, otherwise None.
+    """
+    targets = [parse_dsn(dsn) for dsn in DB_SHARD_DSNS.split(",") if dsn.strip()]
+    if not targets:
+        return None
+    return ShardedBackend(targets)
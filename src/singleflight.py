@@ -0,0 +1,77 @@
+import copy
+import os
+import threading
+import time
+from src.db_connector import QueryTimeoutException
+
+# Request Coalescing Configuration
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT", "1") == "1"
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def _copy_error(error: BaseException) -> BaseException:
+    """
+    Returns a new exception like the leader's, so no exception object is raised in several threads.
+    """
+    try:
+        return copy.copy(error)
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller (the leader) runs the function,
+    callers arriving while it is in flight wait for and share its result (or a copy of its exception).
+    A leader stopped by its own deadline does not fail the others: each follower retries with the
+    time it has left, one of them becoming the next leader.
+    Nothing is cached; once the leader finishes, the next call runs again.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout_ms: float = None) -> tuple:
+        """
+        Returns (result, shared). fn is called with the caller's remaining timeout in ms (or None).
+        A waiting caller gives up with QueryTimeoutException after timeout_ms.
+        """
+        deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms is not None else None
+        while True:
+            remaining_ms = max(0.0, (deadline - time.monotonic()) * 1000) if deadline is not None else None
+            with self._lock:
+                call = self._calls.get(key)
+                is_leader = call is None
+                if is_leader:
+                    call = _Call()
+                    self._calls[key] = call
+
+            if is_leader:
+                break
+            if not call.done.wait(remaining_ms / 1000 if remaining_ms is not None else None):
+                raise QueryTimeoutException(f"Query exceeded its deadline of {timeout_ms:.0f} ms.")
+            if call.error is None:
+                return call.result, True
+            if not isinstance(call.error, QueryTimeoutException):
+                raise _copy_error(call.error) from call.error
+            # The leader ran out of its own time; retry with ours
+
+        try:
+            call.result = fn(remaining_ms)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
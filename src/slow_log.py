@@ -0,0 +1,114 @@
+import os
+import atexit
+from datetime import datetime, timezone
+from src.db_connector import get_connection
+from src import metrics
+
+# Slow Query Log Configuration (threshold unset = disabled)
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS")) if os.getenv("SLOW_QUERY_THRESHOLD_MS") else None
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "slow_queries.jsonl")
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1"
+
+# Statements from the trace that get EXPLAINed, in this order
+EXPLAIN_STATEMENTS = ("cohort", "executed")
+
+class SlowQuerySink:
+    """
+    Writes slow query records to a JSONL file, first capturing MySQL EXPLAIN output for the
+    cohort and executed SQL when enabled. Runs on the log's writer thread, on its own connection.
+    """
+    def __init__(self, path: str = SLOW_QUERY_LOG, explain: bool = False, connect=None):
+        from src.audit import JsonlAuditSink
+        self.explain = explain
+        self._connect = connect or (lambda: get_connection(force_new=True))
+        self._conn = None
+        self._file = JsonlAuditSink(path, max_bytes=0)
+
+    def write(self, records: list):
+        if self.explain:
+            for record in records:
+                record["explain"] = self._explain(record)
+        self._file.write(records)
+
+    def _explain(self, record: dict) -> dict:
+        explain = {}
+        for name in EXPLAIN_STATEMENTS:
+            sql = record.get(f"{name}_sql")
+            if not sql:
+                continue
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                with self._conn.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN {sql}")
+                    explain[name] = cursor.fetchall()
+                self._conn.commit()
+            except Exception as e:
+                explain[name] = {"error": str(e)}
+                self._close_connection()
+        return explain
+
+    def _close_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except:
+                pass
+            self._conn = None
+
+    def close(self):
+        self._close_connection()
+        self._file.close()
+
+class SlowQueryLog:
+    """
+    Trace listener recording requests slower than `threshold_ms` to a JSONL file.
+    Requests only append to the bounded buffer of an audit.AuditLog; its background writer does
+    the file writes and, with explain=True, the EXPLAIN captures. When `max_pending` records are
+    waiting, new ones are dropped rather than delaying a request.
+    """
+    def __init__(self, threshold_ms: float, path: str = SLOW_QUERY_LOG, explain: bool = False, max_pending: int = 1000,
+                 flush_interval: float = 1.0, connect=None):
+        # Imported here: src.audit loads the pipeline modules, which `import src.main` defers
+        from src.audit import AuditLog
+        self.threshold_ms = threshold_ms
+        self.path = path
+        self.explain = explain
+        self._log = AuditLog(SlowQuerySink(path, explain, connect), buffer_size=max_pending, batch_size=100,
+                             flush_interval=flush_interval, overflow="drop_newest")
+        self._log.records_metric = metrics.SLOW_QUERY_RECORDS
+        atexit.register(self.close)
+
+    def __call__(self, trace):
+        total_ms = trace.total_ns / 1e6
+        if total_ms < self.threshold_ms:
+            return
+
+        self._log.append({
+            "timestamp": datetime.fromtimestamp(trace.started_at, timezone.utc).isoformat(),
+            "user_id": trace.user_id,
+            "role": trace.role,
+            "total_ms": round(total_ms, 3),
+            "stages_ms": {stage: round(ms, 3) for stage, ms in trace.stages_ms().items()},
+            "error": type(trace.error).__name__ if trace.error else None,
+            "original_sql": trace.query,
+            "executed_sql": trace.sql.get("executed"),
+            "cohort_sql": trace.sql.get("cohort"),
+        })
+
+    @property
+    def dropped(self) -> int:
+        return self._log.dropped
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Waits until buffered records (and their EXPLAIN captures) are written. Returns False on timeout.
+        """
+        return self._log.flush(timeout)
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """
+        Writes the buffered records and closes the file. Later requests are not logged.
+        """
+        atexit.unregister(self.close)
+        return self._log.close(timeout)
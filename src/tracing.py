@@ -0,0 +1,62 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Pipeline stages timed by PrivacyMiddleware.process_query (in execution order)
+STAGES = ("admission", "role", "validate", "budget_check", "rewrite", "cohort", "execute", "noise", "budget_commit")
+
+_local = threading.local()
+
+class RequestTrace:
+    """
+    Collects per-stage timings (perf_counter_ns) and the SQL statements of a single request.
+    """
+    def __init__(self, user_id: str = None, query: str = None, deadline_ms: float = None):
+        self.user_id = user_id
+        self.query = query
+        self.role = None
+        self.error = None
+        self.epsilon = None         # requested
+        self.epsilon_charged = 0.0  # deducted from the budget
+        self.stages = {}
+        self.sql = {}
+        self.started_at = time.time()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.deadline_ns = self.start_ns + int(deadline_ms * 1e6) if deadline_ms is not None else None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + (time.perf_counter_ns() - start)
+
+    def finish(self):
+        self.end_ns = time.perf_counter_ns()
+
+    @property
+    def total_ns(self) -> int:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return end - self.start_ns
+
+    def remaining_ms(self):
+        """
+        Milliseconds left before the request deadline (None without a deadline).
+        """
+        if self.deadline_ns is None:
+            return None
+        return (self.deadline_ns - time.perf_counter_ns()) / 1e6
+
+    def stages_ms(self) -> dict:
+        return {name: ns / 1e6 for name, ns in self.stages.items()}
+
+def current_trace():
+    """
+    Returns the trace of the request running on this thread, if any.
+    """
+    return getattr(_local, "trace", None)
+
+def set_current_trace(trace):
+    _local.trace = trace
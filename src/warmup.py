@@ -0,0 +1,93 @@
+import os
+import json
+import time
+from collections import Counter
+from src.db_connector import get_pool, get_replicas
+from src.pipeline.sanitizer import ROLE_POLICIES, SecurityException
+
+# Warm-up Configuration (file unset = no warm-up)
+WARMUP_FILE = os.getenv("WARMUP_FILE")
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", 4))    # connections opened per pool (capped at the pool size)
+WARMUP_MAX_QUERIES = int(os.getenv("WARMUP_MAX_QUERIES", 500))  # most frequent distinct queries that get planned
+
+def load_warmup_file(path: str, max_queries: int = WARMUP_MAX_QUERIES) -> tuple:
+    """
+    Reads a recorded workload as JSONL. Each record may carry a "query" (batch input format) or
+    "original_sql" (slow query log format) and a "user_id". Returns (queries, user_ids): the
+    `max_queries` most frequent distinct queries and the distinct users, most active first.
+    """
+    queries = Counter()
+    user_ids = Counter()
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"Warning: Skipping malformed warm-up record on line {line_number}.")
+                continue
+            if not isinstance(record, dict):
+                continue
+            query = record.get("query") or record.get("original_sql")
+            if query:
+                queries[query] += 1
+            if record.get("user_id") is not None:
+                user_ids[str(record["user_id"])] += 1
+    return [query for query, _ in queries.most_common(max_queries)], [user_id for user_id, _ in user_ids.most_common()]
+
+def warm_up(middleware, queries: list, user_ids: list, connections: int = WARMUP_CONNECTIONS) -> dict:
+    """
+    Prepares the middleware for the recorded workload before it takes traffic:
+    opens pool connections, looks up the roles of the given users (cached if ROLE_CACHE_TTL > 0), and
+    validates and rewrites every query for each of their roles (all configured roles if no user is known).
+    No aggregate SQL is executed and no budget is read or spent. Failures are reported, never raised.
+    """
+    start = time.perf_counter()
+    stats = {"connections": 0, "roles_loaded": 0, "plans": 0, "rejected": 0}
+
+    pools = [get_pool()] + list(get_replicas().pools)
+    for pool in pools:
+        try:
+            stats["connections"] += pool.prefill(connections)
+        except Exception as e:
+            print(f"Warning: Warm-up could not open connections: {e}")
+
+    roles = set()
+    if user_ids:
+        try:
+            loaded = middleware.preload_roles(user_ids)
+            stats["roles_loaded"] = len(loaded)
+            roles = set(loaded.values())
+        except Exception as e:
+            print(f"Warning: Warm-up could not load roles: {e}")
+
+    if not roles:
+        roles = {role.lower() for role in ROLE_POLICIES}
+
+    for role in sorted(roles):
+        for query in queries:
+            try:
+                middleware.prepare_plan(query, role)
+                stats["plans"] += 1
+            except SecurityException:
+                # The role may not run this query; it will be rejected on the request path as usual
+                stats["rejected"] += 1
+            except Exception as e:
+                stats["rejected"] += 1
+                print(f"Warning: Warm-up could not plan query for role '{role}': {e}")
+
+    stats["roles"] = sorted(roles)
+    stats["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return stats
+
+def warm_up_from_file(middleware, path: str = WARMUP_FILE, connections: int = WARMUP_CONNECTIONS) -> dict:
+    try:
+        queries, user_ids = load_warmup_file(path)
+    except OSError as e:
+        print(f"Warning: Warm-up file unavailable: {e}")
+        return None
+    stats = warm_up(middleware, queries, user_ids, connections)
+    print(f"Warm-up: {stats['connections']} connections, {stats['roles_loaded']} users, "
+          f"{stats['plans']} plans ({stats['rejected']} rejected) in {stats['duration_ms']:.0f}ms")
+    return stats
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPORT_FILE = 'test_report.json'
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that must not be imported by `import src.main` (they load on the first query)
+DEFERRED_MODULES = ("sqlglot", "numpy", "pymysql", "dotenv")
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Parses `python -X importtime` output into {module: (self_us, cumulative_us)}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def measure_import(module: str = "src.main", runs: int = 7) -> dict:
+    """
+    Imports `module` in fresh interpreters and reports median import time, process wall time,
+    the slowest dependencies and which deferred modules got imported anyway.
+    """
+    check = f"import sys, {module}; print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    import_us, wall_ms, samples = [], [], []
+    loaded = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", check], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True)
+        wall_ms.append((time.perf_counter() - start) * 1000)
+        modules = parse_importtime(proc.stderr)
+        import_us.append(modules[module][1])
+        samples.append(modules)
+        loaded = proc.stdout.strip()
+
+    median_run = samples[import_us.index(sorted(import_us)[len(import_us) // 2])]
+    slowest = sorted(median_run.items(), key=lambda item: -item[1][1])[:15]
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms": statistics.median(import_us) / 1000,
+        "wall_ms": statistics.median(wall_ms),
+        "deferred_modules_loaded": [name for name in loaded.split(",") if name],
+        "slowest": [{"module": name, "self_ms": s / 1000, "cumulative_ms": c / 1000} for name, (s, c) in slowest],
+    }
+
+def compare_to_baseline(result: dict, baseline: dict, tolerance: float = 0.2, min_delta_ms: float = 5.0) -> list:
+    """
+    Returns regressions: import time over the baseline by more than `tolerance` (and min_delta_ms),
+    or deferred modules that are imported eagerly again.
+    """
+    regressions = []
+    old_ms = baseline.get("import_ms")
+    if old_ms is not None:
+        delta = result["import_ms"] - old_ms
+        if delta > min_delta_ms and result["import_ms"] > old_ms * (1 + tolerance):
+            regressions.append({"metric": "import_ms", "baseline": old_ms, "current": result["import_ms"]})
+    for name in result["deferred_modules_loaded"]:
+        if name not in baseline.get("deferred_modules_loaded", []):
+            regressions.append({"metric": "eager_import", "module": name})
+    return regressions
+
+def write_report(result: dict, report_file: str = REPORT_FILE):
+    """
+    Merges the startup results into the metrics JSON consumed by run_test.generate_report.
+    """
+    metrics = {}
+    if os.path.exists(report_file):
+        with open(report_file, 'r') as f:
+            metrics = json.load(f)
+    metrics['startup'] = result
+    with open(report_file, 'w') as f:
+        json.dump(metrics, f, indent=4)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup (import time) benchmark")
+    parser.add_argument("--module", type=str, default="src.main", help="Module to import (default: src.main)")
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters to measure (default: 7)")
+    parser.add_argument("--baseline", type=str, help="Baseline JSON to compare against")
+    parser.add_argument("--save_baseline", type=str, help="Write this result as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed import time slowdown vs. baseline (default: 0.2 = 20%%)")
+    parser.add_argument("--report", type=str, default=REPORT_FILE, help=f"Metrics JSON to update (default: {REPORT_FILE})")
+    args = parser.parse_args(argv)
+
+    result = measure_import(args.module, args.runs)
+    print(f"import {result['module']}: {result['import_ms']:.1f}ms (process {result['wall_ms']:.1f}ms, median of {result['runs']})")
+    for entry in result["slowest"][:10]:
+        print(f"  {entry['cumulative_ms']:8.2f}ms  {entry['module']}")
+    if result["deferred_modules_loaded"]:
+        print(f"Eagerly imported: {', '.join(result['deferred_modules_loaded'])}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        result["regressions"] = compare_to_baseline(result, baseline, args.tolerance)
+        for regression in result["regressions"]:
+            print(f"REGRESSION: {regression}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=4)
+
+    write_report(result, args.report)
+    return 1 if result.get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import pytest
+import threading
+import time
+from src import db_connector, main
+from src.admission import AdmissionController, AdmissionRejectedException
+from src.db_connector import ConnectionPool
+
+def test_per_user_limit():
+    controller = AdmissionController(max_concurrent=10, max_per_user=2, queue_size=10, queue_timeout=1)
+    tickets = [controller.acquire("alice"), controller.acquire("alice")]
+
+    with pytest.raises(AdmissionRejectedException, match="Too many concurrent queries"):
+        controller.acquire("alice")
+
+    # Other users are unaffected, and released slots can be reused
+    controller.release(controller.acquire("bob"))
+    controller.release(tickets.pop())
+    tickets.append(controller.acquire("alice"))
+
+    for ticket in tickets:
+        controller.release(ticket)
+    assert controller.stats() == {"running": 0, "waiting": 0, "users": 0}
+
+def test_full_queue_rejects_immediately():
+    """
+    With no capacity and a full queue, a request is refused without waiting.
+    """
+    controller = AdmissionController(max_concurrent=1, max_per_user=10, queue_size=1, queue_timeout=5)
+    ticket = controller.acquire("a")
+
+    waiter = threading.Thread(target=lambda: controller.release(controller.acquire("b")))
+    waiter.start()
+    while controller.stats()["waiting"] == 0:
+        time.sleep(0.001)
+
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejectedException, match="queue is full"):
+        controller.acquire("c")
+    assert time.monotonic() - start < 0.5
+
+    controller.release(ticket)
+    waiter.join(timeout=5)
+    assert controller.stats()["running"] == 0
+
+def test_queue_timeout_and_cost_weighting():
+    controller = AdmissionController(max_concurrent=4, max_per_user=10, queue_size=10, queue_timeout=0.05)
+    heavy = controller.acquire("a", cost=3)
+
+    with pytest.raises(AdmissionRejectedException, match="no capacity"):
+        controller.acquire("b", cost=2)
+
+    light = controller.acquire("b", cost=1)
+    controller.release(heavy)
+    controller.release(light)
+    assert controller.stats() == {"running": 0, "waiting": 0, "users": 0}
+
+def test_reweigh_holds_back_later_arrivals():
+    controller = AdmissionController(max_concurrent=4, max_per_user=10, queue_size=0, queue_timeout=1)
+    ticket = controller.reweigh(controller.acquire("a"), 3)
+    assert ticket == ("a", 3)
+    light = controller.acquire("b")
+
+    with pytest.raises(AdmissionRejectedException):
+        controller.acquire("c")
+    controller.release(ticket)
+    controller.release(light)
+    assert controller.stats() == {"running": 0, "waiting": 0, "users": 0}
+
+def test_reweigh_waits_for_the_extra_units():
+    controller = AdmissionController(max_concurrent=2, max_per_user=10, queue_size=4, queue_timeout=5)
+    first, second = controller.acquire("a"), controller.acquire("b")
+
+    # Two heavy requests holding one unit each: neither may deadlock the other
+    tickets = []
+    threads = [threading.Thread(target=lambda t=t: tickets.append(controller.reweigh(t, 2))) for t in (first, second)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while controller.stats()["waiting"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    time.sleep(0.05)
+    assert len(tickets) == 1 and controller.stats() == {"running": 2, "waiting": 1, "users": 2}
+
+    controller.release(tickets[0])
+    for thread in threads:
+        thread.join(5)
+    assert len(tickets) == 2
+    controller.release(tickets[1])
+    assert controller.stats() == {"running": 0, "waiting": 0, "users": 0}
+
+def test_failed_reweigh_keeps_the_old_ticket():
+    controller = AdmissionController(max_concurrent=2, max_per_user=10, queue_size=4, queue_timeout=0.05)
+    light, other = controller.acquire("a"), controller.acquire("b")
+    with pytest.raises(AdmissionRejectedException):
+        controller.reweigh(light, 2)
+    assert controller.stats()["running"] == 2
+    controller.release(light)
+    controller.release(other)
+    assert controller.stats() == {"running": 0, "waiting": 0, "users": 0}
+
+class FakePoolConnection:
+    open = True
+
+    def close(self):
+        pass
+
+def test_overload_is_rejected_before_taking_a_connection(monkeypatch):
+    """
+    Requests are admitted before they check out a pooled connection, so an overloaded middleware
+    refuses them at once instead of letting them time out waiting for the pool.
+    """
+    pool = ConnectionPool(size=2, timeout=0.1, connect=FakePoolConnection)
+    monkeypatch.setattr(db_connector, "get_pool", lambda: pool)
+    started, unblock = threading.Semaphore(0), threading.Event()
+
+    def blocking_role_lookup(sql, params=None, **kwargs):
+        started.release()
+        unblock.wait(5)
+        raise ConnectionError("role lookup aborted")
+    monkeypatch.setattr(main, "execute_query", blocking_role_lookup)
+
+    controller = AdmissionController(max_concurrent=2, max_per_user=10, queue_size=0, queue_timeout=1)
+    middleware = main.PrivacyMiddleware(slow_query_threshold_ms=None, admission_controller=controller)
+
+    def request(user_id):
+        try:
+            middleware.process_query("SELECT COUNT(*) FROM patients", user_id, 0.1)
+        except Exception:
+            pass
+    running = [threading.Thread(target=request, args=(f"user{i}",)) for i in range(2)]
+    for thread in running:
+        thread.start()
+    for _ in running:
+        assert started.acquire(timeout=5)
+
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejectedException):
+        middleware.process_query("SELECT COUNT(*) FROM patients", "user2", 0.1)
+    assert time.monotonic() - start < pool.timeout
+
+    unblock.set()
+    for thread in running:
+        thread.join(timeout=5)
+    assert controller.stats() == {"running": 0, "waiting": 0, "users": 0}
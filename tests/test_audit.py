@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+import pytest
+from src.audit import AuditLog, JsonlAuditSink, audit_record
+from src.pipeline.sanitizer import SecurityException
+from src.tracing import RequestTrace
+
+class MemorySink:
+    def __init__(self, gate: threading.Event = None, failures: int = 0):
+        self.batches = []
+        self.gate = gate
+        self.failures = failures
+        self.closed = False
+
+    def write(self, records):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("audit table unavailable")
+        self.batches.append(list(records))
+
+    def close(self):
+        self.closed = True
+
+def test_audit_record_of_allowed_and_denied_requests():
+    trace = RequestTrace("u1", "SELECT COUNT(*) FROM patients")
+    trace.role, trace.epsilon, trace.epsilon_charged = "doctor", 0.5, 0.5
+    trace.sql["executed"] = "SELECT COUNT(*) FROM patients"
+    trace.finish()
+    record = audit_record(trace)
+    assert (record["decision"], record["reason"], record["epsilon_charged"]) == ("allowed", None, 0.5)
+
+    trace = RequestTrace("u1", "SELECT * FROM staffs")
+    trace.epsilon = 0.5
+    trace.error = SecurityException("Table 'staffs' is not allowed.")
+    trace.finish()
+    record = audit_record(trace)
+    assert record["decision"] == "denied"
+    assert record["reason"] == "SecurityException: Table 'staffs' is not allowed."
+    assert record["epsilon_charged"] == 0.0
+
+def test_batches_and_flush_on_close():
+    sink = MemorySink()
+    audit_log = AuditLog(sink, buffer_size=100, batch_size=10, flush_interval=60)
+    for i in range(25):
+        assert audit_log.append({"n": i})
+    assert audit_log.flush(5)
+    assert [record["n"] for batch in sink.batches for record in batch] == list(range(25))
+    assert all(len(batch) <= 10 for batch in sink.batches)
+
+    audit_log.append({"n": 25})
+    assert audit_log.close(5)
+    assert sink.closed and sink.batches[-1] == [{"n": 25}]
+    # Records after close are dropped, never lost silently
+    assert not audit_log.append({"n": 26})
+    assert audit_log.dropped == 1
+
+@pytest.mark.parametrize("overflow, kept", [("drop_oldest", [0, 3, 4]), ("drop_newest", [0, 1, 2])])
+def test_overflow_policies(overflow, kept):
+    gate = threading.Event()
+    sink = MemorySink(gate)
+    audit_log = AuditLog(sink, buffer_size=2, batch_size=1, flush_interval=60, overflow=overflow)
+    audit_log.append({"n": 0})
+    # The writer holds record 0 in the (blocked) sink; the buffer fills with two more
+    while audit_log.pending() != 1 or audit_log._buffer:
+        time.sleep(0.001)
+    for i in range(1, 5):
+        audit_log.append({"n": i})
+    assert audit_log.dropped == 2
+
+    gate.set()
+    assert audit_log.close(5)
+    assert [record["n"] for batch in sink.batches for record in batch] == kept
+
+def test_failed_batches_are_retried():
+    sink = MemorySink(failures=1)
+    audit_log = AuditLog(sink, buffer_size=10, batch_size=2, flush_interval=0.01)
+    audit_log.append({"n": 0})
+    audit_log.append({"n": 1})
+    assert audit_log.flush(5)
+    assert audit_log.close(5)
+    assert sink.batches == [[{"n": 0}, {"n": 1}]]
+    assert (audit_log.written, audit_log.dropped, audit_log.failed) == (2, 0, 0)
+
+def test_jsonl_sink_rotation(tmp_path):
+    path = str(tmp_path / "audit" / "audit.jsonl")
+    sink = JsonlAuditSink(path, max_bytes=200, backup_count=2)
+    for i in range(32):
+        sink.write([{"n": i, "padding": "x" * 20}])
+    sink.close()
+
+    files = sorted(os.listdir(tmp_path / "audit"))
+    assert files == ["audit.jsonl", "audit.jsonl.1", "audit.jsonl.2"]
+    with open(path) as f:
+        last = [json.loads(line)["n"] for line in f]
+    assert last[-1] == 31
@@ -0,0 +1,50 @@
+import io
+import json
+import time
+import random
+from src.batch import run_batch
+
+class SlowMiddleware:
+    def __init__(self):
+        self.calls = 0
+
+    def process_query(self, user_query, user_id, epsilon_cost):
+        self.calls += 1
+        time.sleep(random.uniform(0, 0.01))
+        return {"status": "success", "result": float(user_query.split()[-1]), "epsilon_used": epsilon_cost}
+
+def _input(n):
+    return io.StringIO("".join(json.dumps({"id": i, "user_id": "u", "query": f"SELECT {i}", "epsilon": 0.1}) + "\n" for i in range(n)))
+
+def test_ordered_parallel_batch():
+    output = io.StringIO()
+    stats = run_batch(SlowMiddleware(), _input(40), output, workers=4, ordered=True)
+
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert stats == {"processed": 40, "failed": 0}
+    assert [record["id"] for record in records] == list(range(40))
+    assert all(record["response"]["result"] == record["id"] for record in records)
+
+def test_errors_are_reported_per_line():
+    output = io.StringIO()
+    stats = run_batch(SlowMiddleware(), io.StringIO('{"user_id": "u"}\n\nnot json\n'), output)
+
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert stats == {"processed": 2, "failed": 2}
+    assert [(record["line"], record["error"]) for record in records] == [(1, "KeyError"), (3, "JSONDecodeError")]
+
+def test_read_ahead_is_bounded():
+    """
+    Input is consumed lazily: no more than workers * 2 records are pending at any time.
+    """
+    middleware = SlowMiddleware()
+    consumed = []
+
+    def lines():
+        for i in range(100):
+            consumed.append(i)
+            assert len(consumed) - middleware.calls <= 2 * 2 + 2
+            yield json.dumps({"user_id": "u", "query": f"SELECT {i}"}) + "\n"
+
+    run_batch(middleware, lines(), io.StringIO(), workers=2)
+    assert middleware.calls == 100
@@ -0,0 +1,81 @@
+import json
+from src.capture import WorkloadRecorder, fingerprint, bind_parameters, pseudonymize
+from src.tracing import RequestTrace
+from replay import assign_users, compare_runs, summarize, load_capture, split_replayable
+
+def test_fingerprint_round_trip():
+    sql = "SELECT AVG(age) FROM patients WHERE age BETWEEN 20.5 AND 40 AND gender = 'F'"
+    shape, params = fingerprint(sql)
+    assert shape == "SELECT AVG(age) FROM patients WHERE age BETWEEN ? AND ? AND gender = ?"
+    assert params == [20.5, 40, "F"]
+    assert bind_parameters(shape, params) == sql
+    assert fingerprint("SELEC garbage ((") == (None, None)
+
+def test_mysql_syntax_round_trips():
+    for sql, expected_params, expected_sql in [
+        ("SELECT COUNT(*) FROM `patients` WHERE `gender` = 'F'", ["F"], None),
+        ("SELECT COUNT(*) FROM patients WHERE address = 'O\\'Brien St'", ["O'Brien St"], "SELECT COUNT(*) FROM patients WHERE address = 'O''Brien St'"),
+        ("SELECT COUNT(*) FROM diagnoses WHERE diagnosis_date >= NOW() - INTERVAL 30 DAY", ["30"],
+         "SELECT COUNT(*) FROM diagnoses WHERE diagnosis_date >= NOW() - INTERVAL '30' DAY"),
+    ]:
+        shape, params = fingerprint(sql)
+        assert params == expected_params
+        assert bind_parameters(shape, params) == (expected_sql or sql)
+    assert fingerprint("SELECT COUNT(*) FROM `patients`")[0] == "SELECT COUNT(*) FROM `patients`"
+    # Typed literals are kept in their equivalent CAST form
+    shape, params = fingerprint("SELECT COUNT(*) FROM patients WHERE dob < DATE '1980-01-01'")
+    assert bind_parameters(shape, params) == "SELECT COUNT(*) FROM patients WHERE dob < CAST('1980-01-01' AS DATE)"
+
+def test_only_unparseable_queries_are_skipped(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    recorder = WorkloadRecorder(str(path), salt="s", batch_size=10, flush_interval=60)
+    for query in ("SELECT COUNT(*) FROM `patients` WHERE `age` > 30", "SELECT COUNT(*) FROM patients WHERE address = 'O\\'Brien'",
+                  "SELEC garbage (("):
+        trace = RequestTrace("u1", query)
+        trace.finish()
+        recorder(trace)
+    assert recorder.close(5)
+
+    replayable, skipped = split_replayable(load_capture(str(path)))
+    assert skipped == 1
+    assert [record["fingerprint"] for record in replayable] == [
+        "SELECT COUNT(*) FROM `patients` WHERE `age` > ?", "SELECT COUNT(*) FROM patients WHERE address = ?"]
+
+def test_recorder_writes_anonymized_records(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    recorder = WorkloadRecorder(str(path), salt="s3cret", batch_size=10, flush_interval=60)
+    trace = RequestTrace("001088000004", "SELECT COUNT(*) FROM patients WHERE age > 30", deadline_ms=500)
+    trace.role, trace.epsilon = "manager", 0.1
+    trace.finish()
+    recorder(trace)
+    assert recorder.close(5)
+
+    text = path.read_text()
+    assert "001088000004" not in text
+    record = json.loads(text)
+    assert record["user"] == pseudonymize("001088000004", "s3cret") != pseudonymize("001088000004", "other")
+    assert (record["fingerprint"], record["params"]) == ("SELECT COUNT(*) FROM patients WHERE age > ?", [30])
+    assert (record["role"], record["epsilon"], record["deadline_ms"], record["error"]) == ("manager", 0.1, 500, None)
+
+def test_replay_user_mapping_and_comparison():
+    records = [{"user": "a", "role": "doctor"}, {"user": "b", "role": "doctor"}, {"user": "a", "role": "doctor"},
+               {"user": "c", "role": "auditor"}]
+    mapping = assign_users(records, {"doctor": ["d1", "d2"], "default": ["x1"]})
+    assert mapping == {"a": "d1", "b": "d2", "c": "x1"}
+
+    def run(latency_ms, error=None):
+        results = [{"fingerprint": "SELECT COUNT(*) FROM patients", "latency_ns": latency_ms * 1e6, "start_lag_ms": 0.0,
+                    "error": error, "captured_error": None, "captured_ms": 5.0} for _ in range(20)]
+        return summarize(results, wall_seconds=2.0)
+
+    baseline = run(10)
+    assert baseline["overall"]["throughput_rps"] == 10
+    assert compare_runs(baseline, run(10.2))["regressions"] == []
+
+    comparison = compare_runs(baseline, run(30))
+    assert comparison["overall"]["p95_ms"]["change"] == 2.0
+    assert comparison["regressions"][0]["current_p95_ms"] == 30
+
+    changed = run(10, error="SecurityException")
+    assert changed["overall"]["outcome_changes"] == 20
+    assert compare_runs(baseline, changed)["regressions"][0]["current_errors"] == {"SecurityException": 20}
@@ -0,0 +1,61 @@
+import os
+import pytest
+from src.columnar import ColumnarBackend
+from src.pipeline import rewriter
+from src.pipeline.privacy_guard import check_cohort_violation
+
+duckdb = pytest.importorskip("duckdb")
+
+def _make_source(path: str, patients: list):
+    """
+    Offline stand-in for hospital_db: a DuckDB file with the exported tables.
+    """
+    conn = duckdb.connect(path)
+    conn.execute("CREATE OR REPLACE TABLE patients (patient_id INT, national_id VARCHAR, full_name VARCHAR, dob DATE, age INT, gender VARCHAR, address VARCHAR)")
+    conn.execute("CREATE OR REPLACE TABLE diagnoses (diagnosis_id INT, patient_id INT, staff_id INT, disease_name VARCHAR, visit_date DATE)")
+    conn.execute("CREATE OR REPLACE TABLE staffs (staff_id INT, role VARCHAR, national_id VARCHAR, specialization VARCHAR, privacy_budget FLOAT)")
+    conn.executemany("INSERT INTO patients VALUES (?, ?, ?, DATE '1980-01-01', ?, ?, 'Hanoi')", patients)
+    conn.executemany("INSERT INTO diagnoses VALUES (?, ?, 1, ?, DATE '2025-01-01')",
+                     [(i, patient[0], "Flu" if i % 2 else "Fever") for i, patient in enumerate(patients)])
+    conn.close()
+
+@pytest.fixture
+def snapshots(tmp_path):
+    source = str(tmp_path / "source.duckdb")
+    # 12 women aged 30-41 and 3 men aged 50-52
+    patients = [(i, f"N{i}", f"P{i}", 30 + i, "F") for i in range(12)] + [(100 + i, f"M{i}", f"Q{i}", 50 + i, "M") for i in range(3)]
+    _make_source(source, patients)
+    backend = ColumnarBackend(str(tmp_path / "snapshots"))
+    backend.refresh_snapshots(source=source)
+    return backend, source
+
+def test_rewritten_sql_runs_in_duckdb_dialect(snapshots):
+    backend, _ = snapshots
+    # MySQL input (backticks, generalized filters) is emitted for DuckDB
+    sql = rewriter.enforce_aggregation(rewriter.generalize_filters("SELECT AVG(`age`) FROM `patients` WHERE `age` > 31"), dialect=backend.dialect)
+    assert sql == 'SELECT AVG("age") FROM "patients" WHERE "age" >= 30'
+    assert backend.execute_query(sql) == [{"avg(age)": pytest.approx(38.6)}]
+    assert backend.execute_query(rewriter.enforce_aggregation("SELECT gender FROM patients", dialect=backend.dialect)) == [{"count_star()": 15}]
+
+def test_cohort_check_matches_mysql_semantics(snapshots):
+    backend, _ = snapshots
+    assert not check_cohort_violation("SELECT COUNT(*) FROM patients WHERE gender = 'F'", backend=backend)
+    # One group below k fails the whole query, as on MySQL
+    assert check_cohort_violation("SELECT gender, COUNT(*) FROM patients GROUP BY gender", backend=backend)
+    assert check_cohort_violation("SELECT COUNT(*) FROM patients WHERE gender = 'M'", backend=backend)
+    # An empty grouped result is a violation; an empty ungrouped count is 0
+    assert check_cohort_violation("SELECT gender, COUNT(*) FROM patients WHERE age > 90 GROUP BY gender", backend=backend)
+    assert check_cohort_violation("SELECT COUNT(*) FROM patients WHERE age > 90", backend=backend)
+    # Distinct patients, not diagnoses
+    assert check_cohort_violation("SELECT COUNT(*) FROM diagnoses WHERE patient_id >= 100", backend=backend)
+
+def test_refresh_swaps_snapshots_in_place(snapshots, tmp_path):
+    backend, source = snapshots
+    assert backend.execute_query("SELECT COUNT(*) AS n FROM patients") == [{"n": 15}]
+
+    _make_source(source, [(i, f"N{i}", f"P{i}", 30, "F") for i in range(20)])
+    backend.refresh_snapshots(tables=("patients",), source=source)
+
+    # The open backend reads the new file; no temporary file is left behind
+    assert backend.execute_query("SELECT COUNT(*) AS n FROM patients") == [{"n": 20}]
+    assert sorted(os.listdir(backend.snapshot_dir)) == ["diagnoses.parquet", "patients.parquet", "staffs.parquet"]
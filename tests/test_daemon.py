@@ -0,0 +1,37 @@
+import pytest
+import os
+import threading
+from src.daemon import QueryDaemon, send_query, is_daemon_running, DaemonUnavailableException
+from src.pipeline.sanitizer import SecurityException
+
+class StubMiddleware:
+    def process_query(self, user_query, user_id, epsilon_cost):
+        if "DROP" in user_query:
+            raise SecurityException("Modification queries are not allowed.")
+        return {"status": "success", "original_query": user_query, "executed_query": user_query,
+                "result": 7.0, "epsilon_used": epsilon_cost, "query_type": "COUNT"}
+
+def test_daemon_round_trip(tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    daemon = QueryDaemon(path, middleware=StubMiddleware())
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    try:
+        assert is_daemon_running(path)
+        assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+
+        reply = send_query("SELECT COUNT(*) FROM patients", "u1", 0.5, path=path)
+        assert reply["ok"] and reply["response"]["result"] == 7.0 and reply["response"]["epsilon_used"] == 0.5
+
+        reply = send_query("DROP TABLE patients", "u1", 0.5, path=path)
+        assert reply == {"ok": False, "error": "SecurityException", "message": "Modification queries are not allowed."}
+    finally:
+        daemon.shutdown()
+        daemon.server_close()
+        thread.join(5)
+
+    assert not os.path.exists(path)
+
+def test_client_falls_back_without_daemon(tmp_path):
+    with pytest.raises(DaemonUnavailableException):
+        send_query("SELECT COUNT(*) FROM patients", "u1", 0.5, path=str(tmp_path / "missing.sock"))
@@ -0,0 +1,72 @@
+import pytest
+import pymysql
+from src import db_connector
+from src.db_connector import add_execution_time_hint, execute_query, QueryTimeoutException
+
+class TimedOutConnection:
+    """
+    Connection whose statements are interrupted by MAX_EXECUTION_TIME.
+    """
+    open = True
+    _read_timeout = None
+
+    def __init__(self):
+        self.executed = []
+        self.rolled_back = False
+
+    def thread_id(self):
+        return 42
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, self._read_timeout))
+        raise pymysql.err.OperationalError(db_connector.ER_QUERY_TIMEOUT, "Query execution was interrupted")
+
+    def rollback(self):
+        self.rolled_back = True
+
+class RecordingPool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.released = []
+
+    def acquire(self):
+        return self.conn
+
+    def release(self, conn, discard=False):
+        self.released.append(discard)
+
+def test_execution_time_hint():
+    assert add_execution_time_hint("SELECT COUNT(*) FROM patients", 250.7) == "SELECT /*+ MAX_EXECUTION_TIME(250) */ COUNT(*) FROM patients"
+    assert add_execution_time_hint("UPDATE staffs SET privacy_budget = 0", 100) == "UPDATE staffs SET privacy_budget = 0"
+
+def test_timed_out_statement_returns_connection(monkeypatch):
+    """
+    A statement aborted by MySQL raises QueryTimeoutException and the still-healthy connection goes back to the pool.
+    """
+    conn = TimedOutConnection()
+    pool = RecordingPool(conn)
+    monkeypatch.setattr(db_connector, "get_pool", lambda: pool)
+
+    with pytest.raises(QueryTimeoutException):
+        execute_query("SELECT COUNT(*) FROM patients", timeout_ms=500)
+
+    sql, read_timeout = conn.executed[0]
+    assert "MAX_EXECUTION_TIME(500)" in sql
+    assert read_timeout == pytest.approx(0.5 + db_connector.DB_DEADLINE_GRACE)
+    assert conn._read_timeout is None
+    assert conn.rolled_back
+    assert pool.released == [False]
+
+def test_expired_deadline_skips_execution(monkeypatch):
+    monkeypatch.setattr(db_connector, "get_pool", lambda: pytest.fail("no connection should be used"))
+    with pytest.raises(QueryTimeoutException):
+        execute_query("SELECT COUNT(*) FROM patients", timeout_ms=0)
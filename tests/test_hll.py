@@ -0,0 +1,82 @@
+import numpy as np
+from src.pipeline.hll import HyperLogLog, CohortSketches
+from src.pipeline.privacy_guard import check_cohort_violation
+
+def make_patients(n: int, first_id: int = 1) -> list:
+    return [{"patient_id": i, "age": 20 + (i % 50), "gender": "F" if i % 2 else "M"} for i in range(first_id, first_id + n)]
+
+class FakeTable:
+    def __init__(self, rows: list, key: str = "patient_id"):
+        self.rows = rows
+        self.key = key
+        self.statements = []
+
+    def __call__(self, sql, params):
+        self.statements.append(sql)
+        after = params[0] if len(params) == 2 else None
+        rows = [row for row in self.rows if after is None or row[self.key] > after]
+        return rows[:params[-1]]
+
+def test_hyperloglog_estimate_and_merge():
+    a, b = HyperLogLog(12), HyperLogLog(12)
+    a.add_many(np.arange(0, 60000))
+    b.add_many(np.arange(30000, 90000))
+    assert abs(a.estimate() - 60000) < 60000 * 3 * a.relative_error
+    a.merge(b)
+    assert abs(a.estimate() - 90000) < 90000 * 3 * a.relative_error
+
+    small = HyperLogLog(12)
+    small.add_many([1, 2, 3, 3, 3])
+    assert round(small.estimate()) == 3
+
+def test_cohort_decisions():
+    table = FakeTable(make_patients(20000))
+    sketches = CohortSketches(tables={"patients": {"key": "patient_id", "id": "patient_id", "dimensions": (("age", 10), ("gender", None))}},
+                              executor=table, refresh_interval=3600)
+    # Nothing is decided before the sketches are built
+    assert sketches.estimate("SELECT COUNT(DISTINCT patient_id) FROM patients") is None
+    sketches.refresh()
+
+    # 20000 patients, ages 20..69 evenly; women aged 30..39 are 1/10 of them
+    estimate, lower = sketches.estimate("SELECT COUNT(DISTINCT patient_id) FROM patients WHERE age >= 30 AND age < 40 AND gender = 'f'")
+    assert abs(estimate - 2000) < 2000 * 0.05 and lower < estimate
+    assert sketches.is_clearly_safe("SELECT COUNT(DISTINCT patient_id) FROM patients WHERE gender IN ('F', 'M') AND age BETWEEN 20 AND 29", 5)
+
+    # Not aligned with the age buckets, grouped, or on other columns: left to the exact count
+    for sql in ("SELECT COUNT(DISTINCT patient_id) FROM patients WHERE age >= 35",
+                "SELECT COUNT(DISTINCT patient_id) FROM patients WHERE age = 30",
+                "SELECT COUNT(DISTINCT patient_id) FROM patients WHERE gender = 'F' OR age >= 30",
+                "SELECT COUNT(DISTINCT patient_id) FROM patients WHERE full_name = 'A'",
+                "SELECT COUNT(DISTINCT patient_id) FROM patients GROUP BY gender",
+                "SELECT COUNT(*) FROM patients",
+                "SELECT COUNT(DISTINCT patient_id) FROM diagnoses"):
+        assert sketches.estimate(sql) is None
+    # Empty cohorts are never decided from sketches
+    assert sketches.estimate("SELECT COUNT(DISTINCT patient_id) FROM patients WHERE age >= 90") is None
+
+def test_incremental_refresh_and_exact_fallback():
+    table = FakeTable(make_patients(500))
+    sketches = CohortSketches(tables={"patients": {"key": "patient_id", "id": "patient_id", "dimensions": (("age", 10), ("gender", None))}},
+                              executor=table, refresh_interval=3600, safety_factor=20)
+    sketches.refresh()
+    before = sketches.estimate("SELECT COUNT(DISTINCT patient_id) FROM patients")[0]
+
+    table.rows += make_patients(500, first_id=501)
+    table.statements.clear()
+    sketches.refresh()
+    assert "WHERE patient_id > %s" in table.statements[0]
+    after = sketches.estimate("SELECT COUNT(DISTINCT patient_id) FROM patients")[0]
+    assert abs(before - 500) < 500 * 0.05 and abs(after - 1000) < 1000 * 0.05
+
+    executed = []
+    def executor(sql, timeout_ms):
+        executed.append(sql)
+        return [{"c": 3}]
+
+    # ~1000 patients: clearly safe, no exact count
+    assert not check_cohort_violation("SELECT COUNT(*) FROM patients", executor=executor, estimator=sketches)
+    assert executed == []
+    # ~100 women aged 20..29: too close to the threshold, the exact count decides
+    assert check_cohort_violation("SELECT COUNT(*) FROM patients WHERE age >= 20 AND age < 30 AND gender = 'F'",
+                                  executor=executor, estimator=sketches)
+    assert len(executed) == 1
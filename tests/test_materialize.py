@@ -0,0 +1,135 @@
+from src.materialize import Materializer, analyze, _NotMaterializable
+from src import main, tracing
+import pytest
+
+class FakeDatabase:
+    def __init__(self, rows: dict = None):
+        self.rows = rows or {}
+        self.statements = []
+
+    def __call__(self, sql):
+        self.statements.append(sql)
+        if sql.startswith("SELECT COUNT(*) AS c FROM"):
+            table = sql.split()[-1][:-len("_new")]
+            return [{"c": self.rows.get(table, 10)}]
+        return []
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def run(self, cost_ms: float, executed: list = None):
+        def _run(sql):
+            if executed is not None:
+                executed.append(sql)
+            self.now += cost_ms / 1000
+            return [{"c": 1}]
+        return _run
+
+def test_statements_differing_in_constants_share_a_shape():
+    table, grain, aggregates, rewrite = analyze("SELECT COUNT(*) FROM patients WHERE age >= 30 AND gender = 'F'")
+    assert (table, grain, aggregates) == ("patients", ("age", "gender"), ("COUNT(*)",))
+    assert rewrite("mv_x") == "SELECT COALESCE(SUM(a0), 0) AS `COUNT(*)` FROM mv_x AS patients WHERE age >= 30 AND gender = 'F'"
+    assert analyze("SELECT COUNT(*) FROM patients WHERE gender = 'M' AND age < 60")[:3] == (table, grain, aggregates)
+
+    _, grain, aggregates, rewrite = analyze("SELECT MAX(age), SUM(age) AS s FROM patients GROUP BY gender")
+    assert (grain, aggregates) == (("gender",), ("MAX(age)", "SUM(age)"))
+    assert rewrite("mv_y") == "SELECT MAX(a0) AS `MAX(age)`, SUM(a1) AS s FROM mv_y AS patients GROUP BY gender"
+
+    # Distinct counts only when each result group is a single stored group
+    assert analyze("SELECT COUNT(DISTINCT patient_id) FROM diagnoses WHERE disease_name = 'Flu'")[1] == ("disease_name",)
+    for sql in ("SELECT COUNT(DISTINCT patient_id) FROM diagnoses WHERE disease_name = 'Flu' OR disease_name = 'Fever'",
+                "SELECT COUNT(DISTINCT patient_id) FROM patients WHERE age >= 30",
+                "SELECT AVG(age) FROM patients",
+                "SELECT COUNT(*) FROM patients GROUP BY gender HAVING COUNT(*) > 5",
+                "SELECT COUNT(*) FROM patients_summary"):
+        with pytest.raises(_NotMaterializable):
+            analyze(sql)
+
+def test_hot_shapes_are_materialized_routed_and_refreshed():
+    database, clock, executed = FakeDatabase(), FakeClock(), []
+    materializer = Materializer(min_count=3, min_cost_ms=20, refresh_interval=60, executor=database, background=False, clock=clock)
+    run = clock.run(10, executed)
+
+    for age in (10, 20, 30):
+        materializer.execute(f"SELECT COUNT(*) FROM patients WHERE age >= {age}", run)
+    assert all("FROM patients " in sql for sql in executed)
+    status = materializer.status()
+    table = status["materialized"][0]["table"]
+    assert "CREATE TABLE %s_new AS SELECT age, COUNT(*) AS a0 FROM patients GROUP BY age" % table in database.statements
+    assert [decision["action"] for decision in status["decisions"]] == ["materialized", "scheduled"]
+
+    materializer.execute("SELECT COUNT(*) FROM patients WHERE age >= 40", run)
+    assert executed[-1] == f"SELECT COALESCE(SUM(a0), 0) AS `COUNT(*)` FROM {table} AS patients WHERE age >= 40"
+
+    # Rebuilt in the background once older than the refresh interval
+    database.statements.clear()
+    clock.now += 61
+    materializer.execute("SELECT COUNT(*) FROM patients WHERE age >= 40", run)
+    assert f"RENAME TABLE {table} TO {table}_old, {table}_new TO {table}" in database.statements
+    assert materializer.status()["decisions"][0]["action"] == "refreshed"
+
+    # Failed reads fall back to the base table, and drop the table after repeated failures
+    def failing(sql):
+        if table in sql:
+            raise ConnectionError("table missing on replica")
+        return run(sql)
+    for _ in range(3):
+        materializer.execute("SELECT COUNT(*) FROM patients WHERE age >= 40", failing)
+    assert executed[-1] == "SELECT COUNT(*) FROM patients WHERE age >= 40"
+    assert materializer.status()["decisions"][0]["action"] == "dropped"
+
+def test_storage_budget_evicts_the_least_valuable_table():
+    database, clock = FakeDatabase(), FakeClock()
+    materializer = Materializer(min_count=2, min_cost_ms=0, max_rows=15, executor=database, background=False, clock=clock)
+
+    for _ in range(2):
+        materializer.execute("SELECT COUNT(*) FROM patients WHERE gender = 'F'", clock.run(5))
+    assert len(materializer.status()["materialized"]) == 1
+
+    # A more expensive shape needs the space: the table saving less time is dropped
+    for _ in range(2):
+        materializer.execute("SELECT SUM(age) FROM patients WHERE gender = 'F'", clock.run(50))
+    status = materializer.status()
+    assert [shape["shape"] for shape in status["materialized"]] == ["patients(gender): SUM(age)"]
+    assert status["used_rows"] == 10
+    assert any(decision["action"] == "dropped" and decision["reason"].startswith("evicted") for decision in status["decisions"])
+
+    # A cheaper shape cannot evict it
+    for _ in range(2):
+        materializer.execute("SELECT MIN(age) FROM patients WHERE gender = 'M'", clock.run(5))
+    assert materializer.status()["decisions"][0]["action"] == "rejected"
+    assert materializer.evict("patients(gender): SUM(age)")
+    assert materializer.status()["used_rows"] == 0
+
+def test_cohort_counts_never_read_a_materialization(monkeypatch):
+    """
+    After deletions the materialized distinct count is stale; the cohort check must see the live count
+    even when the aggregate itself is served from the materialization.
+    """
+    clock = FakeClock()
+    materializer = Materializer(min_count=2, min_cost_ms=0, executor=FakeDatabase(), background=False, clock=clock)
+    middleware = main.PrivacyMiddleware(slow_query_threshold_ms=None, materializer=materializer)
+    executed = []
+
+    def execute_shared(sql, timeout_ms=None):
+        executed.append(sql)
+        clock.now += 0.01
+        return [{"c": 40}] if "mv_" in sql else [{"c": 3}]
+    monkeypatch.setattr(middleware, "_execute_shared", execute_shared)
+
+    cohort_sql = "SELECT COUNT(DISTINCT patient_id) FROM diagnoses WHERE disease_name = 'Flu'"
+    for sql in (cohort_sql, cohort_sql, "SELECT COUNT(*) FROM diagnoses WHERE disease_name = 'Flu'"):
+        middleware._execute_analytic(sql)
+    assert len(materializer.status()["materialized"]) == 1
+    # The aggregate path reads the (stale) materialized table
+    assert middleware._execute_analytic(cohort_sql) == [{"c": 40}]
+
+    executed.clear()
+    trace = tracing.RequestTrace("u1", "SELECT COUNT(*) FROM diagnoses WHERE disease_name = 'Flu'", None)
+    with pytest.raises(main.privacy_guard.PrivacyViolationException):
+        middleware._run_admitted(trace, trace.query, "SELECT COUNT(*) FROM diagnoses WHERE disease_name = 'Flu'", "u1", 0.1)
+    assert executed == [cohort_sql]
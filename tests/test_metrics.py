@@ -0,0 +1,64 @@
+import pytest
+import time
+from src.metrics import MetricsRegistry, record_trace, REJECTIONS, STAGE_LATENCY
+from src.tracing import RequestTrace
+from src.pipeline.sanitizer import SecurityException
+
+def test_prometheus_text_format():
+    """
+    Counters and histograms render in the Prometheus text exposition format with cumulative buckets.
+    """
+    registry = MetricsRegistry()
+    counter = registry.counter("test_events_total", "Test events.", ("kind",))
+    histogram = registry.histogram("test_latency_seconds", "Test latency.", buckets=(0.01, 0.1))
+
+    counter.inc(kind="a")
+    counter.inc(2, kind="b")
+    histogram.observe(0.005)
+    histogram.observe(0.05)
+    histogram.observe(5.0)
+
+    text = registry.render()
+
+    assert "# TYPE test_events_total counter" in text
+    assert 'test_events_total{kind="a"} 1.0' in text
+    assert 'test_events_total{kind="b"} 2.0' in text
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{le="0.01"} 1' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_latency_seconds_count 3" in text
+
+def test_trace_listener_records_stages_and_rejections():
+    trace = RequestTrace("user", "SELECT 1")
+    with trace.stage("validate"):
+        pass
+    trace.error = SecurityException("blocked")
+    trace.finish()
+
+    before_rejections = REJECTIONS.value(exception="SecurityException")
+    before_stage = STAGE_LATENCY.count(stage="validate")
+
+    record_trace(trace)
+
+    assert REJECTIONS.value(exception="SecurityException") == before_rejections + 1
+    assert STAGE_LATENCY.count(stage="validate") == before_stage + 1
+
+def test_instrumentation_overhead():
+    """
+    Recording a full request trace must stay under 1% of a request (a request makes at least
+    four MySQL round trips, so ~5ms is a conservative lower bound).
+    """
+    trace = RequestTrace("user", "SELECT 1")
+    for stage in ("role", "validate", "budget_check", "rewrite", "cohort", "execute", "noise", "budget_commit"):
+        trace.stages[stage] = 100000
+    trace.finish()
+
+    n_iterations = 2000
+    start_ns = time.perf_counter_ns()
+    for _ in range(n_iterations):
+        record_trace(trace)
+    per_trace_us = (time.perf_counter_ns() - start_ns) / n_iterations / 1000
+
+    print(f"\nrecord_trace: {per_trace_us:.2f} us")
+    assert per_trace_us < 50, f"Instrumentation too slow: {per_trace_us:.2f} us per request"
@@ -0,0 +1,151 @@
+import time
+import pytest
+from src import db_connector
+from src.db_connector import ConnectionPool, PoolTimeoutException
+from src.pipeline.budget import BudgetAccountant
+
+class FakeConnection:
+    open = True
+
+    def __init__(self, alive: bool = True):
+        self.alive = alive
+        self.closed = False
+        self.executed = []
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("server has gone away")
+
+    def close(self):
+        self.closed = True
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+    def commit(self):
+        pass
+
+def test_acquire_reuses_released_connections():
+    opened = []
+    pool = ConnectionPool(size=2, timeout=0.1, connect=lambda: opened.append(FakeConnection()) or opened[-1])
+
+    first, second = pool.acquire(), pool.acquire()
+    assert first is not second
+    pool.release(second)
+    assert pool.acquire() is second
+    assert len(opened) == 2
+    pool.release(first)
+    pool.release(second)
+
+def test_acquire_times_out_when_every_slot_is_taken():
+    pool = ConnectionPool(size=1, timeout=0.05, connect=FakeConnection)
+    conn = pool.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(PoolTimeoutException):
+        pool.acquire()
+    assert time.monotonic() - start >= 0.05
+
+    # The slot is usable again once released
+    pool.release(conn)
+    pool.release(pool.acquire())
+
+def test_broken_connections_are_discarded(monkeypatch):
+    pool = ConnectionPool(size=1, timeout=0.1, connect=FakeConnection)
+    conn = pool.acquire()
+    pool.release(conn, discard=True)
+    assert conn.closed
+    replacement = pool.acquire()
+    assert replacement is not conn
+
+    # Idle connections failing their ping are closed and replaced
+    replacement.alive = False
+    pool.release(replacement)
+    monkeypatch.setattr(db_connector, "DB_POOL_PING_AFTER", 0.0)
+    fresh = pool.acquire()
+    assert replacement.closed and fresh is not replacement
+    pool.release(fresh)
+
+class FlakyPool:
+    """
+    Budget pool whose first `failures` checkouts time out.
+    """
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.conn = FakeConnection()
+
+    def acquire(self):
+        if self.failures:
+            self.failures -= 1
+            raise PoolTimeoutException("No database connection available")
+        return self.conn
+
+    def release(self, conn, discard=False):
+        pass
+
+def test_budget_commits_are_retried_and_never_dropped(monkeypatch):
+    pool = FlakyPool(failures=2)
+    accountant = BudgetAccountant(retries=2, backoff=0.001, pool=pool)
+    assert accountant.commit("u1", 0.5)
+    assert pool.conn.executed[-1][1] == (0.5, "u1")
+
+    # Exhausted retries keep the charge: it counts against the budget and joins the next commit
+    pool.failures = 3
+    assert not accountant.commit("u1", 0.25)
+    assert accountant.unpaid("u1") == 0.25
+    monkeypatch.setattr(accountant, "get_budget", lambda user_id: 1.0)
+    with pytest.raises(Exception, match="Remaining: 0.75"):
+        accountant.check("u1", 0.8)
+
+    assert accountant.commit("u1", 0.5)
+    assert pool.conn.executed[-1][1] == (0.75, "u1")
+    assert accountant.unpaid("u1") == 0.0
+
+def test_non_finite_charges_fail_closed(monkeypatch):
+    pool = FlakyPool(failures=0)
+    accountant = BudgetAccountant(retries=0, backoff=0.001, pool=pool)
+    monkeypatch.setattr(accountant, "get_budget", lambda user_id: 1.0)
+
+    # NaN compares False with everything: without the guard, `remaining < cost` never trips
+    for cost in (float("nan"), float("inf")):
+        with pytest.raises(Exception, match="Budget exhausted"):
+            accountant.check("u1", cost)
+        with pytest.raises(ValueError):
+            accountant.commit("u1", cost)
+    assert accountant.unpaid("u1") == 0.0 and pool.conn.executed == []
+
+    with accountant._unpaid_lock:
+        accountant._unpaid["u1"] = float("nan")
+    with pytest.raises(Exception, match="Budget exhausted"):
+        accountant.check("u1", 0.1)
+
+@pytest.mark.parametrize("epsilon", [float("nan"), float("inf"), 0.0, -1.0])
+def test_invalid_epsilon_is_rejected_before_the_pipeline(epsilon):
+    from src.main import PrivacyMiddleware
+    middleware = PrivacyMiddleware(slow_query_threshold_ms=None)
+    with pytest.raises(ValueError, match="Invalid epsilon"):
+        middleware.process_query("SELECT COUNT(*) FROM patients", "u1", epsilon)
+
+def test_avg_queries_are_charged_through_the_retried_commit(monkeypatch):
+    from src.main import PrivacyMiddleware
+    pool = FlakyPool(failures=1)
+    middleware = PrivacyMiddleware(slow_query_threshold_ms=None)
+    middleware.budget_accountant = BudgetAccountant(retries=1, backoff=0.001, pool=pool)
+    monkeypatch.setattr(middleware, "_execute_analytic", lambda sql, timeout_ms=None: [{"sum": 400.0, "count": 10.0}])
+
+    result = middleware._handle_avg_query("SELECT AVG(age) FROM patients", "u1", 0.5)
+    assert result["query_type"] == "AVG"
+    assert middleware.flush_budget_commits(timeout=5)
+    assert pool.conn.executed == [("UPDATE staffs SET privacy_budget = privacy_budget - %s WHERE national_id = %s", (0.5, "u1"))]
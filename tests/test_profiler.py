@@ -0,0 +1,40 @@
+import json
+import os
+from src import profiler
+from src.profiler import SampledProfiler
+
+def busy_request():
+    return sum(i * i for i in range(20000))
+
+def _write_control(path, control: dict, mtime: float):
+    path.write_text(json.dumps(control))
+    os.utime(path, (mtime, mtime))
+
+def test_control_file_is_opt_in():
+    assert profiler.PROFILE_CONTROL_FILE == ""
+    assert not profiler.PROFILER.control_file
+
+def test_control_file_toggles_profiling(tmp_path):
+    control = tmp_path / "control.json"
+    sampler = SampledProfiler(sample_rate=0, output_dir=str(tmp_path / "profiles"), control_file=str(control), flush_every=1000)
+
+    _write_control(control, {"sample_rate": 1}, 1000)
+    for _ in range(2):
+        with sampler.maybe_profile():
+            busy_request()
+    assert sampler.sample_rate == 1
+
+    prefix = sampler.flush()
+    lines = open(prefix + ".collapsed").read().splitlines()
+    # "frame;frame;... self_micros", with the sampled request's callees below it
+    stacks = dict(line.rsplit(" ", 1) for line in lines)
+    assert all(micros.isdigit() for micros in stacks.values())
+    assert any(stack.startswith("test_profiler.py:") and "(busy_request);" in stack and stack.endswith("(<genexpr>)") for stack in stacks)
+
+    # Switched off again: nothing is sampled
+    _write_control(control, {"sample_rate": 0}, 2000)
+    sampler._control_checked = 0.0
+    with sampler.maybe_profile():
+        busy_request()
+    assert sampler.sample_rate == 0
+    assert sampler.flush() is None
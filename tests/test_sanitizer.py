@@ -0,0 +1,96 @@
+import pytest
+from src.pipeline.sanitizer import validate_query, prefilter_query, SecurityException
+
+@pytest.mark.parametrize("query, role, message", [
+    ("SELECT * FROM patients; DROP TABLE patients;", "doctor", "Multiple statements are not allowed."),
+    ("DROP TABLE patients", "manager", "Modification queries are not allowed."),
+    ("SELECT COUNT(*) FROM patients p JOIN diagnoses d ON p.patient_id = d.patient_id", "manager", "JOIN operations are not allowed due to sensitivity risks."),
+    ("SELECT COUNT(*) FROM patients WHERE patient_id = 3", "doctor", "Access to sensitive identifier 'patient_id' is prohibited for role 'doctor'."),
+    ("SELECT COUNT(*) FROM secret", "manager", "Table 'secret' does not exist in the system."),
+    ("SELECT COUNT(*) FROM staffs", "doctor", "Access to table 'staffs' is denied for role 'doctor'."),
+    ("SELECT 1 UNION SELECT 2", "manager", "Only SELECT queries are allowed."),
+    ("SELECT COUNT(*) FROM patients WHERE gender = 'M' OR 1=1", "doctor", "SQL Injection detected: Literal comparison '1 = 1' is forbidden."),
+    ("SELECT COUNT(*) FROM patients WHERE gender LIKE 'M%'", "doctor", "Operator or Logic 'Like' is not allowed in WHERE clause."),
+    # Double quotes delimit strings in MySQL, so these are literal comparisons too
+    ("SELECT COUNT(*) FROM patients WHERE gender = 'F' OR \"x\" = \"x\"", "doctor", "SQL Injection detected: Literal comparison ''x' = 'x'' is forbidden."),
+    ("SELECT COUNT(*) FROM patients WHERE \"1\" = 1", "doctor", "SQL Injection detected: Literal comparison ''1' = 1' is forbidden."),
+])
+def test_rejection_reasons(query, role, message):
+    """
+    The single-pass validator reports the same reasons as the original multi-pass checks.
+    """
+    with pytest.raises(SecurityException) as excinfo:
+        validate_query(query, role)
+    assert str(excinfo.value) == message
+
+def test_violation_precedence():
+    """
+    Blocked columns win over table violations, and tautologies win over disallowed operators,
+    regardless of where they appear in the query.
+    """
+    with pytest.raises(SecurityException, match="sensitive identifier 'national_id'"):
+        validate_query("SELECT national_id FROM secret", "researcher")
+
+    with pytest.raises(SecurityException, match="Literal comparison"):
+        validate_query("SELECT COUNT(*) FROM patients WHERE gender LIKE 'M%' AND 1 = 1", "doctor")
+
+    # Among violations of the same kind, the shallowest one is reported
+    with pytest.raises(SecurityException, match="Table 't_shallow'"):
+        validate_query("SELECT (SELECT COUNT(*) FROM (SELECT 1 FROM t_deep) AS q), x FROM t_shallow", "manager")
+
+def test_allowed_queries():
+    assert validate_query("SELECT COUNT(*) FROM patients WHERE age > 30 AND (gender = 'F' OR age < 20)", "researcher")
+    assert validate_query("SELECT COUNT(*) FROM diagnoses WHERE disease_name = 'Flu'", "cashier")
+
+@pytest.mark.parametrize("query, message", [
+    ("SELECT COUNT(*) FROM patients;;", "Multiple statements are not allowed."),
+    ("   ", "Only SELECT queries are allowed."),
+    ("/* note */ delete FROM patients", "Modification queries are not allowed."),
+    ("SELECT COUNT(*) FROM patients WHERE (age > 30", "Invalid SQL syntax: unbalanced parentheses."),
+    ("SELECT COUNT(*) FROM patients WHERE " + "(" * 40 + "age > 30" + ")" * 40, "Query nesting exceeds the maximum depth of 32."),
+    ("SELECT COUNT(*) FROM patients WHERE age > 30" + " " * 10000, "Query exceeds the maximum length of 10000 characters."),
+])
+def test_prefilter_rejections(query, message):
+    with pytest.raises(SecurityException) as excinfo:
+        prefilter_query(query)
+    assert str(excinfo.value) == message
+
+def test_prefilter_ignores_quoted_and_commented_text():
+    """
+    Parentheses, semicolons and keywords inside strings and comments do not trigger the pre-filter.
+    """
+    assert prefilter_query("SELECT COUNT(*) FROM diagnoses WHERE disease_name = 'Flu (A); DROP'") is None
+    assert prefilter_query("SELECT COUNT(*) FROM patients -- ) ;\n WHERE age > 30") is None
+    assert prefilter_query("SELECT COUNT(*) FROM patients;  ") is None
+
+@pytest.mark.parametrize("query, message", [
+    ("SELECT COUNT(*) FROM patients WHERE age IN (" + ", ".join(str(i) for i in range(120)) + ")",
+     "Query is too complex: more than 100 literals for role 'researcher'."),
+    ("SELECT COUNT(*) FROM patients WHERE " + "NOT " * 40 + "age > 30",
+     "Query is too complex: predicate nesting deeper than 32 for role 'researcher'."),
+    ("SELECT " + ", ".join(["COUNT(*)"] * 300) + " FROM patients",
+     "Query is too complex: more than 500 syntax nodes for role 'researcher'."),
+])
+def test_complexity_limits(query, message):
+    with pytest.raises(SecurityException) as excinfo:
+        validate_query(query, "researcher")
+    assert str(excinfo.value) == message
+
+def test_flat_connective_chains_count_as_one_level():
+    """
+    sqlglot parses a AND b AND c left-deep; a flat chain is one level of nesting, however long.
+    """
+    assert validate_query("SELECT COUNT(*) FROM patients WHERE " + " AND ".join(f"age > {i}" for i in range(60)), "researcher")
+    assert validate_query("SELECT COUNT(*) FROM patients WHERE " + " OR ".join(f"age = {i}" for i in range(60)), "researcher")
+    # Parentheses still nest
+    with pytest.raises(SecurityException, match="predicate nesting deeper than 8"):
+        validate_query("SELECT COUNT(*) FROM patients WHERE " + "(age > 1 AND " * 9 + "age > 2" + ")" * 9, "guest")
+
+def test_complexity_limits_per_role():
+    """
+    Role policies may tighten the global limits (the guest role caps statement length at 1000).
+    """
+    query = "SELECT COUNT(*) FROM patients WHERE age > 30" + " " * 1000
+    assert validate_query(query, "researcher")
+    with pytest.raises(SecurityException, match="maximum length of 1000"):
+        validate_query(query, "guest")
@@ -0,0 +1,73 @@
+import pytest
+from datetime import date
+import seed_db
+
+class RecordingConnection:
+    """
+    Connection capturing the rows bulk-loaded per table (executemany only).
+    """
+    def __init__(self):
+        self.rows = {}
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        pass
+
+    def executemany(self, sql, rows):
+        table = sql.split()[2]
+        self.rows.setdefault(table, []).extend(rows)
+
+    def commit(self):
+        pass
+
+def _age(dob: str) -> int:
+    # TIMESTAMPDIFF(YEAR, dob, REFERENCE_DATE), as in the generated `age` column
+    born = date.fromisoformat(dob)
+    reference = seed_db.REFERENCE_DATE
+    return reference.year - born.year - ((reference.month, reference.day) < (born.month, born.day))
+
+def _generate(n_patients: int, **kwargs) -> dict:
+    conn = RecordingConnection()
+    seed_db.generate_synthetic_data(conn, n_patients, chunk_size=1000, **kwargs)
+    return conn.rows
+
+def test_synthetic_data_keeps_fixture_cohorts_small():
+    rows = _generate(5000)
+    ages = [_age(row[3]) for row in rows["patients"]]
+    assert min(ages) >= seed_db.MIN_SYNTHETIC_AGE
+    assert not any(0 <= age < 10 for age in ages)
+    assert {row[3] for row in rows["diagnoses"]}.isdisjoint(seed_db.RARE_FIXTURE_DISEASES)
+    # Synthetic rows never collide with the fixture IDs
+    assert min(row[0] for row in rows["patients"]) == 61
+    assert min(row[1] for row in rows["diagnoses"]) >= 61
+
+def test_reserved_dates_of_birth_are_never_generated():
+    # Everyone born in 1980: without the guard, ~1 in 364 would get the reserved 1980-01-15
+    rows = _generate(5000, age_distribution={(45, 46): 1.0})
+    dobs = {date.fromisoformat(row[3]) for row in rows["patients"]}
+    assert dobs.isdisjoint(seed_db.RESERVED_DOBS)
+    assert {_age(row[3]) for row in rows["patients"]} == {45}
+
+def test_generation_is_deterministic_and_validated():
+    assert _generate(200, seed=7) == _generate(200, seed=7)
+    assert _generate(200, seed=7) != _generate(200, seed=8)
+
+    with pytest.raises(ValueError, match="synthetic ages"):
+        _generate(10, age_distribution={(5, 20): 1.0})
+    with pytest.raises(ValueError, match="rare fixture cohorts"):
+        _generate(10, disease_distribution={"Flu": 0.5, "Stroke": 0.5})
+
+def test_fixtures_hold_the_small_cohorts():
+    conn = RecordingConnection()
+    assert seed_db.seed_fixtures(conn) == (60, 15, 9)
+    infants = [row for row in conn.rows["patients"] if _age(row[3]) < seed_db.MIN_SYNTHETIC_AGE]
+    assert len(infants) == 3
+    assert seed_db.RESERVED_DOBS == {date.fromisoformat(row[4]) for row in conn.rows["staffs"] if row[0] == 1}
@@ -0,0 +1,68 @@
+import pytest
+import json
+import threading
+import http.client
+from src.server import QueryServer
+from src.pipeline.sanitizer import SecurityException
+from src.admission import AdmissionRejectedException
+
+class StubMiddleware:
+    def __init__(self):
+        self.flushed = False
+
+    def process_query(self, user_query, user_id, epsilon_cost):
+        if "DROP" in user_query:
+            raise SecurityException("Modification queries are not allowed.")
+        if user_id == "busy":
+            raise AdmissionRejectedException("Server is overloaded: admission queue is full.")
+        return {"status": "success", "original_query": user_query, "executed_query": user_query,
+                "result": 42.0, "epsilon_used": epsilon_cost, "query_type": "COUNT"}
+
+    def flush_budget_commits(self, timeout=None):
+        self.flushed = True
+        return True
+
+@pytest.fixture
+def server():
+    server = QueryServer(("127.0.0.1", 0), middleware=StubMiddleware(), workers=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    if not server.draining:
+        server.shutdown_gracefully(drain_timeout=5)
+    thread.join(5)
+
+def _post(conn, body):
+    conn.request("POST", "/query", body=json.dumps(body), headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+def test_keep_alive_requests_and_error_mapping(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+
+    status, body = _post(conn, {"query": "SELECT COUNT(*) FROM patients", "user_id": "u1", "epsilon": 0.5})
+    assert status == 200
+    assert body["result"] == 42.0 and body["epsilon_used"] == 0.5
+
+    # Same connection (keep-alive) for the following requests
+    status, body = _post(conn, {"query": "DROP TABLE patients", "user_id": "u1", "epsilon": 0.5})
+    assert (status, body["error"]) == (403, "SecurityException")
+
+    status, body = _post(conn, {"query": "SELECT COUNT(*) FROM patients", "user_id": "busy"})
+    assert (status, body["error"]) == (503, "AdmissionRejectedException")
+
+    status, body = _post(conn, {"user_id": "u1"})
+    assert (status, body["error"]) == (400, "BadRequest")
+
+    status, body = _post(conn, {"query": "SELECT COUNT(*) FROM patients", "user_id": "u1", "epsilon": float("nan")})
+    assert (status, body["error"]) == (400, "BadRequest")
+    conn.close()
+
+def test_graceful_drain(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.request("GET", "/health")
+    assert conn.getresponse().status == 200
+    conn.close()
+
+    assert server.shutdown_gracefully(drain_timeout=5)
+    assert server.middleware.flushed
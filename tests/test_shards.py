@@ -0,0 +1,89 @@
+import pytest
+from src.shards import ShardedBackend, merge_plan, merge_partials, shard_statement
+from src.pipeline.privacy_guard import check_cohort_violation
+
+class ShardPool:
+    """
+    Pool whose connections return fixed partial rows for one site.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def acquire(self):
+        return self
+
+    def release(self, conn, discard=False):
+        pass
+
+    def close_all(self):
+        pass
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    def fetchall(self):
+        return [dict(row) for row in self.rows]
+
+    def commit(self):
+        pass
+
+def test_merge_plan():
+    assert merge_plan("SELECT gender, COUNT(*), SUM(age) AS total, MIN(age), MAX(age) FROM patients GROUP BY gender") == ("key", "sum", "sum", "min", "max")
+    with pytest.raises(ValueError):
+        merge_plan("SELECT AVG(age) FROM patients")
+
+def test_merge_partials_by_group_key():
+    plan = ("key", "sum", "min")
+    partials = [
+        [{"gender": "F", "n": 10, "youngest": 30}, {"gender": "M", "n": 5, "youngest": None}],
+        [{"gender": "F", "n": 7, "youngest": 25}],
+    ]
+    assert merge_partials(plan, partials) == [{"gender": "F", "n": 17, "youngest": 25}, {"gender": "M", "n": 5, "youngest": None}]
+
+def test_fan_out_merges_exact_partials():
+    """
+    A SUM/COUNT pair (how AVG is executed) is combined across sites before any noise is added.
+    """
+    sites = [[{"s": 300, "c": 10}], [{"s": 100, "c": 5}], [{"s": None, "c": 0}]]
+    backend = ShardedBackend(sites, pool_factory=ShardPool)
+    try:
+        assert backend.execute_query("SELECT SUM(age), COUNT(age) FROM patients") == [{"s": 400, "c": 15}]
+    finally:
+        backend.close()
+
+def test_grouped_cohort_small_on_each_shard_is_blocked():
+    """
+    The cohort count drops the GROUP BY key from the select list; the shards still project it to merge by group.
+    """
+    sql = "SELECT COUNT(DISTINCT patient_id) FROM patients GROUP BY gender"
+    statement, plan, hidden = shard_statement(sql)
+    assert statement == "SELECT COUNT(DISTINCT patient_id), gender AS _shard_key0 FROM patients GROUP BY gender"
+    assert (plan, hidden) == (("sum", "key"), 1)
+
+    sites = [[{"c": 100, "_shard_key0": "F"}, {"c": 2, "_shard_key0": "M"}],
+             [{"c": 50, "_shard_key0": "F"}, {"c": 1, "_shard_key0": "M"}]]
+    backend = ShardedBackend(sites, pool_factory=ShardPool)
+    try:
+        assert backend.execute_query(sql) == [{"c": 150}, {"c": 3}]
+        assert backend.pools[0].executed == [statement]
+        assert check_cohort_violation("SELECT gender, COUNT(*) FROM patients GROUP BY gender", backend=backend)
+    finally:
+        backend.close()
+
+    with pytest.raises(ValueError):
+        shard_statement("SELECT gender, COUNT(*) FROM patients GROUP BY gender HAVING COUNT(*) > 5")
+
+def test_shard_statement_keeps_mysql_syntax():
+    # Backticks and "..." strings are MySQL; the default dialect would turn "F" into a column
+    statement, _, _ = shard_statement('SELECT COUNT(*) FROM `patients` WHERE gender = "F" GROUP BY DATE_FORMAT(dob, \'%Y\')')
+    assert statement == "SELECT COUNT(*), DATE_FORMAT(dob, '%Y') AS _shard_key0 FROM `patients` WHERE gender = 'F' GROUP BY DATE_FORMAT(dob, '%Y')"
@@ -0,0 +1,95 @@
+import pytest
+import threading
+import time
+from src.singleflight import SingleFlight
+from src.db_connector import QueryTimeoutException
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow_query(timeout_ms):
+        calls.append(1)
+        release.wait(5)
+        return [{"count": 42}]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("SELECT 1", slow_query))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while flight.in_flight() == 0:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert all(rows == [{"count": 42}] for rows, _ in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+
+    # Nothing is cached once the leader has finished
+    assert flight.do("SELECT 1", lambda timeout_ms: [{"count": 7}]) == ([{"count": 7}], False)
+
+def test_errors_and_deadlines_of_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_query(timeout_ms):
+        started.set()
+        release.wait(5)
+        raise RuntimeError("lost connection")
+
+    errors = []
+    leader = threading.Thread(target=lambda: errors.append(pytest.raises(RuntimeError, flight.do, "q", failing_query)))
+    leader.start()
+    started.wait(5)
+
+    # A follower with a short deadline stops waiting on its own
+    with pytest.raises(QueryTimeoutException):
+        flight.do("q", failing_query, timeout_ms=10)
+
+    follower_errors = []
+    def follower():
+        try:
+            flight.do("q", failing_query)
+        except RuntimeError as e:
+            follower_errors.append(e)
+    threads = [threading.Thread(target=follower) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 1
+    # Each follower raises its own copy of the leader's error
+    assert len(follower_errors) == 2
+    assert follower_errors[0] is not follower_errors[1]
+    assert all(str(e) == "lost connection" and e is not errors[0].value for e in follower_errors)
+
+def test_leader_timeout_hands_over_to_followers_with_time_left():
+    flight = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    def query(timeout_ms):
+        calls.append(timeout_ms)
+        if len(calls) == 1:
+            started.set()
+            time.sleep(timeout_ms / 1000)
+            raise QueryTimeoutException(f"Query exceeded its deadline of {timeout_ms:.0f} ms.")
+        return [{"count": 42}]
+
+    leader = threading.Thread(target=lambda: pytest.raises(QueryTimeoutException, flight.do, "q", query, timeout_ms=50))
+    leader.start()
+    started.wait(5)
+
+    # The leader's deadline is not the follower's: it runs the query itself with its remaining time
+    assert flight.do("q", query, timeout_ms=5000) == ([{"count": 42}], False)
+    leader.join(5)
+    assert len(calls) == 2 and 4000 < calls[1] < 5000
@@ -0,0 +1,81 @@
+import json
+import threading
+from src import main
+from src.slow_log import SlowQueryLog
+from src.tracing import RequestTrace
+
+class ExplainConnection:
+    def __init__(self):
+        self.explained = []
+        self.threads = set()
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        self.explained.append(sql)
+        self.threads.add(threading.current_thread().name)
+
+    def fetchall(self):
+        return [{"table": "patients", "rows": 60}]
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def _trace(total_ms: float, error: Exception = None) -> RequestTrace:
+    trace = RequestTrace("001088000004", "SELECT COUNT(*) FROM patients WHERE age > 30")
+    trace.role = "manager"
+    trace.error = error
+    trace.stages = {"cohort": int(total_ms * 0.4e6), "execute": int(total_ms * 0.5e6)}
+    trace.sql = {"cohort": "SELECT COUNT(DISTINCT patient_id) FROM patients WHERE age >= 30",
+                 "executed": "SELECT COUNT(*) FROM patients WHERE age >= 30"}
+    trace.end_ns = trace.start_ns + int(total_ms * 1e6)
+    return trace
+
+def test_only_requests_above_the_threshold_are_logged(tmp_path):
+    path = tmp_path / "slow.jsonl"
+    log = SlowQueryLog(100, str(path))
+    log(_trace(99.9))
+    log(_trace(250, error=TimeoutError("deadline")))
+    assert log.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 1
+    record = records[0]
+    assert set(record) == {"timestamp", "user_id", "role", "total_ms", "stages_ms", "error", "original_sql", "executed_sql", "cohort_sql"}
+    assert (record["user_id"], record["role"], record["total_ms"], record["error"]) == ("001088000004", "manager", 250.0, "TimeoutError")
+    assert record["stages_ms"] == {"cohort": 100.0, "execute": 125.0}
+    assert record["executed_sql"] == "SELECT COUNT(*) FROM patients WHERE age >= 30"
+
+def test_explain_runs_on_the_writer_thread(tmp_path):
+    path = tmp_path / "slow.jsonl"
+    conn = ExplainConnection()
+    log = SlowQueryLog(10, str(path), explain=True, connect=lambda: conn)
+    log(_trace(50))
+    assert log.flush()
+
+    record = json.loads(path.read_text())
+    assert record["explain"] == {"cohort": [{"table": "patients", "rows": 60}], "executed": [{"table": "patients", "rows": 60}]}
+    assert conn.explained == ["EXPLAIN SELECT COUNT(DISTINCT patient_id) FROM patients WHERE age >= 30",
+                              "EXPLAIN SELECT COUNT(*) FROM patients WHERE age >= 30"]
+    assert conn.threads == {"audit-writer"}
+    log.close()
+
+def test_no_mysql_explain_for_the_analytic_backend(tmp_path):
+    class DuckDBBackend:
+        dialect = "duckdb"
+
+    middleware = main.PrivacyMiddleware(analytic_backend=DuckDBBackend(), slow_query_threshold_ms=None)
+    middleware.configure_slow_query_log(10, str(tmp_path / "slow.jsonl"), explain=True)
+    assert middleware.slow_query_log.explain is False
+    middleware.configure_slow_query_log(None)
+    assert middleware.slow_query_log is None
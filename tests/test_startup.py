@@ -0,0 +1,18 @@
+import subprocess
+import sys
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_import_defers_heavy_modules():
+    """
+    Importing src.main must not load sqlglot, numpy, pymysql or dotenv; they are loaded on first use.
+    """
+    code = "import sys, src.main; print(','.join(m for m in ('sqlglot', 'numpy', 'pymysql', 'dotenv') if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    assert proc.stdout.strip() == ""
+
+def test_middleware_is_built_on_first_access():
+    code = "import sys, src.main; from src.main import middleware; print(type(middleware).__name__, 'sqlglot' in sys.modules)"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    assert proc.stdout.strip() == "PrivacyMiddleware True"
@@ -0,0 +1,37 @@
+import pytest
+from src.pipeline.rewriter import route_to_summary, generalize_filters
+
+def test_aggregates_route_to_summary_tables():
+    assert route_to_summary("SELECT COUNT(*) FROM patients WHERE age >= 30 AND age < 40 AND gender = 'F'") == (
+        "SELECT COALESCE(SUM(row_count), 0) AS `COUNT(*)` FROM patients_summary AS patients "
+        "WHERE age_bucket >= 30 AND age_bucket < 40 AND gender = 'F'")
+    # AVG is executed as SUM + COUNT; bounds just inside a bucket edge still select whole buckets
+    assert route_to_summary("SELECT SUM(age), COUNT(age) FROM patients p WHERE p.age > 29 OR p.age <= 9") == (
+        "SELECT CASE WHEN SUM(age_count) > 0 THEN SUM(age_sum) END AS `SUM(age)`, COALESCE(SUM(age_count), 0) AS `COUNT(age)` "
+        "FROM patients_summary AS p WHERE p.age_bucket >= 30 OR p.age_bucket < 10")
+    assert route_to_summary("SELECT gender, COUNT(*) AS n FROM patients GROUP BY gender") == (
+        "SELECT gender, COALESCE(SUM(row_count), 0) AS n FROM patients_summary AS patients GROUP BY gender")
+    # Generalized equality on age becomes a whole bucket
+    assert "age_bucket >= 30 AND age_bucket < 40" in route_to_summary(generalize_filters("SELECT COUNT(*) FROM patients WHERE age = 34"))
+
+def test_distinct_patients_per_disease():
+    assert route_to_summary("SELECT COUNT(DISTINCT patient_id) FROM diagnoses WHERE disease_name = 'Flu'") == (
+        "SELECT COALESCE(SUM(patient_count), 0) AS `COUNT(DISTINCT patient_id)` FROM diagnoses_summary AS diagnoses WHERE disease_name = 'Flu'")
+    assert route_to_summary("SELECT COUNT(DISTINCT patient_id) FROM diagnoses GROUP BY disease_name") is not None
+    # A patient may have several diseases: distinct patients do not add up across diseases
+    assert route_to_summary("SELECT COUNT(DISTINCT patient_id) FROM diagnoses") is None
+    assert route_to_summary("SELECT COUNT(DISTINCT patient_id) FROM diagnoses WHERE disease_name = 'Flu' OR disease_name = 'Fever'") is None
+    assert route_to_summary("SELECT COUNT(*) FROM diagnoses WHERE disease_name = 'Flu' OR disease_name = 'Fever'") is not None
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM patients WHERE age = 34",
+    "SELECT COUNT(*) FROM patients WHERE age >= 35",
+    "SELECT COUNT(*) FROM patients WHERE address = 'School C'",
+    "SELECT MAX(age) FROM patients",
+    "SELECT COUNT(*) FROM patients GROUP BY age",
+    "SELECT COUNT(*) FROM patients GROUP BY gender HAVING COUNT(*) > 5",
+    "SELECT COUNT(*) FROM patients JOIN diagnoses ON patients.patient_id = diagnoses.patient_id",
+    "SELECT COUNT(*) FROM staffs",
+])
+def test_queries_outside_the_grain_use_the_base_table(sql):
+    assert route_to_summary(sql) is None
@@ -0,0 +1,80 @@
+import json
+import pytest
+from src import main, warmup, caches
+from src.db_connector import ConnectionPool, ReplicaSet
+from src.pipeline import sanitizer
+
+class FakePoolConnection:
+    def close(self):
+        pass
+
+def test_load_warmup_file(tmp_path):
+    path = tmp_path / "workload.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"user_id": "u1", "query": "SELECT COUNT(*) FROM patients"}),
+        json.dumps({"user_id": "u2", "original_sql": "SELECT AVG(age) FROM patients", "total_ms": 950}),
+        "not json",
+        json.dumps({"user_id": "u2", "query": "SELECT AVG(age) FROM patients"}),
+        json.dumps({"user_id": 7}),
+    ]) + "\n")
+
+    queries, user_ids = warmup.load_warmup_file(str(path))
+    assert queries == ["SELECT AVG(age) FROM patients", "SELECT COUNT(*) FROM patients"]
+    assert user_ids == ["u2", "u1", "7"]
+    assert warmup.load_warmup_file(str(path), max_queries=1)[0] == ["SELECT AVG(age) FROM patients"]
+
+def test_pool_prefill():
+    pool = ConnectionPool(size=3, timeout=0.1, connect=FakePoolConnection)
+    assert pool.prefill(2) == 2
+    assert pool.prefill(2) == 0
+    conn = pool.acquire()
+    assert isinstance(conn, FakePoolConnection)
+    # Busy slots are never waited for
+    assert pool.prefill() == 1
+    pool.release(conn)
+
+def test_warm_up_prepares_plans_and_roles_without_aggregate_sql(monkeypatch):
+    statements = []
+
+    def fake_execute(sql, params=None, **kwargs):
+        statements.append(sql)
+        if "IN (" in sql:
+            return [{"national_id": "doc1", "role": "Doctor", "specialization": "Cardiology"},
+                    {"national_id": "acc1", "role": "Staff", "specialization": "Accountant"}]
+        return [{"role": "Doctor", "specialization": "Cardiology"}]
+
+    monkeypatch.setattr(main, "execute_query", fake_execute)
+    monkeypatch.setattr(warmup, "get_pool", lambda: ConnectionPool(size=2, timeout=0.1, connect=FakePoolConnection))
+    monkeypatch.setattr(warmup, "get_replicas", lambda: ReplicaSet([]))
+
+    # Without ROLE_CACHE_TTL, roles are looked up on every request so demotions apply at once
+    uncached = main.PrivacyMiddleware(slow_query_threshold_ms=None)
+    assert uncached.preload_roles(["doc1", "acc1"]) == {"doc1": "doctor", "acc1": "accountant"}
+    assert uncached._get_role("doc1") == "doctor"
+    assert len(statements) == 2
+    statements.clear()
+
+    monkeypatch.setattr(caches, "ROLE_CACHE_TTL", 30.0)
+    middleware = main.PrivacyMiddleware(slow_query_threshold_ms=None)
+    stats = warmup.warm_up(middleware, ["SELECT COUNT(*) FROM patients", "SELECT AVG(salary) FROM staffs"], ["doc1", "acc1", "gone"])
+
+    assert stats["connections"] == 2
+    assert stats["roles_loaded"] == 2
+    assert stats["roles"] == ["accountant", "doctor"]
+    # Each role may run one of the two queries (the other is rejected, as it would be at request time)
+    assert (stats["plans"], stats["rejected"]) == (2, 2)
+    # Only the batched role lookup touched the database
+    assert len(statements) == 1 and "FROM staffs WHERE national_id IN" in statements[0]
+
+    # Requests of warmed users skip the role query; cached plans skip validation and rewriting
+    assert middleware._get_role("doc1") == "doctor"
+    assert len(statements) == 1
+    key = middleware._plan_key("SELECT COUNT(*) FROM patients", "doctor")
+    assert middleware.plan_cache.get(key) == "SELECT COUNT(*) FROM patients"
+
+    # Reloading the policies invalidates every cached plan
+    sanitizer.reload_policies()
+    assert middleware.plan_cache.get(middleware._plan_key("SELECT COUNT(*) FROM patients", "doctor")) is None
+
+    with pytest.raises(sanitizer.SecurityException):
+        middleware.prepare_plan("SELECT AVG(salary) FROM staffs", "doctor")